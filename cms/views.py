@@ -2,12 +2,12 @@ from django.shortcuts import render
 from rest_framework import permissions
 from cms.models import FAQ, Banner, BannerLMS, Blog, Counter, Facilities, Page, SpecialCta, Testimonial
 from cms.serializers import BannerLMSSerializer, BannerSerializer, BlogSerializer, CounterSerializer, FAQSerializer, FacilitiesSerializer, PageSerializer, SpecialCtasSerializer, TestimonialSerializer
-from globalapp.views import BaseViews
+from globalapp.views import BaseViews, PublicCacheMixin
 
 # Create your views here.
-class PageViewSet(BaseViews):
+class PageViewSet(PublicCacheMixin, BaseViews):
     model_name = Page
-    methods = ["list", "retrieve", "create", "update", "partial_update", "destroy", "soft_delete", "change_status", "restore_soft_deleted"]
+    methods = ["list", "retrieve", "create", "update", "partial_update", "destroy", "soft_delete", "change_status", "restore_soft_deleted", "bulk_create", "bulk_update", "bulk_soft_delete"]
     queryset = Page.objects.all()
     serializer_class = PageSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -20,9 +20,9 @@ class PageViewSet(BaseViews):
         return super().get_permissions()
     
 
-class FAQViewSet(BaseViews):
+class FAQViewSet(PublicCacheMixin, BaseViews):
     model_name = FAQ
-    methods = ["list", "retrieve", "create", "update", "partial_update", "destroy", "soft_delete", "change_status", "restore_soft_deleted"]
+    methods = ["list", "retrieve", "create", "update", "partial_update", "destroy", "soft_delete", "change_status", "restore_soft_deleted", "bulk_create", "bulk_update", "bulk_soft_delete"]
     queryset = FAQ.objects.all()
     serializer_class = FAQSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -34,9 +34,9 @@ class FAQViewSet(BaseViews):
             self.permission_classes = [permissions.IsAuthenticated]
         return super().get_permissions()
     
-class BannerLMSViewSet(BaseViews):
+class BannerLMSViewSet(PublicCacheMixin, BaseViews):
     model_name = BannerLMS
-    methods = ["list", "retrieve", "create", "update", "partial_update", "destroy", "soft_delete", "change_status", "restore_soft_deleted"]
+    methods = ["list", "retrieve", "create", "update", "partial_update", "destroy", "soft_delete", "change_status", "restore_soft_deleted", "bulk_create", "bulk_update", "bulk_soft_delete"]
     queryset = BannerLMS.objects.all()
     serializer_class = BannerLMSSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -50,9 +50,9 @@ class BannerLMSViewSet(BaseViews):
     
 
 
-class TestimonialViewSet(BaseViews):
+class TestimonialViewSet(PublicCacheMixin, BaseViews):
     model_name = Testimonial
-    methods = ["list", "retrieve", "create", "update", "partial_update", "destroy", "soft_delete", "change_status", "restore_soft_deleted"]
+    methods = ["list", "retrieve", "create", "update", "partial_update", "destroy", "soft_delete", "change_status", "restore_soft_deleted", "bulk_create", "bulk_update", "bulk_soft_delete"]
     queryset = Testimonial.objects.all()
     serializer_class = TestimonialSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -66,9 +66,9 @@ class TestimonialViewSet(BaseViews):
     
 
 
-class BlogViewSet(BaseViews):
+class BlogViewSet(PublicCacheMixin, BaseViews):
     model_name = Blog
-    methods = ["list", "retrieve", "create", "update", "partial_update", "destroy", "soft_delete", "change_status", "restore_soft_deleted"]
+    methods = ["list", "retrieve", "create", "update", "partial_update", "destroy", "soft_delete", "change_status", "restore_soft_deleted", "bulk_create", "bulk_update", "bulk_soft_delete"]
     queryset = Blog.objects.all()
     serializer_class = BlogSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -80,9 +80,9 @@ class BlogViewSet(BaseViews):
             self.permission_classes = [permissions.IsAuthenticated]
         return super().get_permissions()
     
-class BannerViewSet(BaseViews):
+class BannerViewSet(PublicCacheMixin, BaseViews):
     model_name = Banner
-    methods = ["list", "retrieve", "create", "update", "partial_update", "destroy", "soft_delete", "change_status", "restore_soft_deleted"]
+    methods = ["list", "retrieve", "create", "update", "partial_update", "destroy", "soft_delete", "change_status", "restore_soft_deleted", "bulk_create", "bulk_update", "bulk_soft_delete"]
     queryset = Banner.objects.all()
     serializer_class = BannerSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -94,9 +94,9 @@ class BannerViewSet(BaseViews):
             self.permission_classes = [permissions.IsAuthenticated]
         return super().get_permissions()
     
-class CounterViewSet(BaseViews):
+class CounterViewSet(PublicCacheMixin, BaseViews):
     model_name = Counter
-    methods = ["list", "retrieve", "create", "update", "partial_update", "destroy", "soft_delete", "change_status", "restore_soft_deleted"]
+    methods = ["list", "retrieve", "create", "update", "partial_update", "destroy", "soft_delete", "change_status", "restore_soft_deleted", "bulk_create", "bulk_update", "bulk_soft_delete"]
     queryset = Counter.objects.all()
     serializer_class = CounterSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -108,9 +108,9 @@ class CounterViewSet(BaseViews):
             self.permission_classes = [permissions.IsAuthenticated]
         return super().get_permissions()
     
-class FacilitiesViewSet(BaseViews):
+class FacilitiesViewSet(PublicCacheMixin, BaseViews):
     model_name = Facilities
-    methods = ["list", "retrieve", "create", "update", "partial_update", "destroy", "soft_delete", "change_status", "restore_soft_deleted"]
+    methods = ["list", "retrieve", "create", "update", "partial_update", "destroy", "soft_delete", "change_status", "restore_soft_deleted", "bulk_create", "bulk_update", "bulk_soft_delete"]
     queryset = Facilities.objects.all()
     serializer_class = FacilitiesSerializer
     permission_classes = [permissions.IsAuthenticated]
@@ -122,9 +122,9 @@ class FacilitiesViewSet(BaseViews):
             self.permission_classes = [permissions.IsAuthenticated]
         return super().get_permissions()
     
-class SpecialCtaViewSet(BaseViews):
+class SpecialCtaViewSet(PublicCacheMixin, BaseViews):
     model_name = SpecialCta
-    methods = ["list", "retrieve", "create", "update", "partial_update", "destroy", "soft_delete", "change_status", "restore_soft_deleted"]
+    methods = ["list", "retrieve", "create", "update", "partial_update", "destroy", "soft_delete", "change_status", "restore_soft_deleted", "bulk_create", "bulk_update", "bulk_soft_delete"]
     queryset = SpecialCta.objects.all()
     serializer_class = SpecialCtasSerializer
     permission_classes = [permissions.IsAuthenticated]
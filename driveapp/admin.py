@@ -1,15 +1,20 @@
 from django.contrib import admin
 
-from driveapp.models import District, District2, Division, Division2, Mouzamapdata, SubDistrict
+from driveapp.models import District, District2, Division, Division2, DriveNode, DriveSyncState, Mouzamapdata, SubDistrict
 
 # Register your models here.
 class MouzamapdataAdmin(admin.ModelAdmin):
     search_fields = ['district_name']  # Replace with actual field names you want to search by
 class SubDistrictAdmin(admin.ModelAdmin):
     search_fields = ['name']  # Replace with actual field names you want to search by
+class DriveNodeAdmin(admin.ModelAdmin):
+    search_fields = ['name', 'file_id', 'full_path']
+    list_display = ['name', 'mime_type', 'full_path', 'synced_at']
 admin.site.register(Mouzamapdata, MouzamapdataAdmin)
 admin.site.register(Division)
 admin.site.register(District)
 admin.site.register(District2)
 admin.site.register(Division2)
-admin.site.register(SubDistrict,SubDistrictAdmin)
\ No newline at end of file
+admin.site.register(SubDistrict,SubDistrictAdmin)
+admin.site.register(DriveNode, DriveNodeAdmin)
+admin.site.register(DriveSyncState)
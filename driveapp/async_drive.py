@@ -0,0 +1,341 @@
+"""
+Async Drive access for the ASGI views in driveapp.async_views.
+
+Talks to the Drive v3 REST API through httpx, so a worker can keep many
+Drive calls in flight without a thread each. The calls made inside a
+`session()` block share one AsyncClient, which is closed when the block
+exits; under WSGI every request runs on a fresh event loop, so clients must
+not outlive the request. Credentials, the local index, the in-process caches, the preview cache
+and the render pool are the same ones the sync code uses; only their
+blocking parts are pushed to threads.
+"""
+import asyncio
+import contextvars
+import random
+from contextlib import asynccontextmanager
+
+import httpx
+from asgiref.sync import sync_to_async
+
+from driveapp.drive_cache import folder_cache, metadata_cache, shortcut_cache
+from driveapp.drive_index import IndexMiss, index_ready, search_indexed_files, traverse_indexed_path
+from driveapp.drive_utils import (
+    DRIVE_STREAM_CHUNK_SIZE,
+    FOLDER_MIME,
+    ROOT_FOLDER_NAME,
+    SHORTCUT_MIME,
+    SHORTCUT_QUERY_CHUNK,
+    file_sort_key,
+    get_drive_credentials,
+    merge_sorted_runs,
+    name_query,
+)
+
+DRIVE_API = 'https://www.googleapis.com/drive/v3'
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+MAX_ATTEMPTS = 5
+DEFAULT_CONCURRENCY = 20
+
+_client = contextvars.ContextVar('drive_client', default=None)
+
+
+class DriveAPIError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+def new_client():
+    return httpx.AsyncClient(
+        base_url=DRIVE_API,
+        timeout=httpx.Timeout(60, connect=10),
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+    )
+
+
+@asynccontextmanager
+async def session():
+    """
+    Share one AsyncClient among the Drive calls made in this block (and the
+    tasks it starts) and close it on exit. Nested blocks reuse the outer client.
+    """
+    if _client.get() is not None:
+        yield
+        return
+    async with new_client() as client:
+        token = _client.set(client)
+        try:
+            yield
+        finally:
+            _client.reset(token)
+
+
+async def auth_headers():
+    # Token refresh is a blocking call, shared with the sync client through the credentials lock
+    credentials = await sync_to_async(get_drive_credentials, thread_sensitive=False)()
+    return {'Authorization': f'Bearer {credentials.token}'}
+
+
+async def drive_request(method, url, params=None, headers=None, client=None):
+    """One Drive call, retried with jittered backoff on 429/5xx and connection errors."""
+    client = client or _client.get()
+    if client is None:
+        async with session():
+            return await drive_request(method, url, params, headers)
+    for attempt in range(MAX_ATTEMPTS):
+        request_headers = dict(await auth_headers(), **(headers or {}))
+        try:
+            response = await client.request(method, url, params=params, headers=request_headers)
+        except httpx.TransportError as e:
+            if attempt == MAX_ATTEMPTS - 1:
+                raise DriveAPIError(503, str(e))
+        else:
+            if response.status_code not in RETRY_STATUSES or attempt == MAX_ATTEMPTS - 1:
+                if response.status_code >= 400:
+                    raise DriveAPIError(response.status_code, response.text)
+                return response
+        await asyncio.sleep(0.5 * (2 ** attempt) * (0.5 + random.random()))
+
+
+async def get_file(file_id, fields):
+    response = await drive_request('GET', f'/files/{file_id}', params={'fields': fields})
+    return response.json()
+
+
+async def list_files(query, fields, page_size=1000, order_by=None, page_token=None):
+    params = {'q': query, 'spaces': 'drive', 'fields': f'nextPageToken, files({fields})', 'pageSize': page_size}
+    if order_by:
+        params['orderBy'] = order_by
+    if page_token:
+        params['pageToken'] = page_token
+    response = await drive_request('GET', '/files', params=params)
+    return response.json()
+
+
+async def iter_query_pages(query, fields):
+    page_token = None
+    while True:
+        results = await list_files(query, fields, page_token=page_token)
+        yield results.get('files', [])
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            break
+
+
+async def get_file_metadata(file_id):
+    """Async drive_utils.get_file_metadata, sharing its cache."""
+    metadata = metadata_cache.get(file_id)
+    if metadata is not None:
+        return metadata
+    fields = 'id, name, mimeType, md5Checksum, modifiedTime, size, shortcutDetails'
+    metadata = await get_file(file_id, fields)
+    if metadata['mimeType'] == SHORTCUT_MIME:
+        target = await get_file(metadata.get('shortcutDetails', {}).get('targetId'), fields)
+        metadata = dict(target, name=metadata['name'])
+    metadata_cache.set(file_id, metadata)
+    return metadata
+
+
+async def iter_media(file_id, start=0, end=None, chunk_size=DRIVE_STREAM_CHUNK_SIZE):
+    """Async drive_utils.iter_drive_media: the file's bytes one ranged request per chunk."""
+    # Streamed responses outlive the view's session, so the stream owns its client
+    async with new_client() as client:
+        position = start
+        while end is None or position <= end:
+            chunk_end = position + chunk_size - 1 if end is None else min(position + chunk_size - 1, end)
+            try:
+                response = await drive_request(
+                    'GET', f'/files/{file_id}', params={'alt': 'media'},
+                    headers={'Range': f'bytes={position}-{chunk_end}'}, client=client,
+                )
+            except DriveAPIError as e:
+                if e.status == 416:
+                    break
+                raise
+            content = response.content
+            if not content:
+                break
+            yield content
+            position += len(content)
+            if response.status_code == 200 or (end is None and len(content) < chunk_size):
+                break
+
+
+async def download(file_id):
+    return b''.join([chunk async for chunk in iter_media(file_id)])
+
+
+# --- browsing ---
+
+async def fetch_shortcut_folders(target_ids):
+    query = "(" + " or ".join(f"'{target_id}' in parents" for target_id in target_ids) + ") and trashed=false"
+    contents = {target_id: [] for target_id in target_ids}
+    async for page in iter_query_pages(query, 'id, name, mimeType, parents'):
+        for item in page:
+            if item['mimeType'] == FOLDER_MIME:
+                continue
+            for parent_id in item.get('parents', []):
+                if parent_id in contents:
+                    contents[parent_id].append({'name': item['name'], 'id': item['id']})
+    for files in contents.values():
+        files.sort(key=file_sort_key)
+    return contents
+
+
+async def resolve_shortcut_folders(target_ids):
+    target_ids = list(dict.fromkeys(target_ids))
+    resolved = shortcut_cache.get_many(target_ids)
+    missing = [target_id for target_id in target_ids if target_id not in resolved]
+    chunks = [missing[i:i + SHORTCUT_QUERY_CHUNK] for i in range(0, len(missing), SHORTCUT_QUERY_CHUNK)]
+    for contents in await asyncio.gather(*(fetch_shortcut_folders(chunk) for chunk in chunks)):
+        for target_id, files in contents.items():
+            shortcut_cache.set(target_id, files)
+            resolved[target_id] = files
+    return resolved
+
+
+async def traverse_drive_path(path):
+    """Async drive_utils.traverse_drive_path."""
+    current_folder_id = None
+    for folder_name in (path.split('/') if path else [ROOT_FOLDER_NAME]):
+        query = f"mimeType='{FOLDER_MIME}' and name='{folder_name}' and trashed=false"
+        if current_folder_id:
+            query += f" and '{current_folder_id}' in parents"
+        folder_list = (await list_files(query, 'id, name', page_size=10)).get('files', [])
+        if not folder_list:
+            raise Exception(f"Folder '{folder_name}' not found.")
+        current_folder_id = folder_list[0]['id']
+
+    folders = []
+    runs = []
+    shortcut_targets = []
+    query = f"'{current_folder_id}' in parents and trashed=false"
+    async for page in iter_query_pages(query, 'id, name, mimeType, shortcutDetails'):
+        files = []
+        for item in page:
+            if item['mimeType'] == FOLDER_MIME:
+                folders.append(item['name'])
+            elif item['mimeType'] == SHORTCUT_MIME:
+                shortcut = item.get('shortcutDetails', {})
+                target_id = shortcut.get('targetId')
+                if target_id and shortcut.get('targetMimeType') == FOLDER_MIME:
+                    shortcut_targets.append(target_id)
+                elif target_id:
+                    files.append({'name': item['name'], 'id': target_id})
+            else:
+                files.append({'name': item['name'], 'id': item['id']})
+        runs.append(sorted(files, key=file_sort_key))
+
+    if folders:
+        return {'folders': folders}
+    if shortcut_targets:
+        runs.extend((await resolve_shortcut_folders(shortcut_targets)).values())
+    return {'files': merge_sorted_runs(runs)}
+
+
+async def browse_drive_path(path):
+    """Async drive_index.browse_drive_path: local index first, then Drive."""
+    if await sync_to_async(index_ready)():
+        try:
+            return await sync_to_async(traverse_indexed_path)(path)
+        except IndexMiss:
+            pass
+    return await traverse_drive_path(path)
+
+
+# --- searching ---
+
+async def prefetch_folders(folder_ids):
+    missing = [folder_id for folder_id in dict.fromkeys(folder_ids) if folder_cache.get(folder_id) is None]
+
+    async def fetch(folder_id):
+        try:
+            folder = await get_file(folder_id, 'id, name, parents')
+        except DriveAPIError:
+            return  # an unreadable folder ends the path there
+        parents = folder.get('parents') or []
+        folder_cache.set(folder['id'], (folder['name'], parents[0] if parents else None))
+
+    await asyncio.gather(*(fetch(folder_id) for folder_id in missing))
+
+
+async def resolve_paths(files):
+    """Async drive_utils.resolve_paths: one concurrent round per tree level of unseen folders."""
+    chains = [[file['name']] for file in files]
+    cursors = [(file.get('parents') or [None])[0] for file in files]
+    visited = [set() for _ in files]
+    while any(cursors):
+        await prefetch_folders([parent_id for parent_id in cursors if parent_id])
+        for index, parent_id in enumerate(cursors):
+            if not parent_id:
+                continue
+            entry = folder_cache.get(parent_id)
+            if entry is None or parent_id in visited[index]:
+                cursors[index] = None
+                continue
+            visited[index].add(parent_id)
+            name, grandparent_id = entry
+            chains[index].append(name)
+            cursors[index] = grandparent_id
+    return ["/".join(reversed(chain)) for chain in chains]
+
+
+async def search_live(file_name):
+    results = await list_files(
+        name_query(file_name), 'id, name, mimeType, parents', page_size=10, order_by='modifiedTime desc'
+    )
+    return results.get('files', [])
+
+
+async def search_file_by_name(file_name):
+    """Async drive_utils.search_file_by_name."""
+    files = await sync_to_async(search_indexed_files)(file_name)
+    if files is not None:
+        return files
+    files = await search_live(file_name)
+    for file, full_path in zip(files, await resolve_paths(files)):
+        file['fullPath'] = full_path
+    return files
+
+
+async def batch_search_files(file_names, concurrency=DEFAULT_CONCURRENCY, item_timeout=30):
+    """
+    Async drive_utils.batch_search_files: every name is its own coroutine,
+    at most `concurrency` of them talking to Drive at once.
+    """
+    unique_files = list(dict.fromkeys(file_names))
+    results = {}
+    failed_files = []
+
+    if await sync_to_async(index_ready)():
+        def search_all():
+            return {name: search_indexed_files(name, check_ready=False) for name in unique_files}
+        results = await sync_to_async(search_all)()
+    else:
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def search(file_name):
+            async with semaphore:
+                return await asyncio.wait_for(search_live(file_name), item_timeout)
+
+        outcomes = await asyncio.gather(*(search(name) for name in unique_files), return_exceptions=True)
+        found = []
+        for file_name, outcome in zip(unique_files, outcomes):
+            if isinstance(outcome, asyncio.TimeoutError):
+                failed_files.append({'file_name': file_name, 'error': f"Search timeout for file: {file_name}"})
+            elif isinstance(outcome, Exception):
+                failed_files.append({'file_name': file_name, 'error': str(outcome)})
+            else:
+                results[file_name] = outcome
+                found.extend(outcome)
+        # Paths for all hits together, so shared ancestors are fetched once
+        for file, full_path in zip(found, await resolve_paths(found)):
+            file['fullPath'] = full_path
+
+    return {
+        'results': results,
+        'failed_files': failed_files,
+        'total_files': len(unique_files),
+        'successful_files': len(results)
+    }
+
@@ -0,0 +1,244 @@
+"""
+Async (ASGI) versions of the Drive views, served under api/drive/async/.
+
+Same parameters and responses as their counterparts in driveapp.views, but
+Drive is reached through driveapp.async_drive, so waiting on Drive does not
+hold a worker thread. Rendering goes to the process pool with arender().
+Under WSGI they still work, and file downloads fall back to the sync
+chunked iterator so they keep streaming.
+"""
+import logging
+import os
+from urllib.parse import unquote
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
+from django.views import View
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.authentication import JWTAuthentication
+
+from driveapp import async_drive
+from driveapp.drive_utils import PREVIEW_EXTENSIONS, get_drive_service, iter_drive_media, parse_range_header
+from driveapp.preview_cache import evict, file_version, preview_key, preview_path, touch, write_atomic
+from driveapp.rendering import RenderBusy, arender, convert_job, preview_job
+from driveapp.views import RENDER_PARAMS, DriveFileConvertView, paginate_listing
+from others.manifest import failed_result, manifest_page, needs_resolving, page_response, store_results
+
+logger = logging.getLogger(__name__)
+
+
+async def authenticate(request):
+    """The JWT user of the request, or None."""
+    try:
+        result = await sync_to_async(JWTAuthentication().authenticate)(request)
+    except AuthenticationFailed:
+        return None
+    return result[0] if result else None
+
+
+def read_file(path):
+    with open(path, 'rb') as handle:
+        return handle.read()
+
+
+def original_response(data, metadata):
+    response = HttpResponse(data, content_type=metadata['mimeType'])
+    response['Content-Disposition'] = content_disposition_header(False, metadata['name'])
+    return response
+
+
+def iter_drive_file(file_id, start, end):
+    # Started lazily, so it runs on the thread (and Drive client) that sends the response
+    yield from iter_drive_media(get_drive_service(), file_id, start, end)
+
+
+def media_iterator(request, file_id, start, end):
+    """
+    Chunks of the file for a StreamingHttpResponse. Under WSGI Django reads an
+    async iterator into memory before sending it, so there the sync one is used.
+    """
+    if isinstance(request, ASGIRequest):
+        return async_drive.iter_media(file_id, start, end)
+    return iter_drive_file(file_id, start, end)
+
+
+async def stream_drive_file(request, metadata, filename=None):
+    """Async drive_utils.stream_drive_file."""
+    size = int(metadata.get('size') or 0)
+    try:
+        byte_range = parse_range_header(request.headers.get('Range'), size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            media_iterator(request, metadata['id'], start, end), status=206, content_type=metadata['mimeType']
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        response = StreamingHttpResponse(
+            media_iterator(request, metadata['id'], 0, size - 1 if size else None), content_type=metadata['mimeType']
+        )
+        if size:
+            response['Content-Length'] = str(size)
+    if size:
+        response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = content_disposition_header(False, filename or metadata['name'])
+    return response
+
+
+class AsyncDriveView(View):
+    """Async view whose Drive calls share one client, closed once the response is built."""
+
+    async def dispatch(self, request, *args, **kwargs):
+        async with async_drive.session():
+            return await super().dispatch(request, *args, **kwargs)
+
+
+class AsyncDriveExplorerView(AsyncDriveView):
+    async def get(self, request, *args, **kwargs):
+        path = unquote(kwargs.get("path", ""))
+        try:
+            offset = int(request.GET.get('offset') or 0)
+            limit = int(request.GET['limit']) if request.GET.get('limit') else None
+            if offset < 0 or (limit is not None and limit < 0):
+                raise ValueError
+        except ValueError:
+            return JsonResponse({'error': 'offset and limit must be non-negative integers'}, status=400)
+
+        try:
+            result = await async_drive.browse_drive_path(path)
+            if 'offset' in request.GET or 'limit' in request.GET:
+                result = paginate_listing(result, offset, limit)
+            return JsonResponse(result, safe=False, json_dumps_params={'ensure_ascii': False})
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+
+class AsyncDriveFileSearchView(AsyncDriveView):
+    async def get(self, request, *args, **kwargs):
+        file_name = request.GET.get("filename")
+        if not file_name:
+            return JsonResponse({'error': 'Missing "filename" query parameter'}, status=400)
+
+        try:
+            files = await async_drive.search_file_by_name(unquote(file_name))
+            return JsonResponse({'files': files}, json_dumps_params={'ensure_ascii': False})
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+
+class AsyncDriveFilePreviewByIdView(AsyncDriveView):
+    target_kb = 200
+
+    async def get(self, request, *args, **kwargs):
+        file_id = request.GET.get("file_id")
+        if not file_id:
+            return JsonResponse({'error': 'Missing "file_id" query parameter'}, status=400)
+
+        try:
+            metadata = await async_drive.get_file_metadata(file_id)
+            name = metadata['name']
+            ext = os.path.splitext(name)[1].lower()
+            version = file_version(metadata)
+            if ext not in PREVIEW_EXTENSIONS:
+                return await stream_drive_file(request, metadata)
+
+            key = preview_key(metadata['id'], version, self.target_kb) if version else None
+            path = preview_path(key) if key else None
+            failed_path = preview_path(key, '.failed') if key else None
+            if path and touch(path):
+                data = await sync_to_async(read_file, thread_sensitive=False)(path)
+            elif failed_path and touch(failed_path):
+                # Failed to render before, see preview_cache.cached_preview
+                return await stream_drive_file(request, metadata)
+            else:
+                original = await async_drive.download(metadata['id'])
+                try:
+                    data = await arender(preview_job, original, ext, self.target_kb)
+                except RenderBusy:
+                    raise
+                except Exception:
+                    logger.warning("Preview of %s failed, serving the original", metadata['id'], exc_info=True)
+                    data = None
+                if data is None:
+                    if failed_path:
+                        await sync_to_async(write_atomic, thread_sensitive=False)(failed_path, b'')
+                    # Already downloaded for the render attempt
+                    return original_response(original, metadata)
+                if path:
+                    await sync_to_async(write_atomic, thread_sensitive=False)(path, data)
+                    await sync_to_async(evict, thread_sensitive=False)()
+
+            response = HttpResponse(data, content_type='image/jpeg')
+            response['Content-Disposition'] = content_disposition_header(False, f"preview_{name}.jpg")
+            return response
+        except RenderBusy as e:
+            return JsonResponse({'error': str(e)}, status=503, headers={'Retry-After': '5'})
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+
+class AsyncDriveFileConvertView(AsyncDriveView):
+    async def get(self, request, *args, **kwargs):
+        file_id = request.GET.get("file_id")
+        target_format = request.GET.get("format", "").lower()
+        render_request = any(param in request.GET for param in RENDER_PARAMS)
+
+        if not file_id or (target_format not in ["pdf", "jpg"] and not render_request):
+            return JsonResponse({'error': 'Invalid file_id or format'}, status=400)
+
+        try:
+            if render_request:
+                # Pages and tiles are rendering bound; reuse the sync implementation on a thread
+                render_variant = sync_to_async(DriveFileConvertView().render_variant, thread_sensitive=False)
+                return await render_variant(request, file_id, target_format)
+
+            metadata = await async_drive.get_file_metadata(file_id)
+            mime_type = metadata['mimeType']
+            if (target_format == "pdf" and mime_type != "application/pdf") or \
+               (target_format == "jpg" and mime_type not in ["image/jpeg", "image/png"]):
+                original = await async_drive.download(metadata['id'])
+                data, mime_type, filename = await arender(convert_job, original, mime_type, target_format)
+                response = HttpResponse(data, content_type=mime_type)
+                response['Content-Disposition'] = content_disposition_header(False, filename)
+                return response
+
+            return await stream_drive_file(request, metadata)
+        except RenderBusy as e:
+            return JsonResponse({'error': str(e)}, status=503, headers={'Retry-After': '5'})
+        except Exception as e:
+            return JsonResponse({'error': str(e)}, status=500)
+
+
+class AsyncUserPurchasedFilesView(AsyncDriveView):
+    async def get(self, request, *args, **kwargs):
+        user = await authenticate(request)
+        if user is None:
+            return JsonResponse({'detail': 'Authentication credentials were not provided.'}, status=401)
+
+        page = int(request.GET.get('page', 1))
+        page_size = int(request.GET.get('page_size', 5))
+
+        try:
+            page, page_size, rows, total_files = await sync_to_async(manifest_page)(user, page, page_size)
+            # Names not resolved yet are searched concurrently on the event loop
+            pending = [row for row in rows if needs_resolving(row)]
+            if pending:
+                try:
+                    batch_result = await async_drive.batch_search_files([row.name for row in pending])
+                except Exception as e:
+                    batch_result = failed_result(pending, e)
+                await sync_to_async(store_results)(pending, batch_result)
+            return JsonResponse(page_response(rows, page, page_size, total_files))
+        except Exception as e:
+            return JsonResponse({
+                "error": "Failed to fetch purchased files",
+                "details": str(e)
+            }, status=500)
@@ -0,0 +1,176 @@
+"""
+Batched live Drive name searches.
+
+Each name becomes one `files().list` sub-request and up to DRIVE_BATCH_LIMIT
+of them travel in a single BatchHttpRequest. Batches run in waves on worker
+threads (each with its own Drive client); the number of batches per wave and
+their size grow while Drive keeps up and are halved when it answers 429 or
+5xx. Throttled or failed sub-requests are retried with exponential backoff
+until they succeed, run out of attempts or pass their own deadline, which
+starts when the name is first sent.
+"""
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from googleapiclient.errors import HttpError
+
+from driveapp.drive_utils import DRIVE_BATCH_LIMIT, get_drive_service, name_query, resolve_paths
+from driveapp.lookup_cache import ERROR, name_lookups
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+SEARCH_FIELDS = 'files(id, name, mimeType, parents)'
+
+
+class BatchSearch:
+    def __init__(self, file_names, max_workers=4, item_timeout=30, max_attempts=5,
+                 batch_size=DRIVE_BATCH_LIMIT, backoff=0.5):
+        self.names = list(dict.fromkeys(file_names))
+        self.max_workers = max(1, max_workers)
+        self.item_timeout = item_timeout
+        self.max_attempts = max_attempts
+        self.max_batch_size = min(batch_size, DRIVE_BATCH_LIMIT)
+        self.backoff = backoff
+
+        self.concurrency = 1
+        self.batch_size = self.max_batch_size
+        self.results = {}
+        self.errors = {}
+        self.attempts = dict.fromkeys(self.names, 0)
+
+    def run_batch(self, names):
+        """One BatchHttpRequest. Returns {name: files} and {name: (status, error)}."""
+        service = get_drive_service()
+        found = {}
+        failed = {}
+
+        def collect(request_id, response, exception):
+            name = names[int(request_id)]
+            if exception is None:
+                found[name] = response.get('files', [])
+            else:
+                status = exception.resp.status if isinstance(exception, HttpError) else None
+                failed[name] = (status, str(exception))
+
+        batch = service.new_batch_http_request(callback=collect)
+        for index, name in enumerate(names):
+            request = service.files().list(
+                q=name_query(name),
+                spaces='drive',
+                fields=SEARCH_FIELDS,
+                pageSize=10,
+                orderBy='modifiedTime desc',
+            )
+            batch.add(request, request_id=str(index))
+        try:
+            batch.execute()
+        except Exception as e:
+            # The whole batch failed (connection, auth); everything not answered is retryable
+            status = e.resp.status if isinstance(e, HttpError) else 503
+            for name in names:
+                if name not in found and name not in failed:
+                    failed[name] = (status, str(e))
+        return found, failed
+
+    def adapt(self, throttled):
+        # Additive increase, multiplicative decrease
+        if throttled:
+            self.concurrency = max(1, self.concurrency // 2)
+            self.batch_size = max(10, self.batch_size // 2)
+        else:
+            self.concurrency = min(self.max_workers, self.concurrency + 1)
+            self.batch_size = min(self.max_batch_size, self.batch_size * 2)
+
+    def run(self):
+        # Each name gets item_timeout from the wave it is first sent in, so names
+        # queued behind slow or throttled waves are not timed out before they are tried
+        deadlines = {}
+        pending = list(self.names)
+        wave = 0
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while pending:
+                now = time.monotonic()
+                expired = {name for name in pending if name in deadlines and deadlines[name] <= now}
+                for name in expired:
+                    self.errors.setdefault(name, f"Search timeout for file: {name}")
+                pending = [name for name in pending if name not in expired]
+                if not pending:
+                    break
+
+                take = pending[:self.batch_size * self.concurrency]
+                pending = pending[len(take):]
+                for name in take:
+                    deadlines.setdefault(name, now + self.item_timeout)
+                chunks = [take[i:i + self.batch_size] for i in range(0, len(take), self.batch_size)]
+
+                throttled = False
+                retry = []
+                for found, failed in executor.map(self.run_batch, chunks):
+                    self.results.update(found)
+                    for name, (status, error) in failed.items():
+                        self.attempts[name] += 1
+                        self.errors[name] = error
+                        if status in RETRY_STATUSES and self.attempts[name] < self.max_attempts:
+                            throttled = True
+                            retry.append(name)
+                self.adapt(throttled)
+
+                if retry:
+                    for name in retry:
+                        self.errors.pop(name, None)
+                    pending = retry + pending
+                    wave += 1
+                    delay = self.backoff * (2 ** min(wave, 6)) * (0.5 + random.random())
+                    first_deadline = min(deadlines[name] for name in retry)
+                    time.sleep(max(0, min(delay, first_deadline - time.monotonic())))
+                else:
+                    wave = 0
+        return self.results, self.errors
+
+
+def fetch_names(names, max_workers=4, item_timeout=30):
+    """BatchSearch with full paths: ({name: files}, {name: error})."""
+    found, failed = BatchSearch(names, max_workers=max_workers, item_timeout=item_timeout).run()
+
+    # All paths in one go so shared ancestors are fetched once
+    files = [file for matches in found.values() for file in matches]
+    for file, full_path in zip(files, resolve_paths(get_drive_service(), files)):
+        file['fullPath'] = full_path
+    return found, failed
+
+
+def search_names_batched(file_names, max_workers=4, item_timeout=30):
+    """
+    {name: files} for names found (or not) on Drive and {name: error} for names
+    that could not be searched. Shares name_lookups with search_file_by_name_with_cache:
+    fresh entries (including recent misses and errors) are answered from it,
+    stale ones too while they are refreshed together in the background.
+    """
+    names = list(dict.fromkeys(file_names))
+    results = {}
+    errors = {}
+    lookup = []
+    stale = []
+    for name in names:
+        entry = name_lookups.peek(name)
+        if entry is None or (entry['kind'] == ERROR and not name_lookups.is_fresh(entry)):
+            lookup.append(name)
+        elif entry['kind'] == ERROR:
+            errors[name] = entry['error']
+        else:
+            if not name_lookups.is_fresh(entry):
+                stale.append(name)
+            results[name] = entry['files']
+    if stale:
+        name_lookups.revalidate(stale, lambda names: fetch_names(names, max_workers, item_timeout))
+    if not lookup:
+        return results, errors
+
+    found, failed = fetch_names(lookup, max_workers=max_workers, item_timeout=item_timeout)
+    for name, matches in found.items():
+        results[name] = matches
+        name_lookups.store(name, files=matches)
+    for name, error in failed.items():
+        errors[name] = error
+        name_lookups.store(name, error=error)
+    return results, errors
@@ -0,0 +1,80 @@
+"""
+In-process caches for Drive metadata that is shared by every request and
+thread of a worker.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+MISSING = object()
+
+
+class TTLCache:
+    """Thread-safe LRU bounded to `maxsize` entries, each valid for `ttl` seconds."""
+
+    def __init__(self, maxsize=10000, ttl=3600):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._data.get(key, MISSING)
+            if entry is MISSING:
+                return default
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def get_many(self, keys):
+        found = {}
+        for key in keys:
+            value = self.get(key, MISSING)
+            if value is not MISSING:
+                found[key] = value
+        return found
+
+    def set(self, key, value, ttl=None):
+        expires = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+# Folder id -> (name, parent id or None)
+folder_cache = TTLCache(
+    maxsize=getattr(settings, 'DRIVE_FOLDER_CACHE_SIZE', 20000),
+    ttl=getattr(settings, 'DRIVE_FOLDER_CACHE_TTL', 3600),
+)
+
+# File id -> resolved metadata (see drive_utils.get_file_metadata); short TTL so
+# a new upload is picked up within a minute
+metadata_cache = TTLCache(
+    maxsize=getattr(settings, 'DRIVE_METADATA_CACHE_SIZE', 5000),
+    ttl=getattr(settings, 'DRIVE_METADATA_CACHE_TTL', 60),
+)
+
+# Shortcut target folder id -> its files, as listed by traverse_drive_path
+shortcut_cache = TTLCache(
+    maxsize=getattr(settings, 'DRIVE_SHORTCUT_CACHE_SIZE', 5000),
+    ttl=getattr(settings, 'DRIVE_SHORTCUT_CACHE_TTL', 600),
+)
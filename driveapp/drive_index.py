@@ -0,0 +1,280 @@
+"""
+Local mirror of the Drive folder tree.
+
+`full_sync` crawls everything under the root folder (following shortcut
+folders) into DriveNode rows; `incremental_sync` then applies the Drive
+`changes` feed from the stored page token. Both run from the
+`sync_drive_index` management command. DriveExplorerView answers from the
+mirror once a full sync has completed and falls back to live Drive calls
+for anything the mirror does not know yet. Filename searches are answered
+from the same rows, see driveapp.drive_search.
+"""
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from driveapp.drive_search import delete_names, index_names, rebuild_names, refresh_paths, search_names
+from driveapp.drive_utils import (
+    FOLDER_MIME,
+    ROOT_FOLDER_NAME,
+    SHORTCUT_MIME,
+    extract_sort_keys,
+    get_drive_service,
+    list_folder_items,
+    normalize_file_name,
+    traverse_drive_path,
+)
+from driveapp.models import DriveNode, DriveSyncState
+
+FILE_FIELDS = 'id, name, mimeType, parents, trashed, shortcutDetails, modifiedTime'
+UPSERT_FIELDS = [
+    'name', 'search_name', 'parent_id', 'mime_type', 'shortcut_target_id', 'shortcut_target_mime',
+    'modified_time', 'synced_at',
+]
+BATCH_SIZE = 500
+
+
+class IndexMiss(Exception):
+    """The requested path is not (yet) in the local index."""
+
+
+def node_from_file(item):
+    shortcut = item.get('shortcutDetails') or {}
+    parents = item.get('parents') or []
+    return DriveNode(
+        file_id=item['id'],
+        name=item.get('name', ''),
+        search_name=normalize_file_name(item.get('name', '')),
+        parent_id=parents[0] if parents else None,
+        mime_type=item.get('mimeType', ''),
+        shortcut_target_id=shortcut.get('targetId'),
+        shortcut_target_mime=shortcut.get('targetMimeType'),
+        modified_time=parse_datetime(item['modifiedTime']) if item.get('modifiedTime') else None,
+    )
+
+
+def upsert_nodes(items):
+    nodes = [node_from_file(item) for item in items]
+    if nodes:
+        DriveNode.objects.bulk_create(
+            nodes,
+            batch_size=BATCH_SIZE,
+            update_conflicts=True,
+            unique_fields=['file_id'],
+            update_fields=UPSERT_FIELDS,
+        )
+    return nodes
+
+
+def delete_subtrees(file_ids):
+    """Remove nodes and everything below them."""
+    pending = list(file_ids)
+    while pending:
+        batch, pending = pending[:BATCH_SIZE], pending[BATCH_SIZE:]
+        pending.extend(DriveNode.objects.filter(parent_id__in=batch).values_list('file_id', flat=True))
+        DriveNode.objects.filter(file_id__in=batch).delete()
+        delete_names(batch)
+
+
+def find_root_folder(service, root_name=ROOT_FOLDER_NAME):
+    results = service.files().list(
+        q=f"mimeType='{FOLDER_MIME}' and name='{root_name}' and trashed=false",
+        spaces='drive',
+        fields=f'files({FILE_FIELDS})',
+    ).execute()
+    folders = results.get('files', [])
+    if not folders:
+        raise Exception(f"Folder '{root_name}' not found.")
+    return folders[0]
+
+
+def full_sync(service=None, root_name=ROOT_FOLDER_NAME, log=None):
+    service = service or get_drive_service()
+    started = timezone.now()
+    # Take the changes token first so nothing changed during the crawl is missed
+    start_token = service.changes().getStartPageToken().execute()['startPageToken']
+
+    root = find_root_folder(service, root_name)
+    upsert_nodes([root])
+    queue = [root['id']]
+    visited = set()
+    count = 1
+    while queue:
+        folder_id = queue.pop()
+        if folder_id in visited:
+            continue
+        visited.add(folder_id)
+        batch = []
+        for item in list_folder_items(service, folder_id, FILE_FIELDS):
+            batch.append(item)
+            shortcut = item.get('shortcutDetails') or {}
+            if item['mimeType'] == FOLDER_MIME:
+                queue.append(item['id'])
+            elif item['mimeType'] == SHORTCUT_MIME and shortcut.get('targetMimeType') == FOLDER_MIME:
+                queue.append(shortcut['targetId'])
+            if len(batch) >= BATCH_SIZE:
+                upsert_nodes(batch)
+                count += len(batch)
+                batch = []
+        upsert_nodes(batch)
+        count += len(batch)
+        if log:
+            log(f"{len(visited)} folders, {count} nodes")
+
+    # Anything not touched by this crawl no longer exists under the root.
+    # Index readers see either the old tree or the new one, never half of it.
+    with transaction.atomic():
+        stale = DriveNode.objects.filter(synced_at__lt=started).delete()[0]
+        refresh_paths([root['id']])
+        rebuild_names()
+    if log:
+        log("search index rebuilt")
+
+    with transaction.atomic():
+        state = DriveSyncState.get_solo()
+        state.root_folder_id = root['id']
+        state.page_token = start_token
+        state.last_full_sync = timezone.now()
+        state.save()
+    return {'nodes': count, 'folders': len(visited), 'removed': stale}
+
+
+def in_mirrored_tree(items):
+    """
+    Changes that belong to the mirror: already indexed, or parented by an indexed
+    folder / shortcut target, including new folders that arrive in the same page.
+    """
+    parent_of = {item['id']: (item.get('parents') or [None])[0] for item in items}
+    lookup = set(parent_of) | (set(parent_of.values()) - {None})
+    known = set(DriveNode.objects.filter(file_id__in=lookup).values_list('file_id', flat=True))
+    known |= set(DriveNode.objects.filter(parent_id__in=lookup).values_list('parent_id', flat=True))
+
+    keep_ids = {file_id for file_id in parent_of if file_id in known}
+    changed = True
+    while changed:
+        changed = False
+        for file_id, parent_id in parent_of.items():
+            if file_id not in keep_ids and (parent_id in known or parent_id in keep_ids):
+                keep_ids.add(file_id)
+                changed = True
+    return [item for item in items if item['id'] in keep_ids]
+
+
+def incremental_sync(service=None, log=None):
+    state = DriveSyncState.get_solo()
+    if not state.page_token:
+        return full_sync(service, log=log)
+    service = service or get_drive_service()
+
+    token = state.page_token
+    new_start_token = None
+    updated = removed = 0
+    while token:
+        results = service.changes().list(
+            pageToken=token,
+            spaces='drive',
+            includeRemoved=True,
+            pageSize=1000,
+            fields=f'nextPageToken, newStartPageToken, changes(fileId, removed, file({FILE_FIELDS}))',
+        ).execute()
+        changes = results.get('changes', [])
+
+        removals = []
+        candidates = []
+        for change in changes:
+            item = change.get('file')
+            if change.get('removed') or not item or item.get('trashed'):
+                removals.append(change['fileId'])
+            else:
+                candidates.append(item)
+
+        keep = in_mirrored_tree(candidates)
+
+        with transaction.atomic():
+            upsert_nodes(keep)
+            delete_subtrees(removals)
+            kept_ids = [item['id'] for item in keep]
+            refresh_paths(kept_ids)
+            index_names(kept_ids)
+        updated += len(keep)
+        removed += len(removals)
+
+        token = results.get('nextPageToken')
+        new_start_token = results.get('newStartPageToken') or new_start_token
+        if log:
+            log(f"{updated} updated, {removed} removed")
+
+    state.page_token = new_start_token or state.page_token
+    state.last_incremental_sync = timezone.now()
+    state.save()
+    return {'updated': updated, 'removed': removed}
+
+
+def index_ready():
+    return DriveSyncState.objects.filter(last_full_sync__isnull=False).exists()
+
+
+def search_indexed_files(file_name, limit=10, check_ready=True):
+    """Filename search from the index, or None when the index cannot answer yet."""
+    if check_ready and not index_ready():
+        return None
+    return search_names(file_name, limit)
+
+
+def folder_id_for_path(path):
+    current = None
+    for name in (path.split('/') if path else [ROOT_FOLDER_NAME]):
+        nodes = DriveNode.objects.filter(name=name, mime_type=FOLDER_MIME)
+        if current:
+            nodes = nodes.filter(parent_id=current)
+        current = nodes.order_by('id').values_list('file_id', flat=True).first()
+        if current is None:
+            raise IndexMiss(f"Folder '{name}' not in index.")
+    return current
+
+
+def traverse_indexed_path(path):
+    """Same result shape as traverse_drive_path, answered from DriveNode rows."""
+    folder_id = folder_id_for_path(path)
+    children = DriveNode.objects.filter(parent_id=folder_id).values_list(
+        'file_id', 'name', 'mime_type', 'shortcut_target_id', 'shortcut_target_mime'
+    )
+
+    folders = []
+    files = []
+    shortcut_folders = []
+    for file_id, name, mime_type, target_id, target_mime in children:
+        if mime_type == FOLDER_MIME:
+            folders.append(name)
+        elif mime_type == SHORTCUT_MIME:
+            if target_id and target_mime == FOLDER_MIME:
+                shortcut_folders.append(target_id)
+            elif target_id:
+                files.append({'name': name, 'id': target_id})
+        else:
+            files.append({'name': name, 'id': file_id})
+
+    if shortcut_folders:
+        nested = (
+            DriveNode.objects.filter(parent_id__in=shortcut_folders)
+            .exclude(mime_type=FOLDER_MIME)
+            .values_list('file_id', 'name')
+        )
+        files.extend({'name': name, 'id': file_id} for file_id, name in nested)
+
+    files.sort(key=lambda f: extract_sort_keys(f['name']))
+
+    if folders:
+        return {'folders': folders}
+    else:
+        return {'files': files}
+
+
+def browse_drive_path(path):
+    """Answer from the local index when it is ready, otherwise (or on a miss) ask Drive."""
+    if index_ready():
+        try:
+            return traverse_indexed_path(path)
+        except IndexMiss:
+            pass
+    return traverse_drive_path(path)
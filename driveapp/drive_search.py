@@ -0,0 +1,177 @@
+"""
+Filename search over the local Drive index.
+
+Every searchable DriveNode (PDF/JPEG files and shortcuts to them) has its
+normalized name split into trigrams in DriveNameGram. A substring search
+intersects the trigrams of the query and confirms the hits with a LIKE on
+the few candidate rows, so no Drive call is made. Full paths are stored on
+the nodes and recomputed for a subtree whenever one of its folders moves or
+is renamed.
+"""
+from django.db import transaction
+from django.db.models import Count, F, Q
+
+from driveapp.drive_utils import FOLDER_MIME, SEARCH_MIMES, SHORTCUT_MIME, normalize_file_name
+from driveapp.models import DriveNameGram, DriveNode
+
+GRAM_SIZE = 3
+BATCH_SIZE = 500
+PATH_FIELDS = ('id', 'file_id', 'name', 'parent_id', 'full_path', 'mime_type', 'shortcut_target_id', 'shortcut_target_mime')
+
+
+def chunks(items, size=BATCH_SIZE):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def name_grams(text):
+    return {text[i:i + GRAM_SIZE] for i in range(len(text) - GRAM_SIZE + 1)}
+
+
+def searchable():
+    return Q(mime_type__in=SEARCH_MIMES) | Q(mime_type=SHORTCUT_MIME, shortcut_target_mime__in=SEARCH_MIMES)
+
+
+def folder_key(node):
+    """The id children of this node are parented to, if it is (or points to) a folder."""
+    if node.mime_type == FOLDER_MIME:
+        return node.file_id
+    if node.mime_type == SHORTCUT_MIME and node.shortcut_target_mime == FOLDER_MIME:
+        return node.shortcut_target_id
+    return None
+
+
+def grams_for(rows):
+    return [DriveNameGram(gram=gram, file_id=file_id) for file_id, name in rows for gram in name_grams(name)]
+
+
+def index_names(file_ids):
+    """Re-index the trigrams of the given nodes."""
+    for batch in chunks(file_ids):
+        DriveNameGram.objects.filter(file_id__in=batch).delete()
+        rows = DriveNode.objects.filter(searchable(), file_id__in=batch).values_list('file_id', 'search_name')
+        DriveNameGram.objects.bulk_create(grams_for(rows), batch_size=BATCH_SIZE * 10)
+
+
+def delete_names(file_ids):
+    for batch in chunks(file_ids):
+        DriveNameGram.objects.filter(file_id__in=batch).delete()
+
+
+def rebuild_names():
+    # One transaction: searches keep reading the old trigrams until the new ones commit
+    with transaction.atomic():
+        DriveNameGram.objects.all().delete()
+        rows = DriveNode.objects.filter(searchable()).values_list('file_id', 'search_name')
+        batch = []
+        for row in rows.iterator(chunk_size=2000):
+            batch.append(row)
+            if len(batch) >= 2000:
+                DriveNameGram.objects.bulk_create(grams_for(batch), batch_size=BATCH_SIZE * 10)
+                batch = []
+        DriveNameGram.objects.bulk_create(grams_for(batch), batch_size=BATCH_SIZE * 10)
+
+
+def parent_paths(parent_ids):
+    """full_path of each parent id, whether it is a folder node or the target of a shortcut folder."""
+    paths = {}
+    for batch in chunks(parent_ids):
+        paths.update(DriveNode.objects.filter(file_id__in=batch).values_list('file_id', 'full_path'))
+        shortcuts = DriveNode.objects.filter(mime_type=SHORTCUT_MIME, shortcut_target_id__in=batch)
+        for target_id, path in shortcuts.values_list('shortcut_target_id', 'full_path'):
+            paths.setdefault(target_id, path)
+    return paths
+
+
+def refresh_paths(file_ids):
+    """Recompute full_path for the given nodes and everything below them."""
+    nodes = []
+    seen = set()
+    level = list(dict.fromkeys(file_ids))
+    while level:
+        level = [file_id for file_id in level if file_id not in seen]
+        seen.update(level)
+        rows = []
+        for batch in chunks(level):
+            rows.extend(DriveNode.objects.filter(file_id__in=batch).only(*PATH_FIELDS))
+        nodes.extend(rows)
+        keys = [key for key in map(folder_key, rows) if key]
+        level = []
+        for batch in chunks(keys):
+            level.extend(DriveNode.objects.filter(parent_id__in=batch).values_list('file_id', flat=True))
+
+    by_key = {}
+    for node in nodes:
+        key = folder_key(node)
+        if key:
+            by_key.setdefault(key, node)
+    outside = parent_paths({node.parent_id for node in nodes if node.parent_id and node.parent_id not in by_key})
+
+    paths = {}
+
+    def path_of(node, stack):
+        if node.file_id not in paths:
+            parent = by_key.get(node.parent_id)
+            if parent is None:
+                base = outside.get(node.parent_id, '')
+            elif parent.file_id in stack:
+                # Shortcut loop, keep what the parent had
+                base = parent.full_path
+            else:
+                base = path_of(parent, stack | {node.file_id})
+            paths[node.file_id] = f"{base}/{node.name}" if base else node.name
+        return paths[node.file_id]
+
+    changed = []
+    for node in nodes:
+        path = path_of(node, frozenset())
+        if path != node.full_path:
+            node.full_path = path
+            changed.append(node)
+    DriveNode.objects.bulk_update(changed, ['full_path'], batch_size=BATCH_SIZE)
+    return len(changed)
+
+
+def search_names(file_name, limit=10):
+    """
+    Same result shape as the Drive `name contains` search: newest first, with
+    shortcuts reported as the file they point to.
+    """
+    query = normalize_file_name(file_name)
+    if not query:
+        return []
+
+    nodes = DriveNode.objects.filter(searchable(), search_name__contains=query)
+    grams = name_grams(query)
+    if grams:
+        matching = (
+            DriveNameGram.objects.filter(gram__in=grams)
+            .values('file_id')
+            .annotate(hits=Count('id'))
+            .filter(hits=len(grams))
+            .values('file_id')
+        )
+        nodes = nodes.filter(file_id__in=matching)
+    rows = nodes.order_by(F('modified_time').desc(nulls_last=True), '-id').values_list(
+        'file_id', 'name', 'mime_type', 'parent_id', 'shortcut_target_id', 'shortcut_target_mime', 'full_path'
+    )
+
+    files = []
+    found = set()
+    for file_id, name, mime_type, parent_id, target_id, target_mime, full_path in rows[:limit * 2]:
+        if mime_type == SHORTCUT_MIME:
+            file_id, mime_type = target_id, target_mime
+        if file_id in found:
+            continue
+        found.add(file_id)
+        files.append({
+            'id': file_id,
+            'name': name,
+            'mimeType': mime_type,
+            'parents': [parent_id] if parent_id else [],
+            'fullPath': full_path,
+        })
+        if len(files) >= limit:
+            break
+    return files
@@ -1,27 +1,93 @@
 from google.oauth2 import service_account
+from google.auth.transport.requests import Request as AuthRequest
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
+from googleapiclient.errors import HttpError
+import httplib2
+import threading
 from django.conf import settings
+from globalapp.filters import normalize_search_text
 from googleapiclient.http import MediaIoBaseDownload
+from driveapp.drive_cache import folder_cache, metadata_cache, shortcut_cache
+from driveapp.rendering import convert_job, preview_job, render
 from io import BytesIO
-from django.http import JsonResponse
-from PIL import Image
-import fitz  # PyMuPDF
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.utils.http import content_disposition_header
 import re
-from django.core.cache import cache
 from concurrent.futures import ThreadPoolExecutor
 import time
 import os
+import heapq
 SCOPES = ['https://www.googleapis.com/auth/drive']
 SERVICE_ACCOUNT_FILE = settings.GOOGLE_CREDENTIALS_FILE
 
+ROOT_FOLDER_NAME = 'মৌজা ম্যাপ ফাইল'
+FOLDER_MIME = 'application/vnd.google-apps.folder'
+SHORTCUT_MIME = 'application/vnd.google-apps.shortcut'
+# What the file searches return
+SEARCH_MIMES = ('application/pdf', 'image/jpeg', 'image/jpg')
+
 # Bengali to English digit map
 bengali_to_english = str.maketrans("০১২৩৪৫৬৭৮৯", "0123456789")
 
+
+def normalize_file_name(name):
+    """Search form of a file name: NFC, lower case, Bengali digits as ASCII."""
+    return normalize_search_text(name).translate(bengali_to_english)
+
+
+def name_query(file_name):
+    """The Drive `files().list` query a file-name search sends."""
+    safe_name = file_name.replace("'", "\\'")
+    mimes = " or ".join(f"mimeType='{mime}'" for mime in SEARCH_MIMES)
+    return f"(name contains '{safe_name}') and ({mimes}) and trashed = false"
+
+
+DRIVE_HTTP_TIMEOUT = 60
+# Most sub-requests the Drive batch endpoint accepts
+DRIVE_BATCH_LIMIT = 100
+DRIVE_STREAM_CHUNK_SIZE = 1024 * 1024
+# Shortcut targets per OR-combined `in parents` query
+SHORTCUT_QUERY_CHUNK = 25
+
+# Service-account credentials are loaded once per process and shared; the
+# Drive client itself is per thread because httplib2.Http is not thread-safe.
+# Each thread keeps its own keep-alive connection.
+_credentials = None
+_credentials_lock = threading.Lock()
+_local = threading.local()
+
+
+def get_drive_credentials():
+    global _credentials
+    if _credentials is None:
+        with _credentials_lock:
+            if _credentials is None:
+                _credentials = service_account.Credentials.from_service_account_file(
+                    SERVICE_ACCOUNT_FILE, scopes=SCOPES
+                )
+    if not _credentials.valid:
+        # One token mint per expiry for the whole process, not one per thread
+        with _credentials_lock:
+            if not _credentials.valid:
+                _credentials.refresh(AuthRequest())
+    return _credentials
+
+
 def get_drive_service():
-    credentials = service_account.Credentials.from_service_account_file(
-        SERVICE_ACCOUNT_FILE, scopes=SCOPES
-    )
-    return build('drive', 'v3', credentials=credentials)
+    credentials = get_drive_credentials()
+    service = getattr(_local, 'service', None)
+    if service is None:
+        http = AuthorizedHttp(credentials, http=httplib2.Http(timeout=DRIVE_HTTP_TIMEOUT))
+        # static_discovery uses the discovery document bundled with the client library
+        service = build('drive', 'v3', http=http, cache_discovery=False, static_discovery=True)
+        _local.service = service
+    return service
+
+
+def reset_drive_service():
+    """Drop this thread's client, e.g. after a broken connection."""
+    _local.service = None
 
 def extract_sort_keys(name):
     # Caches values internally for speed
@@ -37,14 +103,89 @@ def extract_sort_keys(name):
     return (first, third)
 
 
+def iter_query_pages(service, query, fields):
+    """Every page of a files().list query; Drive hands out page tokens one after another."""
+    page_token = None
+    while True:
+        results = service.files().list(
+            q=query,
+            spaces='drive',
+            fields=f'nextPageToken, files({fields})',
+            pageSize=1000,
+            pageToken=page_token,
+        ).execute()
+        yield results.get('files', [])
+        page_token = results.get('nextPageToken')
+        if not page_token:
+            break
+
+
+def iter_folder_pages(service, folder_id, fields='id, name, mimeType, shortcutDetails'):
+    return iter_query_pages(service, f"'{folder_id}' in parents and trashed=false", fields)
+
+
+def list_folder_items(service, folder_id, fields='id, name, mimeType, shortcutDetails'):
+    for page in iter_folder_pages(service, folder_id, fields):
+        yield from page
+
+
+def file_sort_key(file):
+    return extract_sort_keys(file['name'])
+
+
+def merge_sorted_runs(runs):
+    """Merge lists that are each already sorted by file_sort_key."""
+    return list(heapq.merge(*runs, key=file_sort_key))
+
+
+def fetch_shortcut_folders(target_ids):
+    """
+    Files (no subfolders) of each target folder, sorted, from one OR-combined
+    `'<id>' in parents` query. Runs on its own thread's Drive client.
+    """
+    service = get_drive_service()
+    query = "(" + " or ".join(f"'{target_id}' in parents" for target_id in target_ids) + ") and trashed=false"
+    contents = {target_id: [] for target_id in target_ids}
+    for page in iter_query_pages(service, query, 'id, name, mimeType, parents'):
+        for item in page:
+            if item['mimeType'] == FOLDER_MIME:
+                continue
+            for parent_id in item.get('parents', []):
+                if parent_id in contents:
+                    contents[parent_id].append({'name': item['name'], 'id': item['id']})
+    for files in contents.values():
+        files.sort(key=file_sort_key)
+    return contents
+
+
+def resolve_shortcut_folders(target_ids):
+    """{target id: sorted files}; cached targets are reused, the rest fetched together."""
+    target_ids = list(dict.fromkeys(target_ids))
+    resolved = shortcut_cache.get_many(target_ids)
+    missing = [target_id for target_id in target_ids if target_id not in resolved]
+    chunks = [missing[i:i + SHORTCUT_QUERY_CHUNK] for i in range(0, len(missing), SHORTCUT_QUERY_CHUNK)]
+
+    if len(chunks) <= 1:
+        results = [fetch_shortcut_folders(chunk) for chunk in chunks]
+    else:
+        with ThreadPoolExecutor(max_workers=min(4, len(chunks))) as executor:
+            results = list(executor.map(fetch_shortcut_folders, chunks))
+
+    for contents in results:
+        for target_id, files in contents.items():
+            shortcut_cache.set(target_id, files)
+            resolved[target_id] = files
+    return resolved
+
+
 def traverse_drive_path(path):
     service = get_drive_service()
-    folders = path.split('/') if path else ['মৌজা ম্যাপ ফাইল']
+    folders = path.split('/') if path else [ROOT_FOLDER_NAME]
 
     current_folder_id = None
 
     for folder_name in folders:
-        query = f"mimeType='application/vnd.google-apps.folder' and name='{folder_name}' and trashed=false"
+        query = f"mimeType='{FOLDER_MIME}' and name='{folder_name}' and trashed=false"
         if current_folder_id:
             query += f" and '{current_folder_id}' in parents"
 
@@ -56,98 +197,107 @@ def traverse_drive_path(path):
         # Use the first folder match for traversal
         current_folder_id = folder_list[0]['id']
 
-    # Get all items (files, folders, shortcuts) in this folder
-    query = f"'{current_folder_id}' in parents and trashed=false"
-    results = service.files().list(
-        q=query,
-        spaces='drive',
-        fields='files(id, name, mimeType, shortcutDetails)',
-        pageSize=1000
-    ).execute()
-
+    # Get all items (files, folders, shortcuts) in this folder, page by page.
+    # Each page is sorted as it arrives and the runs are merged at the end.
     folders = []
-    files = []
-
-    for item in results.get('files', []):
-        mime_type = item['mimeType']
-
-        if mime_type == 'application/vnd.google-apps.folder':
-            folders.append(item['name'])
-
-        elif mime_type == 'application/vnd.google-apps.shortcut':
-            shortcut = item.get('shortcutDetails', {})
-            target_id = shortcut.get('targetId')
-            target_mime = shortcut.get('targetMimeType')
-
-            if target_id and target_mime == 'application/vnd.google-apps.folder':
-                # 🔁 Get all files inside this shortcut folder
-                shortcut_query = f"'{target_id}' in parents and trashed=false"
-                shortcut_results = service.files().list(
-                    q=shortcut_query,
-                    spaces='drive',
-                    fields='files(id, name, mimeType)',
-                    pageSize=1000
-                ).execute()
-                for sub_item in shortcut_results.get('files', []):
-                    if sub_item['mimeType'] != 'application/vnd.google-apps.folder':
-                        files.append({'name': sub_item['name'], 'id': sub_item['id']})
-
-            elif target_id:
-                files.append({'name': item['name'], 'id': target_id})
+    runs = []
+    shortcut_targets = []
 
-        else:
-            files.append({'name': item['name'], 'id': item['id']})
+    for page in iter_folder_pages(service, current_folder_id):
+        files = []
+        for item in page:
+            mime_type = item['mimeType']
+
+            if mime_type == FOLDER_MIME:
+                folders.append(item['name'])
+
+            elif mime_type == SHORTCUT_MIME:
+                shortcut = item.get('shortcutDetails', {})
+                target_id = shortcut.get('targetId')
+                target_mime = shortcut.get('targetMimeType')
 
-    # 📦 Sort
-    files.sort(key=lambda f: extract_sort_keys(f['name']))
+                if target_id and target_mime == FOLDER_MIME:
+                    # 🔁 Files inside shortcut folders are fetched together below
+                    shortcut_targets.append(target_id)
+
+                elif target_id:
+                    files.append({'name': item['name'], 'id': target_id})
+
+            else:
+                files.append({'name': item['name'], 'id': item['id']})
+        runs.append(sorted(files, key=file_sort_key))
 
     if folders:
         return {'folders': folders}
     else:
-        return {'files': files}
+        if shortcut_targets:
+            runs.extend(resolve_shortcut_folders(shortcut_targets).values())
+        # 📦 Sort
+        return {'files': merge_sorted_runs(runs)}
 
-def get_full_path(service, file):
-    """Recursively get full path of a file/folder."""
-    path_parts = [file['name']]
-    parent_ids = file.get('parents', [])
-    visited = set()
 
-    while parent_ids:
-        parent_id = parent_ids[0]
+def prefetch_folders(service, folder_ids):
+    """Load (name, parent) of every folder not yet in folder_cache, 100 per Drive batch request."""
+    missing = [folder_id for folder_id in dict.fromkeys(folder_ids) if folder_cache.get(folder_id) is None]
 
-        if parent_id in visited:
-            break
-        visited.add(parent_id)
+    def store(request_id, response, exception):
+        # A folder that cannot be read simply ends the path there
+        if exception is None:
+            parents = response.get('parents') or []
+            folder_cache.set(response['id'], (response['name'], parents[0] if parents else None))
 
-        parent = service.files().get(
-            fileId=parent_id,
-            fields='id, name, parents'
-        ).execute()
+    for start in range(0, len(missing), DRIVE_BATCH_LIMIT):
+        batch = service.new_batch_http_request(callback=store)
+        for folder_id in missing[start:start + DRIVE_BATCH_LIMIT]:
+            batch.add(service.files().get(fileId=folder_id, fields='id, name, parents'))
+        batch.execute()
 
-        path_parts.insert(0, parent['name'])
 
-        # stop if this parent has no more parents
-        if not parent.get('parents'):
-            break
+def resolve_paths(service, files):
+    """
+    Full path of each file. All files walk up together, so each tree level
+    costs one batched call for the folders nobody has seen yet, and none once
+    they are cached.
+    """
+    chains = [[file['name']] for file in files]
+    cursors = [(file.get('parents') or [None])[0] for file in files]
+    visited = [set() for _ in files]
+
+    while any(cursors):
+        prefetch_folders(service, [parent_id for parent_id in cursors if parent_id])
+        for index, parent_id in enumerate(cursors):
+            if not parent_id:
+                continue
+            entry = folder_cache.get(parent_id)
+            if entry is None or parent_id in visited[index]:
+                cursors[index] = None
+                continue
+            visited[index].add(parent_id)
+            name, grandparent_id = entry
+            chains[index].append(name)
+            cursors[index] = grandparent_id
+
+    return ["/".join(reversed(chain)) for chain in chains]
 
-        parent_ids = parent.get('parents', [])
 
-    return "/".join(path_parts)
+def get_full_path(service, file):
+    """Recursively get full path of a file/folder."""
+    return resolve_paths(service, [file])[0]
 
 
 def search_file_by_name(file_name):
+    # Imported here, the index module builds on this one
+    from driveapp.drive_index import search_indexed_files
+
+    files = search_indexed_files(file_name)
+    if files is not None:
+        return files
+
     service = get_drive_service()
-    safe_name = file_name.replace("'", "\\'")
-    
-    # Filter only JPG or PDF files (case-insensitive)
-    query = (
-        f"(name contains '{safe_name}') and "
-        f"(mimeType='application/pdf' or mimeType='image/jpeg' or mimeType='image/jpg') and "
-        f"trashed = false"
-    )
 
+    # Filter only JPG or PDF files (case-insensitive)
     results = service.files().list(
-        q=query,
+        q=name_query(file_name),
         spaces='drive',
         fields='files(id, name, mimeType, parents)',
         pageSize=10,        # Limit results to 10
@@ -157,8 +307,8 @@ def search_file_by_name(file_name):
     files = results.get('files', [])
     
     # Add full path for each file
-    for file in files:
-        file['fullPath'] = get_full_path(service, file)
+    for file, full_path in zip(files, resolve_paths(service, files)):
+        file['fullPath'] = full_path
 
     return files
 
@@ -189,59 +339,56 @@ def search_file_by_name_with_timeout(file_name, timeout=5):
     
 def search_file_by_name_with_cache(file_name):
     """
-    Search for a file with caching
+    Search for a file with caching (see driveapp.lookup_cache for the TTLs)
     """
-    # Check cache first
-    cache_key = f"file_search_{file_name}"
-    cached_result = cache.get(cache_key)
-    if cached_result:
-        return cached_result
-    
+    # Imported here, the cache module builds on this one
+    from driveapp.lookup_cache import LookupFailed, name_lookups
+
     try:
-        result = search_file_by_name(file_name)
-        # Cache successful results for 10 minutes
-        if result:
-            cache.set(cache_key, result, 600)
-        return result
-    except Exception as e:
-        # Cache failed results for 2 minutes to avoid repeated failures
-        cache.set(cache_key, [], 120)
-        raise e
+        return name_lookups.get_or_fetch(file_name, search_file_by_name)
+    except LookupFailed:
+        # A recent failure is cached: answer no files, as the cached [] used to
+        return []
 
 
-def batch_search_files(file_names, max_workers=3):
+def batch_search_files(file_names, max_workers=3, timeout=60):
     """
     Search multiple files in parallel with caching and error handling
     """
-    from concurrent.futures import ThreadPoolExecutor, as_completed
-    from django.core.cache import cache
+    from driveapp.drive_batch import search_names_batched
+    from driveapp.drive_index import index_ready, search_indexed_files
     
     results = {}
     failed_files = []
     
     # Remove duplicates while preserving order
     unique_files = list(dict.fromkeys(file_names))
-    
-    # Use ThreadPoolExecutor with limited workers
-    with ThreadPoolExecutor(max_workers=max_workers) as executor:
-        # Submit all tasks using the cached search function
-        future_to_filename = {
-            executor.submit(search_file_by_name_with_cache, file_name): file_name 
-            for file_name in unique_files
-        }
-        
-        # Collect results with timeout
-        for future in as_completed(future_to_filename, timeout=60):
-            file_name = future_to_filename[future]
+
+    # With the local index every lookup is a couple of DB queries, no threads needed
+    if index_ready():
+        for file_name in unique_files:
             try:
-                files = future.result(timeout=5)
-                results[file_name] = files or []
-                    
+                results[file_name] = search_indexed_files(file_name, check_ready=False)
             except Exception as e:
                 failed_files.append({
                     'file_name': file_name,
                     'error': str(e)
                 })
+        return {
+            'results': results,
+            'failed_files': failed_files,
+            'total_files': len(unique_files),
+            'successful_files': len(results)
+        }
+    
+    # Otherwise the names go to Drive in batch requests
+    found, errors = search_names_batched(unique_files, max_workers=max_workers, item_timeout=timeout)
+    results.update(found)
+    for file_name, error in errors.items():
+        failed_files.append({
+            'file_name': file_name,
+            'error': error
+        })
     
     return {
         'results': results,
@@ -251,123 +398,157 @@ def batch_search_files(file_names, max_workers=3):
     }
 
 
-def compress_to_jpeg(img, target_kb=200, max_size=(800, 800)):
-    img = img.convert("RGB")
-    
-    # Get original size in bytes to dynamically adjust
-    raw_buf = BytesIO()
-    img.save(raw_buf, format='JPEG')
-    original_kb = raw_buf.tell() / 1024
-
-    # 🔁 Adjust compression settings based on original size
-    if original_kb > 4000:  # If image > 4MB
-        max_size = (600, 600)
-        target_kb = min(target_kb, 150)
-        start_quality = 70
-    elif original_kb > 2000:  # If image > 2MB
-        max_size = (700, 700)
-        target_kb = min(target_kb, 180)
-        start_quality = 75
-    else:
-        start_quality = 85
+PREVIEW_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.pdf')
 
-    img.thumbnail(max_size, Image.LANCZOS)
 
-    output = BytesIO()
-    quality = start_quality
+def get_file_metadata(service, file_id):
+    """
+    Metadata of a file with shortcuts resolved: `id`/`mimeType`/`md5Checksum`/
+    `modifiedTime` describe the target, `name` stays the one the user sees.
+    Cached briefly so repeated previews of a hot file skip the call.
+    """
+    metadata = metadata_cache.get(file_id)
+    if metadata is not None:
+        return metadata
 
-    while quality >= 10:
-        output.seek(0)
-        output.truncate()
-        img.save(output, format='JPEG', quality=quality, optimize=True)
-        size_kb = output.tell() / 1024
-        if size_kb <= target_kb:
-            break
-        quality -= 5
+    fields = 'id, name, mimeType, md5Checksum, modifiedTime, size, shortcutDetails'
+    metadata = service.files().get(fileId=file_id, fields=fields).execute()
+
+    # Handle shortcut pointing to actual file
+    if metadata['mimeType'] == SHORTCUT_MIME:
+        target_id = metadata.get('shortcutDetails', {}).get('targetId')
+        target = service.files().get(fileId=target_id, fields=fields).execute()
+        metadata = dict(target, name=metadata['name'])
+
+    metadata_cache.set(file_id, metadata)
+    return metadata
+
+
+def download_media(service, file_id):
+    request_drive = service.files().get_media(fileId=file_id)
+    raw = BytesIO()
+    downloader = MediaIoBaseDownload(raw, request_drive)
+    done = False
+    while not done:
+        status, done = downloader.next_chunk()
+    raw.seek(0)
+    return raw
 
-    output.seek(0)
-    return output
 
+def make_preview(raw, ext, target_kb=200):
+    """JPEG preview of an image or a PDF's first page, None for other files."""
+    data = render(preview_job, raw.getvalue(), ext, target_kb)
+    return BytesIO(data) if data is not None else None
 
 
 def download_file_by_id(file_id, compress=True, target_kb=200):
     service = get_drive_service()
 
-    # Get metadata with shortcut details
-    metadata = service.files().get(
-        fileId=file_id,
-        fields='name, mimeType, shortcutDetails'
-    ).execute()
-
+    metadata = get_file_metadata(service, file_id)
     file_name = metadata['name']
     ext = os.path.splitext(file_name)[1].lower()
     mime_type = metadata['mimeType']
 
-    # Handle shortcut pointing to actual file
-    if mime_type == 'application/vnd.google-apps.shortcut':
-        target_id = metadata.get('shortcutDetails', {}).get('targetId')
-        file_id = target_id
-        mime_type = metadata.get('shortcutDetails', {}).get('targetMimeType', mime_type)
-
     # Download file content
-    request_drive = service.files().get_media(fileId=file_id)
-    raw = BytesIO()
-    downloader = MediaIoBaseDownload(raw, request_drive)
-    done = False
-    while not done:
-        status, done = downloader.next_chunk()
-    raw.seek(0)
+    raw = download_media(service, metadata['id'])
 
     # 🔥 EXTENSION-BASED COMPRESSION ONLY
     if compress:
         try:
-            if ext in ['.jpg', '.jpeg', '.png']:
-                raw.seek(0)
-                image = Image.open(raw)
-                image.load()
-                compressed = compress_to_jpeg(image, target_kb=target_kb)
-                return compressed, 'image/jpeg', f"preview_{file_name}.jpg"
-
-            elif ext == '.pdf':
-                doc = fitz.open(stream=raw.getvalue(), filetype="pdf")
-                if len(doc) == 0:
-                    raise Exception("Empty PDF")
-                page = doc.load_page(0)
-                pix = page.get_pixmap(dpi=100)
-                img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-                compressed = compress_to_jpeg(img, target_kb=target_kb)
+            compressed = make_preview(raw, ext, target_kb=target_kb)
+            if compressed is not None:
                 return compressed, 'image/jpeg', f"preview_{file_name}.jpg"
-
         except Exception as e:
             print(f"[❌ Compression failed] {str(e)}")
 
     # Fallback to original
     raw.seek(0)
     return raw, mime_type, file_name
-def convert_file_format(stream, source_mime, target_format):
-    output = BytesIO()
-
-    if target_format == "jpg":
-        if source_mime == "application/pdf":
-            doc = fitz.open(stream=stream.getvalue(), filetype="pdf")
-            page = doc.load_page(0)
-            pix = page.get_pixmap(dpi=150)
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+
+
+def parse_range_header(header, size):
+    """
+    (start, end) for a single `bytes=` range, None to send the whole file.
+    Raises ValueError when the range cannot be satisfied.
+    """
+    if not header or not size or not header.startswith('bytes=') or ',' in header:
+        return None
+    first, _, last = header[len('bytes='):].strip().partition('-')
+    try:
+        if first:
+            start = int(first)
+            end = min(int(last), size - 1) if last else size - 1
         else:
-            img = Image.open(stream)
+            # bytes=-N is the last N bytes
+            start = max(size - int(last), 0)
+            end = size - 1
+    except ValueError:
+        return None
+    if start > end or start >= size:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+def iter_drive_media(service, file_id, start=0, end=None, chunk_size=DRIVE_STREAM_CHUNK_SIZE):
+    """Yield the file's bytes start..end (inclusive) one ranged Drive request per chunk."""
+    request = service.files().get_media(fileId=file_id)
+    position = start
+    while end is None or position <= end:
+        chunk_end = position + chunk_size - 1 if end is None else min(position + chunk_size - 1, end)
+        resp, content = request.http.request(
+            request.uri, method='GET', headers={'Range': f'bytes={position}-{chunk_end}'}
+        )
+        if resp.status == 416:
+            break
+        if resp.status not in (200, 206):
+            raise HttpError(resp, content, uri=request.uri)
+        if not content:
+            break
+        yield content
+        position += len(content)
+        if resp.status == 200 or (end is None and len(content) < chunk_size):
+            # Whole file in one go, or the last chunk of a file of unknown size
+            break
 
-        img = img.convert("RGB")
-        img.save(output, format="JPEG")
-        output.seek(0)
-        return output, "image/jpeg", "converted.jpg"
 
-    elif target_format == "pdf":
-        if source_mime == "application/pdf":
-            return stream, "application/pdf", "original.pdf"
+def stream_drive_file(request, file_id, filename=None, as_attachment=False):
+    """
+    StreamingHttpResponse proxying a Drive file in chunks, honouring a single
+    HTTP Range so clients can resume. Memory stays at one chunk per download.
+    """
+    service = get_drive_service()
+    metadata = get_file_metadata(service, file_id)
+    size = int(metadata.get('size') or 0)
+
+    try:
+        byte_range = parse_range_header(request.headers.get('Range'), size)
+    except ValueError:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{size}'
+        return response
+
+    if byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(
+            iter_drive_media(service, metadata['id'], start, end), status=206, content_type=metadata['mimeType']
+        )
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        end = size - 1 if size else None
+        response = StreamingHttpResponse(
+            iter_drive_media(service, metadata['id'], 0, end), content_type=metadata['mimeType']
+        )
+        if size:
+            response['Content-Length'] = str(size)
+    if size:
+        response['Accept-Ranges'] = 'bytes'
+    response['Content-Disposition'] = content_disposition_header(as_attachment, filename or metadata['name'])
+    return response
 
-        img = Image.open(stream).convert("RGB")
-        img.save(output, format="PDF")
-        output.seek(0)
-        return output, "application/pdf", "converted.pdf"
 
-    raise ValueError("Unsupported format")
\ No newline at end of file
+def convert_file_format(stream, source_mime, target_format):
+    if target_format == "pdf" and source_mime == "application/pdf":
+        return stream, "application/pdf", "original.pdf"
+    data, mime_type, filename = render(convert_job, stream.getvalue(), source_mime, target_format)
+    return BytesIO(data), mime_type, filename
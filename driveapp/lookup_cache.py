@@ -0,0 +1,186 @@
+"""
+Two-tier cache for Drive file-name lookups.
+
+An in-process LRU (drive_cache.TTLCache) sits in front of the shared
+'drive_lookups' cache, which every worker on the host reads and which
+survives restarts. Hits, misses and errors get their own TTLs. Once fresh,
+hits and misses may still be served stale for DRIVE_LOOKUP_STALE seconds
+while one background refresh runs. Concurrent lookups of the same name in a
+process share a single Drive call, and a short lease in the shared tier keeps
+workers from refreshing the same name together. Stale names are refreshed
+together, one job per request on a small pool, so a burst of stale entries
+never turns into a burst of threads.
+"""
+import hashlib
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+
+from driveapp.drive_cache import MISSING, TTLCache
+from driveapp.drive_utils import name_query
+
+logger = logging.getLogger(__name__)
+
+HIT = 'hit'
+MISS = 'miss'
+ERROR = 'error'
+DEFAULT_TTLS = {HIT: 3600, MISS: 300, ERROR: 30}
+REFRESH_LEASE = 30
+REFRESH_WORKERS = 2
+WAIT_TIMEOUT = 60
+
+
+class LookupFailed(Exception):
+    """A lookup whose recent failure is still cached."""
+
+
+class LookupCache:
+    def __init__(self, alias, namespace, ttls=None, stale=86400, local_size=5000):
+        self.alias = alias
+        self.namespace = namespace
+        self.ttls = dict(DEFAULT_TTLS, **(ttls or {}))
+        self.stale = stale
+        self.local = TTLCache(maxsize=local_size, ttl=self.ttls[HIT])
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._refresher = None
+
+    @property
+    def shared(self):
+        return caches[self.alias]
+
+    def key(self, name):
+        # The exact Drive query: names differing only in case or digit script
+        # are different `name contains` searches with different results
+        digest = hashlib.sha1(name_query(name).encode('utf-8')).hexdigest()
+        return f"{self.namespace}:{digest}"
+
+    def peek(self, name):
+        """The cached entry (fresh or stale) without fetching, or None."""
+        key = self.key(name)
+        entry = self.local.get(key, MISSING)
+        if entry is MISSING:
+            entry = self.shared.get(key)
+            if entry is None:
+                return None
+            remaining = entry['stale_until'] - time.time()
+            if remaining <= 0:
+                return None
+            self.local.set(key, entry, ttl=remaining)
+        return entry
+
+    def store(self, name, files=None, error=None):
+        kind = ERROR if error is not None else (HIT if files else MISS)
+        now = time.time()
+        fresh_until = now + self.ttls[kind]
+        stale_until = fresh_until + (0 if kind == ERROR else self.stale)
+        entry = {
+            'kind': kind,
+            'files': files or [],
+            'error': error,
+            'fresh_until': fresh_until,
+            'stale_until': stale_until,
+        }
+        key = self.key(name)
+        self.shared.set(key, entry, stale_until - now)
+        self.local.set(key, entry, ttl=stale_until - now)
+        return entry
+
+    @staticmethod
+    def is_fresh(entry):
+        return entry['fresh_until'] > time.time()
+
+    @staticmethod
+    def result(entry):
+        if entry['kind'] == ERROR:
+            raise LookupFailed(entry['error'])
+        return entry['files']
+
+    def get_or_fetch(self, name, fetch):
+        entry = self.peek(name)
+        if entry is not None:
+            if self.is_fresh(entry):
+                return self.result(entry)
+            if entry['kind'] != ERROR:
+                self.revalidate([name], lambda names: ({name: fetch(name)}, {}))
+                return self.result(entry)
+        return self.fetch(name, fetch)
+
+    def fetch(self, name, fetch):
+        """fetch(name) once per process no matter how many threads ask at the same time."""
+        key = self.key(name)
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+        if not leader:
+            return future.result(timeout=WAIT_TIMEOUT)
+
+        try:
+            files = fetch(name)
+        except Exception as e:
+            self.store(name, error=str(e))
+            future.set_exception(e)
+            raise
+        else:
+            self.store(name, files=files)
+            future.set_result(files)
+            return files
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def revalidate(self, names, fetch_many):
+        """
+        Refresh stale entries in the background, each once across all workers.
+        fetch_many(names) returns ({name: files}, {name: error}) and runs once
+        for every name this process claims. Names that fail keep their stale
+        entry until it expires.
+        """
+        claimed = {}
+        with self._lock:
+            for name in dict.fromkeys(names):
+                key = self.key(name)
+                if key in self._inflight or not self.shared.add(f"{key}:refresh", 1, REFRESH_LEASE):
+                    continue
+                # Lookups of a claimed name wait for the refresh instead of calling Drive too
+                claimed[name] = self._inflight[key] = Future()
+            if not claimed:
+                return
+            if self._refresher is None:
+                self._refresher = ThreadPoolExecutor(max_workers=REFRESH_WORKERS, thread_name_prefix='lookup-refresh')
+
+        def refresh():
+            try:
+                found, failed = fetch_many(list(claimed))
+            except Exception as e:
+                logger.warning("Background refresh of %d names failed", len(claimed), exc_info=True)
+                found, failed = {}, dict.fromkeys(claimed, str(e))
+            finally:
+                connection.close()
+            for name, future in claimed.items():
+                if name in found:
+                    self.store(name, files=found[name])
+                    future.set_result(found[name])
+                else:
+                    error = failed.get(name, "No result")
+                    logger.warning("Background refresh of '%s' failed: %s", name, error)
+                    future.set_exception(LookupFailed(error))
+                with self._lock:
+                    self._inflight.pop(self.key(name), None)
+
+        self._refresher.submit(refresh)
+
+name_lookups = LookupCache(
+    alias='drive_lookups',
+    namespace='file_search',
+    ttls=getattr(settings, 'DRIVE_LOOKUP_TTLS', None),
+    stale=getattr(settings, 'DRIVE_LOOKUP_STALE', 86400),
+)
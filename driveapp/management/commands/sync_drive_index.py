@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from driveapp.drive_index import full_sync, incremental_sync
+from driveapp.drive_utils import ROOT_FOLDER_NAME
+
+
+class Command(BaseCommand):
+    help = "Sync the local Drive folder index (incremental from the changes feed, or a full crawl with --full)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help="Re-crawl the whole tree under the root folder")
+        parser.add_argument('--root', default=ROOT_FOLDER_NAME, help="Root folder name for --full")
+
+    def handle(self, *args, **options):
+        log = lambda message: self.stdout.write(f"🔄 {message}")
+        if options['full']:
+            result = full_sync(root_name=options['root'], log=log)
+            self.stdout.write(self.style.SUCCESS(
+                f"🎉 Full sync done: {result['nodes']} nodes in {result['folders']} folders, "
+                f"{result['removed']} stale removed."
+            ))
+        else:
+            result = incremental_sync(log=log)
+            if 'folders' in result:
+                self.stdout.write(self.style.SUCCESS(f"🎉 No sync token yet, ran a full sync: {result['nodes']} nodes."))
+            else:
+                self.stdout.write(self.style.SUCCESS(
+                    f"🎉 Incremental sync done: {result['updated']} updated, {result['removed']} removed."
+                ))
@@ -0,0 +1,38 @@
+from django.db import migrations, models
+
+from globalapp.filters import normalize_search_text
+
+SEARCH_TEXT_FIELDS = (
+    'mouza_name', 'jl_number', 'division_name', 'district_name', 'upazila_name',
+    'survey_name', 'survey_name_en', 'mutation_survey_name', 'mutation_survey_name_en',
+)
+
+
+def populate_search_text(apps, schema_editor):
+    Mouzamapdata = apps.get_model('driveapp', 'Mouzamapdata')
+    batch = []
+    for row in Mouzamapdata.objects.only('id', *SEARCH_TEXT_FIELDS).iterator(chunk_size=2000):
+        values = (getattr(row, name) for name in SEARCH_TEXT_FIELDS)
+        row.search_text = normalize_search_text(" ".join(str(v) for v in values if v))[:1000]
+        batch.append(row)
+        if len(batch) >= 2000:
+            Mouzamapdata.objects.bulk_update(batch, ['search_text'])
+            batch = []
+    if batch:
+        Mouzamapdata.objects.bulk_update(batch, ['search_text'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('driveapp', '0006_mouzamapdata_district_fk_mouzamapdata_division_fk_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mouzamapdata',
+            name='search_text',
+            field=models.CharField(blank=True, db_index=True, default='', editable=False, max_length=1000),
+        ),
+        migrations.RunPython(populate_search_text, migrations.RunPython.noop),
+    ]
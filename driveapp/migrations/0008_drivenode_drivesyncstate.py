@@ -0,0 +1,45 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('driveapp', '0007_mouzamapdata_search_text'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DriveNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('file_id', models.CharField(max_length=128, unique=True)),
+                ('name', models.CharField(max_length=512)),
+                ('parent_id', models.CharField(blank=True, db_index=True, max_length=128, null=True)),
+                ('mime_type', models.CharField(max_length=128)),
+                ('shortcut_target_id', models.CharField(blank=True, db_index=True, max_length=128, null=True)),
+                ('shortcut_target_mime', models.CharField(blank=True, max_length=128, null=True)),
+                ('modified_time', models.DateTimeField(blank=True, null=True)),
+                ('synced_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Drive Node',
+                'indexes': [
+                    models.Index(fields=['parent_id', 'mime_type'], name='drivenode_parent_mime_idx'),
+                    models.Index(fields=['name', 'mime_type'], name='drivenode_name_mime_idx'),
+                ],
+            },
+        ),
+        migrations.CreateModel(
+            name='DriveSyncState',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('root_folder_id', models.CharField(blank=True, max_length=128, null=True)),
+                ('page_token', models.CharField(blank=True, max_length=255, null=True)),
+                ('last_full_sync', models.DateTimeField(blank=True, null=True)),
+                ('last_incremental_sync', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Drive Sync State',
+            },
+        ),
+    ]
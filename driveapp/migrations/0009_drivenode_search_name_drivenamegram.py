@@ -0,0 +1,43 @@
+from django.db import migrations, models
+
+
+def require_full_sync(apps, schema_editor):
+    # Names, paths and trigrams are only built by a full sync; until the next
+    # `sync_drive_index --full` the index reports not ready and searches go to Drive.
+    DriveSyncState = apps.get_model('driveapp', 'DriveSyncState')
+    DriveSyncState.objects.update(page_token=None, last_full_sync=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('driveapp', '0008_drivenode_drivesyncstate'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='drivenode',
+            name='search_name',
+            field=models.CharField(blank=True, db_index=True, default='', max_length=512),
+        ),
+        migrations.AddField(
+            model_name='drivenode',
+            name='full_path',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.CreateModel(
+            name='DriveNameGram',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('gram', models.CharField(max_length=3)),
+                ('file_id', models.CharField(db_index=True, max_length=128)),
+            ],
+            options={
+                'verbose_name': 'Drive Name Gram',
+                'indexes': [
+                    models.Index(fields=['gram', 'file_id'], name='drivenamegram_gram_file_idx'),
+                ],
+            },
+        ),
+        migrations.RunPython(require_full_sync, migrations.RunPython.noop),
+    ]
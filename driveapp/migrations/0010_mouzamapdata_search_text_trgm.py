@@ -0,0 +1,38 @@
+from django.db import migrations, models
+
+INDEX_NAME = 'mouzamapdata_search_trgm_idx'
+
+
+def create_trigram_index(apps, schema_editor):
+    # ?keyword= is a `search_text LIKE '%...%'`, which a btree cannot serve; on
+    # PostgreSQL a pg_trgm GIN index can. Other backends keep scanning the column.
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    table = apps.get_model('driveapp', 'Mouzamapdata')._meta.db_table
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        f"CREATE INDEX IF NOT EXISTS {INDEX_NAME} ON {schema_editor.quote_name(table)} "
+        f"USING gin (search_text gin_trgm_ops)"
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP INDEX IF EXISTS {INDEX_NAME}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('driveapp', '0009_drivenode_search_name_drivenamegram'),
+    ]
+
+    operations = [
+        # The btree index never served the substring search
+        migrations.AlterField(
+            model_name='mouzamapdata',
+            name='search_text',
+            field=models.CharField(blank=True, default='', editable=False, max_length=1000),
+        ),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -1,6 +1,8 @@
 from django.db import models
 
+from globalapp.filters import normalize_search_text
 from globalapp.models import Common
+from solo.models import SingletonModel
 
 # Create your models here.
 class Division(Common):
@@ -64,9 +66,82 @@ class Mouzamapdata(Common):
     district_fk = models.ForeignKey(District2, null=True, blank=True, on_delete=models.SET_NULL, related_name='mouzas')
     subdistrict_fk = models.ForeignKey(SubDistrict, null=True, blank=True, on_delete=models.SET_NULL, related_name='mouzas')
 
+    # Lower-cased, NFC normalized copy of the searchable columns used by ?keyword=
+    # (a substring match, served by the pg_trgm index from migration 0010 on PostgreSQL)
+    search_text = models.CharField(max_length=1000, blank=True, default="", editable=False)
+
+    SEARCH_TEXT_FIELDS = (
+        'mouza_name', 'jl_number', 'division_name', 'district_name', 'upazila_name',
+        'survey_name', 'survey_name_en', 'mutation_survey_name', 'mutation_survey_name_en',
+    )
+
     class Meta:
         verbose_name = "Mouza Map Data"
         verbose_name_plural = "Mouza Map Data"
 
+    def build_search_text(self):
+        values = (getattr(self, name) for name in self.SEARCH_TEXT_FIELDS)
+        return normalize_search_text(" ".join(str(v) for v in values if v))[:1000]
+
+    def save(self, *args, **kwargs):
+        self.search_text = self.build_search_text()
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'search_text' not in update_fields:
+            kwargs['update_fields'] = list(update_fields) + ['search_text']
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f"{self.mouza_name} (JL: {self.jl_number})- {self.district_name}"
+
+################################################ DRIVE INDEX ########################################################
+class DriveNode(models.Model):
+    """Local mirror of one Google Drive file/folder/shortcut, kept fresh by `sync_drive_index`."""
+    file_id = models.CharField(max_length=128, unique=True)
+    name = models.CharField(max_length=512)
+    # Lower-cased NFC name with Bengali digits folded to ASCII, see normalize_file_name
+    search_name = models.CharField(max_length=512, blank=True, default="", db_index=True)
+    full_path = models.TextField(blank=True, default="")
+    parent_id = models.CharField(max_length=128, null=True, blank=True, db_index=True)
+    mime_type = models.CharField(max_length=128)
+    shortcut_target_id = models.CharField(max_length=128, null=True, blank=True, db_index=True)
+    shortcut_target_mime = models.CharField(max_length=128, null=True, blank=True)
+    modified_time = models.DateTimeField(null=True, blank=True)
+    synced_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Drive Node"
+        indexes = [
+            models.Index(fields=['parent_id', 'mime_type'], name='drivenode_parent_mime_idx'),
+            models.Index(fields=['name', 'mime_type'], name='drivenode_name_mime_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.file_id})"
+
+
+class DriveNameGram(models.Model):
+    """Trigram of a DriveNode.search_name; substring searches intersect these instead of scanning names."""
+    gram = models.CharField(max_length=3)
+    file_id = models.CharField(max_length=128, db_index=True)
+
+    class Meta:
+        verbose_name = "Drive Name Gram"
+        indexes = [
+            models.Index(fields=['gram', 'file_id'], name='drivenamegram_gram_file_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.gram} -> {self.file_id}"
+
+
+class DriveSyncState(SingletonModel):
+    root_folder_id = models.CharField(max_length=128, null=True, blank=True)
+    page_token = models.CharField(max_length=255, null=True, blank=True)
+    last_full_sync = models.DateTimeField(null=True, blank=True)
+    last_incremental_sync = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Drive Sync State"
+
     def __str__(self):
-        return f"{self.mouza_name} (JL: {self.jl_number})- {self.district_name}"
\ No newline at end of file
+        return "Drive Sync State"
@@ -0,0 +1,212 @@
+"""
+On-disk cache of rendered Drive previews.
+
+Entries are content addressed: the file name is a hash of the Drive file id,
+its version (md5Checksum, or modifiedTime for files without one), the target
+size and the preview dimensions, so a new upload simply gets a new entry and
+stale ones age out. A file that cannot be rendered gets an empty '.failed'
+marker under the same key, so it is streamed from Drive as is instead of
+being rendered again. The same directory
+holds downloaded originals that pages and tiles are rendered from, and the
+rendered pages/tiles themselves.
+It is shared by every worker on the host and kept under
+DRIVE_PREVIEW_CACHE_MAX_BYTES by evicting the least recently served files
+(hits refresh the file's mtime).
+"""
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+
+from django.conf import settings
+
+from driveapp.drive_utils import (
+    PREVIEW_EXTENSIONS,
+    download_media,
+    get_drive_service,
+    get_file_metadata,
+    iter_drive_media,
+    make_preview,
+)
+from driveapp.rendering import RenderBusy, render
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_MAX_SIZE = (800, 800)
+# Evict down to this share of the limit so every write does not trigger a sweep
+EVICT_TO = 0.9
+
+_evict_lock = threading.Lock()
+
+
+def cache_dir():
+    return str(getattr(settings, 'DRIVE_PREVIEW_CACHE_DIR', os.path.join(settings.CACHE_DIR, 'previews')))
+
+
+def max_bytes():
+    return getattr(settings, 'DRIVE_PREVIEW_CACHE_MAX_BYTES', 2 * 1024 ** 3)
+
+
+def preview_key(file_id, version, target_kb, max_size=PREVIEW_MAX_SIZE):
+    raw = f"{file_id}:{version}:{target_kb}:{max_size[0]}x{max_size[1]}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def variant_key(file_id, version, variant):
+    raw = f"{file_id}:{version}:{variant!r}"
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+def preview_path(key, suffix='.jpg'):
+    return os.path.join(cache_dir(), key[:2], f"{key}{suffix}")
+
+
+def file_version(metadata):
+    return metadata.get('md5Checksum') or metadata.get('modifiedTime')
+
+
+def touch(path):
+    """True (and marks it recently used) when the entry is present."""
+    try:
+        os.utime(path)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def write_atomic(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            handle.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+def cache_entries():
+    root = cache_dir()
+    if not os.path.isdir(root):
+        return
+    for bucket in os.scandir(root):
+        if not bucket.is_dir():
+            continue
+        for entry in os.scandir(bucket.path):
+            if not entry.name.endswith('.tmp'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                yield entry.path, stat.st_size, stat.st_mtime
+
+
+def evict():
+    """Drop least recently served previews until the cache is back under its limit."""
+    limit = max_bytes()
+    with _evict_lock:
+        entries = list(cache_entries())
+        total = sum(size for _, size, _ in entries)
+        if total <= limit:
+            return 0
+        removed = 0
+        for path, size, _ in sorted(entries, key=lambda entry: entry[2]):
+            if total <= limit * EVICT_TO:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        return removed
+
+
+def cached_preview(file_id, target_kb=200):
+    """
+    (path, content type, download name) of the preview of a Drive file,
+    rendering and storing it on a miss. None when the original should be
+    served instead: the file has no preview (not an image or PDF, or no
+    version to address it by) or it failed to render.
+    """
+    service = get_drive_service()
+    metadata = get_file_metadata(service, file_id)
+    name = metadata['name']
+    version = file_version(metadata)
+    ext = os.path.splitext(name)[1].lower()
+    if not version or ext not in PREVIEW_EXTENSIONS:
+        return None
+
+    key = preview_key(metadata['id'], version, target_kb)
+    path = preview_path(key)
+    if touch(path):
+        return path, 'image/jpeg', f"preview_{name}.jpg"
+    failed_path = preview_path(key, '.failed')
+    if touch(failed_path):
+        return None
+
+    raw = download_media(service, metadata['id'])
+    try:
+        compressed = make_preview(raw, ext, target_kb=target_kb)
+    except RenderBusy:
+        raise
+    except Exception:
+        # Corrupt file, render timeout or crash
+        logger.warning("Preview of %s failed, serving the original", metadata['id'], exc_info=True)
+        compressed = None
+    if compressed is None:
+        write_atomic(failed_path, b'')
+        return None
+
+    write_atomic(path, compressed.getvalue())
+    evict()
+    return path, 'image/jpeg', f"preview_{name}.jpg"
+
+
+def cached_source(service, metadata):
+    """Path of the original file on disk, streamed from Drive on a miss."""
+    version = file_version(metadata)
+    path = preview_path(variant_key(metadata['id'], version, 'source'), '.src')
+    if version and touch(path):
+        return path
+
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as handle:
+            size = int(metadata.get('size') or 0)
+            for chunk in iter_drive_media(service, metadata['id'], 0, size - 1 if size else None):
+                handle.write(chunk)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    evict()
+    return path
+
+
+def cached_render(metadata, variant, build, suffix='.jpg'):
+    """Path of a rendered variant (page, tile, page subset) of a file, built with build() on a miss."""
+    path = preview_path(variant_key(metadata['id'], file_version(metadata), variant), suffix)
+    if touch(path):
+        return path
+    write_atomic(path, build())
+    evict()
+    return path
+
+
+def render_source(service, metadata, job, *args):
+    """
+    render(job, path of the original, *args). The original is fetched again
+    if it was evicted between cached_source and the worker opening it.
+    """
+    try:
+        return render(job, cached_source(service, metadata), *args)
+    except FileNotFoundError:
+        return render(job, cached_source(service, metadata), *args)
@@ -0,0 +1,390 @@
+"""
+Rendering subsystem for Drive previews and conversions.
+
+PyMuPDF and Pillow work runs in a bounded pool of worker processes instead
+of on the request thread, so it uses every core and a pathological file can
+only take down its worker. Jobs are plain functions from bytes to bytes and
+this module imports nothing from Django at the top, which keeps the workers
+light. Each job has a timeout (the pool is recycled when one hangs) and each
+worker an address-space limit. `render` blocks the calling view; `arender`
+is the awaitable form for async views.
+
+Settings: DRIVE_RENDER_WORKERS (0 renders inline), DRIVE_RENDER_MAX_PENDING,
+DRIVE_RENDER_TIMEOUT (seconds) and DRIVE_RENDER_MEMORY_LIMIT (bytes).
+"""
+import asyncio
+import logging
+import math
+import multiprocessing
+import os
+import signal
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+
+import fitz  # PyMuPDF
+from PIL import Image
+
+logger = logging.getLogger(__name__)
+
+
+class RenderError(Exception):
+    """A render job failed, timed out or hit its memory limit."""
+
+
+class RenderBusy(RenderError):
+    """Too many render jobs are already queued."""
+
+
+# --- jobs (run inside the workers) ---
+
+TRIAL_SIZE = (256, 256)
+TRIAL_QUALITY = 75
+
+
+def encode_jpeg(img, quality):
+    buf = BytesIO()
+    img.save(buf, format='JPEG', quality=quality, optimize=True)
+    return buf
+
+
+def compress_to_jpeg(img, target_kb=200, max_size=(800, 800)):
+    """
+    Downscale to max_size and pick the highest JPEG quality that fits target_kb.
+    Pass JPEG sources unloaded (straight from Image.open) so they are decoded
+    at reduced scale with draft().
+    """
+    source_pixels = img.width * img.height
+    if img.format == 'JPEG':
+        # Let libjpeg decode at 1/2, 1/4 or 1/8 scale, never below max_size
+        img.draft('RGB', max_size)
+    img = img.convert("RGB")
+
+    # Estimate the full-size JPEG from a small trial instead of encoding it
+    trial = img.copy()
+    trial.thumbnail(TRIAL_SIZE, Image.BILINEAR)
+    trial_bpp = encode_jpeg(trial, TRIAL_QUALITY).tell() / (trial.width * trial.height)
+    original_kb = trial_bpp * source_pixels / 1024
+
+    # 🔁 Adjust compression settings based on original size
+    if original_kb > 4000:  # If image > 4MB
+        max_size = (600, 600)
+        target_kb = min(target_kb, 150)
+        start_quality = 70
+    elif original_kb > 2000:  # If image > 2MB
+        max_size = (700, 700)
+        target_kb = min(target_kb, 180)
+        start_quality = 75
+    else:
+        start_quality = 85
+
+    img.thumbnail(max_size, Image.LANCZOS)
+
+    # First probe: quality scaled by how far the trial predicts we are over target
+    predicted_kb = trial_bpp * img.width * img.height / 1024
+    if predicted_kb <= target_kb:
+        guess = start_quality
+    else:
+        guess = max(10, int(TRIAL_QUALITY * target_kb / predicted_kb))
+
+    # Binary search for the highest quality that fits, stopping once within 10% of target
+    low, high = 10, start_quality
+    best = None
+    while low <= high:
+        quality = min(max(guess if guess is not None else (low + high) // 2, low), high)
+        guess = None
+        output = encode_jpeg(img, quality)
+        size_kb = output.tell() / 1024
+        if size_kb <= target_kb:
+            best = output
+            if size_kb >= target_kb * 0.9:
+                break
+            low = quality + 1
+        else:
+            high = quality - 1
+
+    if best is None:
+        best = encode_jpeg(img, 10)
+    best.seek(0)
+    return best
+
+
+def rasterize_pdf_page(data, page_number=0, dpi=100):
+    doc = fitz.open(stream=data, filetype="pdf")
+    if len(doc) == 0:
+        raise Exception("Empty PDF")
+    page = doc.load_page(page_number)
+    pix = page.get_pixmap(dpi=dpi)
+    return Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+
+
+def preview_job(data, ext, target_kb=200):
+    """JPEG preview bytes of an image or a PDF's first page, None for other files."""
+    if ext in ['.jpg', '.jpeg', '.png']:
+        # Not loaded here, compress_to_jpeg decodes JPEGs at reduced scale
+        image = Image.open(BytesIO(data))
+        return compress_to_jpeg(image, target_kb=target_kb).getvalue()
+
+    elif ext == '.pdf':
+        img = rasterize_pdf_page(data, 0, dpi=100)
+        return compress_to_jpeg(img, target_kb=target_kb).getvalue()
+
+    return None
+
+
+def convert_job(data, source_mime, target_format):
+    """(bytes, mime type, file name) of the file converted to jpg or pdf."""
+    output = BytesIO()
+
+    if target_format == "jpg":
+        if source_mime == "application/pdf":
+            img = rasterize_pdf_page(data, 0, dpi=150)
+        else:
+            img = Image.open(BytesIO(data))
+
+        img = img.convert("RGB")
+        img.save(output, format="JPEG")
+        return output.getvalue(), "image/jpeg", "converted.jpg"
+
+    elif target_format == "pdf":
+        if source_mime == "application/pdf":
+            return data, "application/pdf", "original.pdf"
+
+        img = Image.open(BytesIO(data)).convert("RGB")
+        img.save(output, format="PDF")
+        return output.getvalue(), "application/pdf", "converted.pdf"
+
+    raise ValueError("Unsupported format")
+
+
+# Deep-zoom pages and tiles, rendered from the original on disk
+
+TILE_JPEG_QUALITY = 85
+FITZ_FILETYPES = {'application/pdf': 'pdf', 'image/jpeg': 'jpeg', 'image/jpg': 'jpeg', 'image/png': 'png'}
+
+
+def open_source(path, filetype):
+    try:
+        return fitz.open(path, filetype=filetype)
+    except fitz.FileNotFoundError as e:
+        # The cached original was evicted before we got to it; a plain
+        # FileNotFoundError tells the web worker to fetch it again
+        raise FileNotFoundError(path) from e
+
+
+def open_document(path, mime_type):
+    """PDFs and images alike open as fitz documents (an image is a one page document)."""
+    return open_source(path, FITZ_FILETYPES[mime_type])
+
+
+def get_page(doc, page_number):
+    if not 1 <= page_number <= len(doc):
+        raise ValueError(f"Page {page_number} is out of range (1-{len(doc)}).")
+    return doc.load_page(page_number - 1)
+
+
+def page_pixels(page, dpi):
+    zoom = dpi / 72
+    return math.ceil(page.rect.width * zoom), math.ceil(page.rect.height * zoom)
+
+
+def max_level(width, height):
+    return max(0, math.ceil(math.log2(max(width, height, 1))))
+
+
+def pixmap_jpeg(pix):
+    img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+    output = BytesIO()
+    img.save(output, format="JPEG", quality=TILE_JPEG_QUALITY, optimize=True)
+    return output.getvalue()
+
+
+def document_info_job(path, mime_type, dpi, tile_size):
+    """Deep-zoom descriptor: size and pyramid depth of every page at `dpi`."""
+    doc = open_document(path, mime_type)
+    pages = []
+    for page in doc:
+        width, height = page_pixels(page, dpi)
+        pages.append({'width': width, 'height': height, 'max_level': max_level(width, height)})
+    return {'page_count': len(doc), 'dpi': dpi, 'tile_size': tile_size, 'format': 'jpg', 'pages': pages}
+
+
+def page_image_job(path, mime_type, page_number, dpi):
+    """One whole page as JPEG."""
+    page = get_page(open_document(path, mime_type), page_number)
+    return pixmap_jpeg(page.get_pixmap(dpi=dpi, alpha=False))
+
+
+def page_count_job(path, mime_type):
+    return len(open_document(path, mime_type))
+
+
+def pdf_pages_job(path, page_numbers):
+    """A PDF holding only the given (1-based) pages, in that order."""
+    doc = open_source(path, 'pdf')
+    for number in page_numbers:
+        get_page(doc, number)
+    doc.select([number - 1 for number in page_numbers])
+    return doc.tobytes(garbage=3, deflate=True)
+
+
+def tile_job(path, mime_type, page_number, dpi, tile_size, level, column, row):
+    """
+    Tile (column, row) of pyramid `level`, Deep Zoom layout: the top level is
+    the page at `dpi`, each level below halves it. Only the tile's clip of the
+    page is rasterized.
+    """
+    page = get_page(open_document(path, mime_type), page_number)
+    width, height = page_pixels(page, dpi)
+    top = max_level(width, height)
+    if not 0 <= level <= top:
+        raise ValueError(f"Level {level} is out of range (0-{top}).")
+
+    scale = 2 ** (level - top)
+    level_width, level_height = max(1, math.ceil(width * scale)), max(1, math.ceil(height * scale))
+    x0, y0 = column * tile_size, row * tile_size
+    if column < 0 or row < 0 or x0 >= level_width or y0 >= level_height:
+        raise ValueError(f"Tile {column}/{row} is outside level {level}.")
+    x1, y1 = min(x0 + tile_size, level_width), min(y0 + tile_size, level_height)
+
+    zoom = dpi / 72 * scale
+    origin = page.rect.tl
+    clip = fitz.Rect(x0 / zoom, y0 / zoom, x1 / zoom, y1 / zoom) + (origin.x, origin.y, origin.x, origin.y)
+    return pixmap_jpeg(page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, alpha=False))
+
+
+# --- pool (used by the web workers) ---
+
+def limit_memory(max_bytes):
+    """Worker initializer: cap the address space so a huge page raises MemoryError."""
+    if not max_bytes:
+        return
+    try:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (max_bytes, max_bytes))
+    except (ImportError, ValueError, OSError):  # not available on this platform
+        pass
+
+
+def init_worker(max_bytes, pids):
+    """Worker initializer: report the pid so the pool can kill hung workers, then cap memory."""
+    pids.put(os.getpid())
+    limit_memory(max_bytes)
+
+
+def render_settings():
+    from django.conf import settings
+
+    workers = getattr(settings, 'DRIVE_RENDER_WORKERS', max(1, (os.cpu_count() or 2) // 2))
+    return {
+        'workers': workers,
+        'max_pending': getattr(settings, 'DRIVE_RENDER_MAX_PENDING', max(1, workers) * 4),
+        'timeout': getattr(settings, 'DRIVE_RENDER_TIMEOUT', 30),
+        'memory_limit': getattr(settings, 'DRIVE_RENDER_MEMORY_LIMIT', 1024 ** 3),
+    }
+
+
+class RenderPool:
+    def __init__(self):
+        self._executor = None
+        self._pids = None
+        self._lock = threading.Lock()
+        self._slots = None
+        self.config = None
+
+    def configure(self):
+        if self.config is None:
+            self.config = render_settings()
+            self._slots = threading.BoundedSemaphore(max(1, self.config['max_pending']))
+        return self.config
+
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                config = self.configure()
+                # spawn, not fork: the web worker is threaded and holds DB/HTTP connections
+                context = multiprocessing.get_context('spawn')
+                self._pids = context.SimpleQueue()
+                self._executor = ProcessPoolExecutor(
+                    max_workers=config['workers'],
+                    mp_context=context,
+                    initializer=init_worker,
+                    initargs=(config['memory_limit'], self._pids),
+                )
+            return self._executor
+
+    def recycle(self, executor):
+        """Kill the workers of a pool that hung or broke; the next job starts a fresh one."""
+        with self._lock:
+            if self._executor is not executor:
+                return
+            self._executor = None
+            pids, self._pids = self._pids, None
+        # shutdown() stops new work but waits on running jobs, so a hung worker is killed too
+        executor.shutdown(wait=False, cancel_futures=True)
+        while not pids.empty():
+            try:
+                os.kill(pids.get(), signal.SIGTERM)
+            except (ProcessLookupError, PermissionError):
+                pass  # already gone
+        pids.close()
+
+    def submit(self, job, *args):
+        """Queue a job; returns (future, executor). Raises RenderBusy when the queue is full."""
+        self.configure()
+        if not self._slots.acquire(blocking=False):
+            raise RenderBusy("Too many files are being rendered, try again shortly.")
+        try:
+            executor = self.executor()
+            future = executor.submit(job, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future, executor
+
+    def result(self, future, executor, timeout):
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            logger.warning("Render job timed out after %ss, recycling the pool", timeout)
+            self.recycle(executor)
+            raise RenderError("Rendering took too long.")
+        except BrokenProcessPool:
+            self.recycle(executor)
+            raise RenderError("The renderer crashed on this file.")
+        except MemoryError:
+            raise RenderError("The file is too large to render.")
+
+
+pool = RenderPool()
+
+
+def render(job, *args, timeout=None):
+    """Run a job in the render pool and wait for its result."""
+    config = pool.configure()
+    if not config['workers']:
+        return job(*args)
+    future, executor = pool.submit(job, *args)
+    return pool.result(future, executor, timeout or config['timeout'])
+
+
+async def arender(job, *args, timeout=None):
+    """Awaitable render(): the event loop is free while the worker runs."""
+    config = pool.configure()
+    if not config['workers']:
+        return await asyncio.to_thread(job, *args)
+    future, executor = pool.submit(job, *args)
+    timeout = timeout or config['timeout']
+    try:
+        return await asyncio.wait_for(asyncio.wrap_future(future), timeout)
+    except asyncio.TimeoutError:
+        logger.warning("Render job timed out after %ss, recycling the pool", timeout)
+        pool.recycle(executor)
+        raise RenderError("Rendering took too long.")
+    except BrokenProcessPool:
+        pool.recycle(executor)
+        raise RenderError("The renderer crashed on this file.")
+    except MemoryError:
+        raise RenderError("The file is too large to render.")
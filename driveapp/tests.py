@@ -1,3 +1,804 @@
-from django.test import TestCase
+import asyncio
+import os
+import re
+import shutil
+import tempfile
+import threading
+import time
+from io import BytesIO
+from unittest import mock
 
-# Create your tests here.
+import fitz
+import httpx
+from django.db import DatabaseError
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+
+from driveapp import async_drive, async_views, drive_batch, drive_cache, drive_index, drive_search, drive_utils, lookup_cache, preview_cache, rendering
+from driveapp import views as drive_views
+from driveapp.drive_utils import FOLDER_MIME, SHORTCUT_MIME, normalize_file_name
+from driveapp.lookup_cache import LookupCache
+from driveapp.models import DriveNameGram, DriveNode, DriveSyncState
+from driveapp.rendering import document_info_job
+from globalapp.tests import TEST_CACHES
+
+
+def png_bytes(size=(64, 48), color=(200, 30, 30)):
+    output = BytesIO()
+    Image.new('RGB', size, color).save(output, format='PNG')
+    return output.getvalue()
+
+
+def pdf_bytes(pages=2):
+    doc = fitz.open()
+    for number in range(pages):
+        doc.new_page(width=200, height=300).insert_text((20, 40), f"Page {number + 1}")
+    return doc.tobytes()
+
+
+class RenderInProcessMixin:
+    """Runs render jobs inline (DRIVE_RENDER_WORKERS=0) and keeps the preview cache in a temp dir."""
+
+    def setUp(self):
+        super().setUp()
+        self.cache_dir = tempfile.mkdtemp()
+        self.settings_override = override_settings(DRIVE_PREVIEW_CACHE_DIR=self.cache_dir, DRIVE_RENDER_WORKERS=0)
+        self.settings_override.enable()
+        rendering.pool.config = None
+
+    def tearDown(self):
+        self.settings_override.disable()
+        rendering.pool.config = None
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+        super().tearDown()
+
+
+def noise_image(size):
+    return Image.frombytes('RGB', size, os.urandom(size[0] * size[1] * 3))
+
+
+class CompressToJpegTests(SimpleTestCase):
+    def test_output_fits_the_target_and_the_box(self):
+        output = rendering.compress_to_jpeg(noise_image((1600, 1200)), target_kb=60)
+        self.assertLessEqual(len(output.getvalue()), 60 * 1024)
+        with Image.open(output) as result:
+            self.assertEqual(result.format, 'JPEG')
+            self.assertEqual(result.size, (800, 600))
+
+    def test_small_images_keep_their_size_and_quality(self):
+        output = rendering.compress_to_jpeg(Image.new('RGB', (320, 200), (10, 120, 200)))
+        with Image.open(output) as result:
+            self.assertEqual(result.size, (320, 200))
+        # A flat image fits at the starting quality on the first encode
+        with mock.patch.object(rendering, 'encode_jpeg', wraps=rendering.encode_jpeg) as encode:
+            rendering.compress_to_jpeg(Image.new('RGB', (320, 200), (10, 120, 200)))
+        self.assertEqual([c.args[1] for c in encode.call_args_list], [rendering.TRIAL_QUALITY, 85])
+
+    def test_jpeg_sources_are_decoded_at_reduced_scale(self):
+        source = BytesIO()
+        noise_image((3200, 2400)).save(source, format='JPEG', quality=90)
+        source.seek(0)
+        with Image.open(source) as img, mock.patch.object(img, 'draft', wraps=img.draft) as draft:
+            output = rendering.compress_to_jpeg(img)
+        draft.assert_called_once_with('RGB', (800, 800))
+        with Image.open(output) as result:
+            self.assertLessEqual(max(result.size), 800)
+        self.assertLessEqual(len(output.getvalue()), 200 * 1024)
+
+
+class FakeMediaService:
+    """files().get_media whose http answers Range requests from `data`, counting round trips."""
+
+    def __init__(self, data):
+        self.data = data
+        self.ranges = []
+        self.uri = 'https://drive/media'
+        self.http = self
+
+    def files(self):
+        return self
+
+    def get_media(self, fileId):
+        return self
+
+    def request(self, uri, method, headers):
+        first, _, last = headers['Range'][len('bytes='):].partition('-')
+        self.ranges.append((int(first), int(last)))
+        if int(first) >= len(self.data):
+            return mock.Mock(status=416), b''
+        return mock.Mock(status=206), self.data[int(first):int(last) + 1]
+
+
+class StreamDriveFileTests(SimpleTestCase):
+    # Two and a half chunks
+    data = bytes(range(256)) * (drive_utils.DRIVE_STREAM_CHUNK_SIZE * 5 // 512)
+
+    def stream(self, headers=None):
+        service = FakeMediaService(self.data)
+        metadata = {'id': 'file-1', 'name': "map.pdf", 'mimeType': 'application/pdf', 'size': str(len(self.data))}
+        request = RequestFactory().get('/', headers=headers or {})
+        with mock.patch.object(drive_utils, 'get_drive_service', return_value=service), \
+                mock.patch.object(drive_utils, 'get_file_metadata', return_value=metadata):
+            response = drive_utils.stream_drive_file(request, 'file-1')
+            body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body, service.ranges
+
+    def test_parse_range_header(self):
+        self.assertEqual(drive_utils.parse_range_header('bytes=10-19', 100), (10, 19))
+        self.assertEqual(drive_utils.parse_range_header('bytes=90-', 100), (90, 99))
+        self.assertEqual(drive_utils.parse_range_header('bytes=-5', 100), (95, 99))
+        self.assertEqual(drive_utils.parse_range_header('bytes=90-500', 100), (90, 99))
+        # Multiple, malformed or absent ranges send the whole file
+        for header in (None, 'bytes=0-1,5-6', 'items=0-1', 'bytes=a-b'):
+            self.assertIsNone(drive_utils.parse_range_header(header, 100))
+        with self.assertRaises(ValueError):
+            drive_utils.parse_range_header('bytes=100-', 100)
+
+    def test_whole_file_is_streamed_in_chunks(self):
+        response, body, ranges = self.stream()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(body, self.data)
+        self.assertEqual(response['Content-Length'], str(len(self.data)))
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        chunk = drive_utils.DRIVE_STREAM_CHUNK_SIZE
+        self.assertEqual(ranges, [(0, chunk - 1), (chunk, 2 * chunk - 1), (2 * chunk, len(self.data) - 1)])
+
+    def test_range_request_gets_partial_content(self):
+        response, body, ranges = self.stream({'Range': 'bytes=1500-2099'})
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(body, self.data[1500:2100])
+        self.assertEqual(response['Content-Range'], f"bytes 1500-2099/{len(self.data)}")
+        self.assertEqual(response['Content-Length'], "600")
+        self.assertEqual(ranges, [(1500, 2099)])
+
+        # A resumed download picks up where it stopped
+        response, body, _ = self.stream({'Range': 'bytes=-100'})
+        self.assertEqual(body, self.data[-100:])
+
+    def test_async_view_streams_sync_chunks_under_wsgi(self):
+        metadata = {'id': 'file-1', 'name': "map.pdf", 'mimeType': 'application/pdf', 'size': str(len(self.data))}
+        service = FakeMediaService(self.data)
+        with mock.patch.object(async_views, 'get_drive_service', return_value=service):
+            response = asyncio.run(async_views.stream_drive_file(RequestFactory().get('/'), metadata))
+            self.assertFalse(response.is_async)
+            self.assertEqual(service.ranges, [])
+            self.assertEqual(b''.join(response.streaming_content), self.data)
+
+        response = asyncio.run(async_views.stream_drive_file(AsyncRequestFactory().get('/'), metadata))
+        self.assertTrue(response.is_async)
+
+    def test_unsatisfiable_range(self):
+        response, _, ranges = self.stream({'Range': f"bytes={len(self.data)}-"})
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], f"bytes */{len(self.data)}")
+        self.assertEqual(ranges, [])
+
+
+class ConvertRenderTests(RenderInProcessMixin, SimpleTestCase):
+    def setUp(self):
+        super().setUp()
+        data = pdf_bytes(pages=3)
+        self.metadata = {'id': 'file-3', 'name': "plan.pdf", 'mimeType': 'application/pdf', 'md5Checksum': 'v1', 'size': str(len(data))}
+        for target, name, kwargs in [
+            (drive_views, 'get_drive_service', {}),
+            (drive_views, 'get_file_metadata', {'return_value': self.metadata}),
+            (preview_cache, 'iter_drive_media', {'side_effect': lambda *a: iter([data])}),
+        ]:
+            patcher = mock.patch.object(target, name, **kwargs)
+            setattr(self, name, patcher.start())
+            self.addCleanup(patcher.stop)
+
+    def get(self, **params):
+        headers = params.pop('headers', {})
+        response = self.client.get('/drive/convert-file/', {'file_id': 'file-3', **params}, headers=headers)
+        body = b''.join(response.streaming_content) if response.streaming else response.content
+        return response, body
+
+    def test_info_describes_the_pyramid(self):
+        response, _ = self.get(info=1, dpi=72, tile_size=128)
+        info = response.json()
+        self.assertEqual((info['page_count'], info['dpi'], info['tile_size']), (3, 72, 128))
+        # 200x300pt at 72 dpi; 2**9 >= 300
+        self.assertEqual(info['pages'][0], {'width': 200, 'height': 300, 'max_level': 9})
+
+    def test_page_and_tile_images(self):
+        response, body = self.get(format='jpg', page=2, dpi=144)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(Image.open(BytesIO(body)).size, (400, 600))
+
+        # Top level tiles are tile_size square except at the edges; each level down halves the page
+        _, body = self.get(tile='9/1/0', dpi=72, tile_size=128)
+        self.assertEqual(Image.open(BytesIO(body)).size, (72, 128))
+        _, body = self.get(tile='8/0/1', dpi=72, tile_size=128)
+        self.assertEqual(Image.open(BytesIO(body)).size, (100, 22))
+
+        response, _ = self.get(tile='9/5/0', dpi=72, tile_size=128)
+        self.assertEqual(response.status_code, 400)
+
+    def test_page_selection(self):
+        response, body = self.get(format='pdf', pages='3,1-2')
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        doc = fitz.open(stream=body, filetype='pdf')
+        self.assertEqual([page.get_text().strip() for page in doc], ["Page 3", "Page 1", "Page 2"])
+
+        for pages in ('0', '3-1', '1,x', '2-4'):
+            self.assertEqual(self.get(format='pdf', pages=pages)[0].status_code, 400)
+
+    def test_page_ranges_are_bounded_before_expanding(self):
+        self.assertEqual(drive_views.parse_page_ranges('3,1-2', 3), [3, 1, 2])
+        with self.assertRaisesMessage(ValueError, "out of range"):
+            drive_views.parse_page_ranges('1-1000000000', 3)
+        with self.assertRaisesMessage(ValueError, "At most"):
+            drive_views.parse_page_ranges('1-1000000000', 2000000000)
+        limit = drive_views.MAX_SELECTED_PAGES
+        with self.assertRaisesMessage(ValueError, "At most"):
+            drive_views.parse_page_ranges(f'1-{limit},1', limit)
+
+    def test_rendered_variants_are_cached_and_revalidated(self):
+        response, _ = self.get(format='jpg', page=1)
+        etag = response['ETag']
+        self.assertIn('private', response['Cache-Control'])
+
+        response, _ = self.get(format='jpg', page=1, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 304)
+        response, _ = self.get(format='jpg', page=1)
+        self.assertEqual(response.status_code, 200)
+        # The original was downloaded once for all three requests
+        self.iter_drive_media.assert_called_once()
+
+
+class CachedPreviewTests(RenderInProcessMixin, SimpleTestCase):
+    def preview(self, name, data, mime_type):
+        metadata = {'id': 'file-1', 'name': name, 'mimeType': mime_type, 'md5Checksum': 'v1'}
+        with mock.patch.object(preview_cache, 'get_drive_service'), \
+                mock.patch.object(preview_cache, 'get_file_metadata', return_value=metadata), \
+                mock.patch.object(preview_cache, 'download_media', side_effect=lambda *a: BytesIO(data)) as download:
+            result = preview_cache.cached_preview('file-1')
+        return result, download
+
+    def test_image_is_rendered_and_cached(self):
+        (path, content_type, filename), download = self.preview('map.png', png_bytes(), 'image/png')
+        self.assertEqual(content_type, 'image/jpeg')
+        self.assertEqual(filename, 'preview_map.png.jpg')
+        with open(path, 'rb') as handle:
+            self.assertEqual(handle.read(2), b'\xff\xd8')
+
+        (again, _, _), download = self.preview('map.png', png_bytes(), 'image/png')
+        self.assertEqual(again, path)
+        download.assert_not_called()
+
+    def test_unrenderable_file_falls_back_to_the_original(self):
+        corrupt = b'not really a jpeg'
+        with self.assertLogs('driveapp.preview_cache', 'WARNING'):
+            result, _ = self.preview('map.jpg', corrupt, 'image/jpeg')
+        self.assertIsNone(result)
+        # Only an empty marker is stored, not a copy of the original
+        self.assertEqual([size for _, size, _ in preview_cache.cache_entries()], [0])
+
+        # The broken file is not downloaded or rendered again
+        result, download = self.preview('map.jpg', corrupt, 'image/jpeg')
+        self.assertIsNone(result)
+        download.assert_not_called()
+
+    def test_render_errors_fall_back_to_the_original(self):
+        with mock.patch.object(preview_cache, 'make_preview', side_effect=rendering.RenderError("Rendering took too long.")), \
+                self.assertLogs('driveapp.preview_cache', 'WARNING'):
+            result, _ = self.preview('map.png', png_bytes(), 'image/png')
+        self.assertIsNone(result)
+
+    def test_view_streams_files_without_a_preview(self):
+        streamed = HttpResponse(b"original")
+        with mock.patch.object(drive_views, 'cached_preview', return_value=None), \
+                mock.patch.object(drive_views, 'stream_drive_file', return_value=streamed) as stream, \
+                mock.patch.object(drive_views, 'download_file_by_id') as download:
+            response = self.client.get('/api/drive/preview/', {'file_id': 'file-1'})
+        self.assertIs(response, streamed)
+        self.assertEqual(stream.call_args.args[1], 'file-1')
+        download.assert_not_called()
+
+    def test_busy_pool_is_not_cached(self):
+        with mock.patch.object(preview_cache, 'make_preview', side_effect=rendering.RenderBusy("busy")):
+            with self.assertRaises(rendering.RenderBusy):
+                self.preview('map.png', png_bytes(), 'image/png')
+
+
+class RenderSourceTests(RenderInProcessMixin, SimpleTestCase):
+    def test_evicted_source_is_fetched_again(self):
+        data = pdf_bytes(pages=3)
+        metadata = {'id': 'file-2', 'name': 'plan.pdf', 'mimeType': 'application/pdf', 'md5Checksum': 'v1', 'size': str(len(data))}
+        real_cached_source = preview_cache.cached_source
+        calls = []
+
+        def cached_source(service, metadata):
+            calls.append(metadata['id'])
+            if len(calls) == 1:
+                return f"{self.cache_dir}/evicted.src"  # unlinked by evict() before the worker opened it
+            return real_cached_source(service, metadata)
+
+        with mock.patch.object(preview_cache, 'cached_source', side_effect=cached_source), \
+                mock.patch.object(preview_cache, 'iter_drive_media', return_value=iter([data])):
+            info = preview_cache.render_source(None, metadata, document_info_job, 'application/pdf', 72, 256)
+        self.assertEqual(info['page_count'], 3)
+        self.assertEqual(len(calls), 2)
+
+
+@override_settings(CACHES=TEST_CACHES)
+class LookupCacheTests(SimpleTestCase):
+    def setUp(self):
+        self.lookups = LookupCache(alias='drive_lookups', namespace=f'test-{self._testMethodName}')
+
+    def test_key_is_the_exact_query(self):
+        self.assertEqual(self.lookups.key("Mouza 12.pdf"), self.lookups.key("Mouza 12.pdf"))
+        # Drive matches these differently, so they must not share an entry
+        self.assertNotEqual(self.lookups.key("Mouza 12.pdf"), self.lookups.key("mouza 12.pdf"))
+        self.assertNotEqual(self.lookups.key("মৌজা ১২.pdf"), self.lookups.key("মৌজা 12.pdf"))
+
+    def test_variants_do_not_answer_each_other(self):
+        self.lookups.store("মৌজা ১২.pdf", files=[{'id': 'bengali'}])
+        fetch = mock.Mock(return_value=[{'id': 'ascii'}])
+        self.assertEqual(self.lookups.get_or_fetch("মৌজা 12.pdf", fetch), [{'id': 'ascii'}])
+        fetch.assert_called_once_with("মৌজা 12.pdf")
+        self.assertEqual(self.lookups.get_or_fetch("মৌজা ১২.pdf", fetch), [{'id': 'bengali'}])
+
+    def stale_lookups(self, *names):
+        lookups = LookupCache(alias='drive_lookups', namespace=f'stale-{self._testMethodName}', ttls={'hit': -1, 'miss': -1})
+        for name in names:
+            lookups.store(name, files=[{'id': f'old-{name}'}])
+        return lookups
+
+    def test_stale_names_are_refreshed_in_one_job(self):
+        lookups = self.stale_lookups("a.pdf", "b.pdf", "c.pdf")
+        fetch_many = mock.Mock(return_value=({"a.pdf": [{'id': 'new-a'}], "b.pdf": []}, {"c.pdf": "quota"}))
+        with self.assertLogs('driveapp.lookup_cache', 'WARNING'):
+            lookups.revalidate(["a.pdf", "b.pdf", "c.pdf"], fetch_many)
+            # A second request inside the lease does not queue another refresh
+            lookups.revalidate(["a.pdf", "b.pdf"], fetch_many)
+            lookups._refresher.shutdown(wait=True)
+        fetch_many.assert_called_once_with(["a.pdf", "b.pdf", "c.pdf"])
+        self.assertEqual(lookups.peek("a.pdf")['files'], [{'id': 'new-a'}])
+        self.assertEqual(lookups.peek("b.pdf")['kind'], 'miss')
+        # A failed refresh keeps serving the stale entry
+        self.assertEqual(lookups.peek("c.pdf")['files'], [{'id': 'old-c.pdf'}])
+        self.assertEqual(lookups._inflight, {})
+
+    def test_batched_search_refreshes_stale_names_together(self):
+        lookups = self.stale_lookups("a.pdf", "b.pdf")
+        with mock.patch.object(drive_batch, 'name_lookups', lookups), \
+                mock.patch.object(drive_batch, 'fetch_names', return_value=({"a.pdf": [], "b.pdf": []}, {})) as fetch:
+            results, errors = drive_batch.search_names_batched(["a.pdf", "b.pdf"])
+            lookups._refresher.shutdown(wait=True)
+        self.assertEqual(results, {"a.pdf": [{'id': 'old-a.pdf'}], "b.pdf": [{'id': 'old-b.pdf'}]})
+        fetch.assert_called_once_with(["a.pdf", "b.pdf"], 4, 30)
+
+    def test_cached_failure_returns_no_files(self):
+        with mock.patch.object(lookup_cache, 'name_lookups', LookupCache(alias='drive_lookups', namespace='failures')), \
+                mock.patch.object(drive_utils, 'search_file_by_name', side_effect=RuntimeError("quota")) as search:
+            # The failing call itself raises, as before
+            with self.assertRaises(RuntimeError):
+                drive_utils.search_file_by_name_with_cache("a.pdf")
+            self.assertEqual(drive_utils.search_file_by_name_with_cache("a.pdf"), [])
+        search.assert_called_once()
+
+
+class NameIndexTests(TestCase):
+    def add_node(self, file_id, name, mime_type='application/pdf', parent_id='root'):
+        return DriveNode.objects.create(
+            file_id=file_id, name=name, search_name=normalize_file_name(name),
+            mime_type=mime_type, parent_id=parent_id, full_path=f"Root/{name}",
+        )
+
+    def test_search_matches_normalized_substrings(self):
+        self.add_node('f1', "মৌজা ১২ Map.pdf")
+        self.add_node('f2', "Other.pdf")
+        self.add_node('d1', "Mouza 12", mime_type=FOLDER_MIME)
+        drive_search.rebuild_names()
+        self.assertEqual([f['id'] for f in drive_search.search_names("১২ map")], ['f1'])
+        self.assertEqual([f['id'] for f in drive_search.search_names("mouza 12")], [])
+
+    def test_failed_rebuild_keeps_the_old_index(self):
+        self.add_node('f1', "Dag 101.pdf")
+        drive_search.rebuild_names()
+        grams = DriveNameGram.objects.count()
+        with mock.patch.object(DriveNameGram.objects, 'bulk_create', side_effect=DatabaseError("disk full")):
+            with self.assertRaises(DatabaseError):
+                drive_search.rebuild_names()
+        self.assertEqual(DriveNameGram.objects.count(), grams)
+        self.assertEqual([f['id'] for f in drive_search.search_names("dag 101")], ['f1'])
+
+
+class DriveIndexTests(TestCase):
+    def add_node(self, file_id, name, parent_id, mime_type='application/pdf', **extra):
+        return DriveNode.objects.create(file_id=file_id, name=name, parent_id=parent_id, mime_type=mime_type, **extra)
+
+    def setUp(self):
+        self.add_node('root', drive_utils.ROOT_FOLDER_NAME, None, FOLDER_MIME)
+        self.add_node('dhaka', "Dhaka", 'root', FOLDER_MIME)
+        self.add_node('m10', "10_Map_1.pdf", 'dhaka')
+        self.add_node('m2', "2_Map_1.pdf", 'dhaka')
+        self.add_node('linked', "Linked", 'elsewhere', FOLDER_MIME)
+        self.add_node('m1', "1_Map_1.pdf", 'linked')
+        self.add_node('s1', "Linked", 'dhaka', SHORTCUT_MIME, shortcut_target_id='linked', shortcut_target_mime=FOLDER_MIME)
+        self.add_node('s2', "2_Map_2.pdf", 'dhaka', SHORTCUT_MIME, shortcut_target_id='m3', shortcut_target_mime='application/pdf')
+
+    def test_folders_and_files_come_from_the_index(self):
+        self.assertEqual(drive_index.traverse_indexed_path(""), {'folders': ["Dhaka"]})
+        files = drive_index.traverse_indexed_path(f"{drive_utils.ROOT_FOLDER_NAME}/Dhaka")['files']
+        # Shortcut folders are flattened in; files sort by the numbers in their names
+        self.assertEqual(
+            [(f['name'], f['id']) for f in files],
+            [("1_Map_1.pdf", 'm1'), ("2_Map_1.pdf", 'm2'), ("2_Map_2.pdf", 'm3'), ("10_Map_1.pdf", 'm10')],
+        )
+        with self.assertRaises(drive_index.IndexMiss):
+            drive_index.traverse_indexed_path(f"{drive_utils.ROOT_FOLDER_NAME}/Khulna")
+
+    def test_browse_falls_back_to_drive_until_the_index_is_ready(self):
+        with mock.patch.object(drive_index, 'traverse_drive_path', return_value={'folders': ["Live"]}) as live:
+            self.assertEqual(drive_index.browse_drive_path(""), {'folders': ["Live"]})
+            live.assert_called_once_with("")
+
+            DriveSyncState.objects.create(last_full_sync=timezone.now())
+            self.assertEqual(drive_index.browse_drive_path(""), {'folders': ["Dhaka"]})
+            live.assert_called_once()
+
+            # Paths the index does not know yet are asked of Drive
+            drive_index.browse_drive_path(f"{drive_utils.ROOT_FOLDER_NAME}/Khulna")
+            self.assertEqual(live.call_count, 2)
+
+
+class FakeFolderService:
+    """Answers files().get from `folders` through the batch endpoint only, counting sub-requests."""
+
+    def __init__(self, folders):
+        self.folders = folders
+        self.fetched = []
+        self.batches = 0
+
+    def files(self):
+        return self
+
+    def get(self, fileId, fields):
+        return fileId
+
+    def new_batch_http_request(self, callback):
+        service = self
+
+        class Batch:
+            def __init__(self):
+                self.ids = []
+
+            def add(self, folder_id):
+                self.ids.append(folder_id)
+
+            def execute(self):
+                service.batches += 1
+                for folder_id in self.ids:
+                    service.fetched.append(folder_id)
+                    name, parent_id = service.folders[folder_id]
+                    callback(folder_id, {'id': folder_id, 'name': name, 'parents': [parent_id] if parent_id else []}, None)
+
+        return Batch()
+
+
+class FolderCacheTests(SimpleTestCase):
+    def setUp(self):
+        drive_cache.folder_cache.clear()
+        self.addCleanup(drive_cache.folder_cache.clear)
+
+    def test_ttl_cache_is_a_bounded_lru(self):
+        cache = drive_cache.TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+        self.assertEqual(cache.get_many(['a', 'b', 'c']), {'a': 1, 'c': 3})
+
+        cache.set('a', 1, ttl=-1)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(len(cache), 1)
+
+    def test_paths_share_one_batched_lookup_per_level(self):
+        service = FakeFolderService({
+            'root': ("Root", None),
+            'dhaka': ("Dhaka", 'root'),
+            'khulna': ("Khulna", 'root'),
+        })
+        files = [
+            {'name': "a.pdf", 'parents': ['dhaka']},
+            {'name': "b.pdf", 'parents': ['khulna']},
+            {'name': "c.pdf", 'parents': ['dhaka']},
+            {'name': "orphan.pdf"},
+        ]
+        self.assertEqual(
+            drive_utils.resolve_paths(service, files),
+            ["Root/Dhaka/a.pdf", "Root/Khulna/b.pdf", "Root/Dhaka/c.pdf", "orphan.pdf"],
+        )
+        # Each distinct folder is fetched once, one batch per tree level
+        self.assertEqual(sorted(service.fetched), ['dhaka', 'khulna', 'root'])
+        self.assertEqual(service.batches, 2)
+
+        # Cached folders cost nothing the next time
+        self.assertEqual(drive_utils.get_full_path(service, files[1]), "Root/Khulna/b.pdf")
+        self.assertEqual(service.batches, 2)
+
+    def test_large_levels_are_split_into_batch_sized_requests(self):
+        folders = {f"f{n}": (f"Folder {n}", None) for n in range(drive_utils.DRIVE_BATCH_LIMIT + 1)}
+        service = FakeFolderService(folders)
+        drive_utils.resolve_paths(service, [{'name': "x.pdf", 'parents': [folder_id]} for folder_id in folders])
+        self.assertEqual(service.batches, 2)
+
+
+class FakeListService:
+    """files().list over `children` (folder id -> pages of items), recording each query."""
+
+    def __init__(self, children):
+        self.children = children
+        self.queries = []
+
+    def files(self):
+        return self
+
+    def list(self, q, pageToken=None, **kwargs):
+        self.queries.append(q)
+        self.response = self.answer(q, int(pageToken or 0))
+        return self
+
+    def execute(self):
+        return self.response
+
+    def answer(self, query, page):
+        if query.startswith('mimeType='):
+            name = re.search(r"name='([^']*)'", query).group(1)
+            return {'files': [{'id': name, 'name': name}]}
+        parent_ids = re.findall(r"'([^']+)' in parents", query)
+        if len(parent_ids) > 1:
+            # OR-combined queries come back as one page
+            return {'files': [item for parent_id in parent_ids for item in self.page_of(parent_id, 0)]}
+        pages = self.children[parent_ids[0]]
+        result = {'files': self.page_of(parent_ids[0], page)}
+        if page + 1 < len(pages):
+            result['nextPageToken'] = str(page + 1)
+        return result
+
+    def page_of(self, parent_id, page):
+        return [dict(item, parents=[parent_id]) for item in self.children[parent_id][page]]
+
+
+def drive_item(name, mime_type='application/pdf', target=None):
+    item = {'id': f"id-{name}", 'name': name, 'mimeType': mime_type}
+    if target:
+        item['shortcutDetails'] = {'targetId': target, 'targetMimeType': FOLDER_MIME}
+    return item
+
+
+class DriveListingTests(SimpleTestCase):
+    def setUp(self):
+        drive_cache.shortcut_cache.clear()
+        self.addCleanup(drive_cache.shortcut_cache.clear)
+        self.service = FakeListService({
+            'Upazila': [
+                [drive_item("3_A_1.pdf"), drive_item("1_A_1.pdf"), drive_item("Linked", SHORTCUT_MIME, target='linked')],
+                [drive_item("2_A_1.pdf"), drive_item("10_A_1.pdf")],
+            ],
+            'linked': [[drive_item("4_B_1.pdf"), drive_item("Sub", FOLDER_MIME)]],
+        })
+        patcher = mock.patch.object(drive_utils, 'get_drive_service', return_value=self.service)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_every_page_is_listed_and_merged_in_order(self):
+        result = drive_utils.traverse_drive_path("Upazila")
+        self.assertEqual(
+            [f['name'] for f in result['files']],
+            ["1_A_1.pdf", "2_A_1.pdf", "3_A_1.pdf", "4_B_1.pdf", "10_A_1.pdf"],
+        )
+
+    def test_explorer_offset_and_limit(self):
+        with mock.patch.object(drive_index, 'index_ready', return_value=False):
+            response = self.client.get('/api/drive/folders/Upazila/', {'offset': 1, 'limit': 2})
+            self.assertEqual(response.json(), {
+                'files': [{'name': "2_A_1.pdf", 'id': "id-2_A_1.pdf"}, {'name': "3_A_1.pdf", 'id': "id-3_A_1.pdf"}],
+                'total': 5, 'offset': 1, 'limit': 2,
+            })
+            # Without either param the listing is unchanged
+            self.assertEqual(len(self.client.get('/api/drive/folders/Upazila/').json()['files']), 5)
+            self.assertEqual(self.client.get('/api/drive/folders/Upazila/', {'limit': -1}).status_code, 400)
+
+
+class ShortcutFolderTests(SimpleTestCase):
+    def setUp(self):
+        drive_cache.shortcut_cache.clear()
+        self.addCleanup(drive_cache.shortcut_cache.clear)
+
+    def fake_service(self, target_ids):
+        return FakeListService({target_id: [[drive_item(f"1_{target_id}_1.pdf")]] for target_id in target_ids})
+
+    def test_targets_share_one_query_and_are_cached(self):
+        service = self.fake_service(['t1', 't2'])
+        with mock.patch.object(drive_utils, 'get_drive_service', return_value=service):
+            resolved = drive_utils.resolve_shortcut_folders(['t1', 't2', 't1'])
+            self.assertEqual({k: [f['name'] for f in v] for k, v in resolved.items()}, {'t1': ["1_t1_1.pdf"], 't2': ["1_t2_1.pdf"]})
+            self.assertEqual(len(service.queries), 1)
+
+            drive_utils.resolve_shortcut_folders(['t2'])
+            self.assertEqual(len(service.queries), 1)
+
+    def test_many_targets_are_chunked(self):
+        target_ids = [f"t{n}" for n in range(drive_utils.SHORTCUT_QUERY_CHUNK * 2 + 1)]
+        service = self.fake_service(target_ids)
+        with mock.patch.object(drive_utils, 'get_drive_service', return_value=service):
+            resolved = drive_utils.resolve_shortcut_folders(target_ids)
+        self.assertEqual(len(service.queries), 3)
+        self.assertEqual(resolved[target_ids[-1]], [{'name': f"1_{target_ids[-1]}_1.pdf", 'id': f"id-1_{target_ids[-1]}_1.pdf"}])
+
+
+class AsyncDriveClientTests(SimpleTestCase):
+    def setUp(self):
+        self.clients = []
+        patcher = mock.patch.object(async_drive, 'new_client', side_effect=self.new_client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(async_drive, 'auth_headers', new=mock.AsyncMock(return_value={}))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def new_client(self):
+        def handler(request):
+            if request.url.params.get('alt') == 'media':
+                return httpx.Response(200, content=b'data')
+            return httpx.Response(200, json={'id': request.url.path.rsplit('/', 1)[-1], 'files': []})
+
+        client = httpx.AsyncClient(base_url=async_drive.DRIVE_API, transport=httpx.MockTransport(handler))
+        self.clients.append(client)
+        return client
+
+    async def test_a_session_shares_one_client_and_closes_it(self):
+        async with async_drive.session():
+            await asyncio.gather(*(async_drive.get_file(f"f{n}", 'id') for n in range(3)))
+            async with async_drive.session():
+                await async_drive.get_file("nested", 'id')
+            self.assertFalse(self.clients[0].is_closed)
+        self.assertEqual(len(self.clients), 1)
+        self.assertTrue(self.clients[0].is_closed)
+
+    async def test_calls_outside_a_session_close_their_client(self):
+        self.assertEqual((await async_drive.get_file("f1", 'id'))['id'], "f1")
+        self.assertEqual(len(self.clients), 1)
+        self.assertTrue(self.clients[0].is_closed)
+
+    async def test_streams_own_their_client(self):
+        async with async_drive.session():
+            stream = async_drive.iter_media("f1")
+        # The view's session is over, the stream still reads and then closes its client
+        self.assertEqual([chunk async for chunk in stream], [b'data'])
+        self.assertTrue(all(client.is_closed for client in self.clients))
+
+
+class BatchSearchTests(SimpleTestCase):
+    def test_names_queued_behind_slow_waves_get_their_own_deadline(self):
+        names = [f"{n}.pdf" for n in range(30)]
+
+        def run_batch(chunk):
+            time.sleep(0.05)
+            return {name: [] for name in chunk}, {}
+
+        search = drive_batch.BatchSearch(names, max_workers=1, item_timeout=0.08, batch_size=10)
+        with mock.patch.object(search, 'run_batch', side_effect=run_batch):
+            found, failed = search.run()
+        # Three waves take longer than one item_timeout, but each name only waits for its own
+        self.assertEqual(set(found), set(names))
+        self.assertEqual(failed, {})
+
+    def test_retried_names_time_out(self):
+        def run_batch(chunk):
+            return {name: [] for name in chunk if name != "flaky.pdf"}, {"flaky.pdf": (503, "backend error")}
+
+        search = drive_batch.BatchSearch(["a.pdf", "flaky.pdf"], item_timeout=0.05, max_attempts=1000, backoff=0.01)
+        with mock.patch.object(search, 'run_batch', side_effect=run_batch):
+            found, failed = search.run()
+        self.assertEqual(set(found), {"a.pdf"})
+        self.assertEqual(failed, {"flaky.pdf": "Search timeout for file: flaky.pdf"})
+
+
+@override_settings(DRIVE_RENDER_WORKERS=1, DRIVE_RENDER_MEMORY_LIMIT=0)
+class RenderJobTests(SimpleTestCase):
+    def test_preview_job(self):
+        with Image.open(BytesIO(rendering.preview_job(png_bytes(), '.png'))) as preview:
+            self.assertEqual((preview.format, preview.size), ('JPEG', (64, 48)))
+        with Image.open(BytesIO(rendering.preview_job(pdf_bytes(), '.pdf'))) as preview:
+            # First page at 100 dpi
+            self.assertEqual((preview.format, preview.size), ('JPEG', (278, 417)))
+        self.assertIsNone(rendering.preview_job(b"text", '.txt'))
+
+    def test_convert_job(self):
+        data, mime_type, filename = rendering.convert_job(png_bytes(), 'image/png', 'pdf')
+        self.assertEqual((mime_type, filename), ("application/pdf", "converted.pdf"))
+        self.assertEqual(fitz.open(stream=data, filetype='pdf').page_count, 1)
+
+        data, mime_type, _ = rendering.convert_job(pdf_bytes(), 'application/pdf', 'jpg')
+        self.assertEqual(mime_type, "image/jpeg")
+        self.assertEqual(Image.open(BytesIO(data)).format, 'JPEG')
+        with self.assertRaises(ValueError):
+            rendering.convert_job(png_bytes(), 'image/png', 'gif')
+
+    @override_settings(DRIVE_RENDER_WORKERS=0)
+    def test_no_workers_renders_inline(self):
+        pool = rendering.RenderPool()
+        with mock.patch.object(rendering, 'pool', pool):
+            self.assertEqual(rendering.render(os.getpid), os.getpid())
+            self.assertEqual(asyncio.run(rendering.arender(len, b"abc")), 3)
+        self.assertIsNone(pool._executor)
+
+    @override_settings(DRIVE_RENDER_WORKERS=1, DRIVE_RENDER_MAX_PENDING=1)
+    def test_jobs_run_in_a_worker_process_and_the_queue_is_bounded(self):
+        pool = rendering.RenderPool()
+        self.addCleanup(lambda: pool._executor and pool.recycle(pool._executor))
+        with mock.patch.object(rendering, 'pool', pool):
+            self.assertNotEqual(rendering.render(os.getpid), os.getpid())
+            preview = rendering.render(rendering.preview_job, png_bytes(), '.png')
+            self.assertEqual(Image.open(BytesIO(preview)).format, 'JPEG')
+
+            future, executor = pool.submit(time.sleep, 0.5)
+            with self.assertRaises(rendering.RenderBusy):
+                rendering.render(os.getpid)
+            future.result(timeout=60)
+
+
+class RenderPoolTests(SimpleTestCase):
+    def test_recycle_kills_a_hung_worker(self):
+        pool = rendering.RenderPool()
+        future, executor = pool.submit(os.getpid)
+        pid = future.result(timeout=60)
+
+        future, executor = pool.submit(time.sleep, 60)
+        with self.assertLogs('driveapp.rendering', 'WARNING'), self.assertRaises(rendering.RenderError):
+            pool.result(future, executor, timeout=0.5)
+
+        # The sleeping worker is gone well before its job would have finished
+        for _ in range(100):
+            try:
+                os.kill(pid, 0)
+            except ProcessLookupError:
+                break
+            time.sleep(0.05)
+        else:
+            self.fail("worker still running")
+        self.assertIsNot(pool.executor(), executor)
+        pool.recycle(pool.executor())
+
+
+class DriveClientTests(SimpleTestCase):
+    def setUp(self):
+        self.credentials = mock.Mock(valid=True)
+        patcher = mock.patch.object(drive_utils.service_account.Credentials, 'from_service_account_file', return_value=self.credentials)
+        self.load = patcher.start()
+        self.addCleanup(patcher.stop)
+        for name, value in (('_credentials', None), ('_local', threading.local())):
+            patcher = mock.patch.object(drive_utils, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def test_one_client_per_thread_and_shared_credentials(self):
+        service = drive_utils.get_drive_service()
+        self.assertIs(drive_utils.get_drive_service(), service)
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(drive_utils.get_drive_service()))
+        thread.start()
+        thread.join()
+        self.assertIsNot(other[0], service)
+        self.load.assert_called_once()
+
+        drive_utils.reset_drive_service()
+        self.assertIsNot(drive_utils.get_drive_service(), service)
+
+    def test_expired_token_is_refreshed_once(self):
+        self.credentials.valid = False
+        self.credentials.refresh.side_effect = lambda request: setattr(self.credentials, 'valid', True)
+        threads = [threading.Thread(target=drive_utils.get_drive_credentials) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.credentials.refresh.assert_called_once()
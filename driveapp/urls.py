@@ -1,7 +1,7 @@
 from django.urls import path, re_path
 from .views import DriveExplorerView
 from rest_framework.routers import DefaultRouter,SimpleRouter
-from . import views
+from . import async_views, views
 
 router = SimpleRouter()
 router.register(r'mouza-map-data',views.MouzamapdataViewSet,basename="mouza-map-data")
@@ -16,6 +16,13 @@ urlpatterns = [
     path('user-files/', views.UserPurchasedFilesView.as_view(), name='user-purchased-files'),
     path('user-files-batch/', views.UserPurchasedFilesBatchView.as_view(), name='user-purchased-files-batch'),
     path("drive/convert-file/", views.DriveFileConvertView.as_view(), name="drive_convert_file"),
+    # Async (ASGI) versions of the Drive endpoints
+    re_path(r'^api/drive/async/folders/(?P<path>.+)/$', async_views.AsyncDriveExplorerView.as_view(), name='async-drive-explorer'),
+    path('api/drive/async/folders/', async_views.AsyncDriveExplorerView.as_view(), name='async-drive-root'),
+    path('api/drive/async/search-file/', async_views.AsyncDriveFileSearchView.as_view(), name='async-drive-file-search'),
+    path('api/drive/async/preview/', async_views.AsyncDriveFilePreviewByIdView.as_view(), name='async-drive-preview'),
+    path('api/drive/async/convert-file/', async_views.AsyncDriveFileConvertView.as_view(), name='async-drive-convert-file'),
+    path('api/drive/async/user-files/', async_views.AsyncUserPurchasedFilesView.as_view(), name='async-user-purchased-files'),
     
 ]
 urlpatterns+= router.urls
\ No newline at end of file
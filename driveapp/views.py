@@ -1,8 +1,10 @@
 import unicodedata
 from urllib.parse import unquote
 
+from django.conf import settings
 from django.db.models import Q
-from django.http import JsonResponse, FileResponse
+from django.http import FileResponse, HttpResponseNotModified, JsonResponse
+from django.utils.cache import patch_cache_control
 from django.views import View
 
 from rest_framework import status
@@ -18,28 +20,56 @@ from driveapp.serializers import (
     MouzamapdataSerializer,
     SubDistrictSerializer
 )
-from driveapp.filters import MouzamapdataFilter
-from globalapp.views import BaseViews
-from globalapp.ed import encode_jwt
-from others.models import Purchases
+from driveapp.filters import District2Filter, Division2Filter, MouzamapdataFilter, SubDistrictFilter
+from driveapp.drive_index import browse_drive_path
+from driveapp.preview_cache import cached_preview, cached_render, file_version, render_source, variant_key
+from driveapp.rendering import (
+    FITZ_FILETYPES,
+    RenderBusy,
+    document_info_job,
+    page_count_job,
+    page_image_job,
+    pdf_pages_job,
+    tile_job,
+)
+from globalapp.views import BaseViews, PublicCacheMixin
+from others.manifest import manifest_rows, purchased_files_page, resolve_page, serialize_rows
 from .drive_utils import (
     convert_file_format,
     download_file_by_id,
     search_file_by_name,
-    batch_search_files,
-    traverse_drive_path,
-    get_drive_service
+    get_drive_service,
+    get_file_metadata,
+    stream_drive_file,
 )
 
 # Optional utility function
 def normalize_unicode(text):
     return unicodedata.normalize("NFC", text.strip()) if text else None
 
+def paginate_listing(result, offset, limit):
+    """Slice the folders/files of a listing, keeping its shape plus the total."""
+    key = 'folders' if 'folders' in result else 'files'
+    items = result[key]
+    end = offset + limit if limit is not None else None
+    return {key: items[offset:end], 'total': len(items), 'offset': offset, 'limit': limit}
+
+
 class DriveExplorerView(View):
     def get(self, request, *args, **kwargs):
         path = unquote(kwargs.get("path", ""))
         try:
-            result = traverse_drive_path(path)
+            offset = int(request.GET.get('offset') or 0)
+            limit = int(request.GET['limit']) if request.GET.get('limit') else None
+            if offset < 0 or (limit is not None and limit < 0):
+                raise ValueError
+        except ValueError:
+            return JsonResponse({'error': 'offset and limit must be non-negative integers'}, status=400)
+
+        try:
+            result = browse_drive_path(path)
+            if 'offset' in request.GET or 'limit' in request.GET:
+                result = paginate_listing(result, offset, limit)
             return JsonResponse(result, safe=False, json_dumps_params={'ensure_ascii': False})
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
@@ -64,10 +94,20 @@ class DriveFilePreviewByIdView(View):
             return JsonResponse({'error': 'Missing "file_id" query parameter'}, status=400)
 
         try:
-            # 🔧 Always compress
-            stream, mime_type, filename = download_file_by_id(file_id, compress=True)
-            return FileResponse(stream, content_type=mime_type, filename=filename)
+            # Rendered previews are kept on disk per file version
+            preview = cached_preview(file_id)
+            if preview is not None:
+                path, content_type, filename = preview
+                try:
+                    return FileResponse(open(path, 'rb'), content_type=content_type, filename=filename)
+                except FileNotFoundError:
+                    pass  # evicted meanwhile
+
+            # No preview for this file: stream the original from Drive
+            return stream_drive_file(request, file_id)
 
+        except RenderBusy as e:
+            return JsonResponse({'error': str(e)}, status=503, headers={'Retry-After': '5'})
         except Exception as e:
             return JsonResponse({'error': str(e)}, status=500)
 
@@ -76,6 +116,8 @@ class MouzamapdataViewSet(BaseViews):
     methods = ["list", "retrieve"]
     queryset = Mouzamapdata.objects.all()
     serializer_class = MouzamapdataSerializer
+    filterset_class = MouzamapdataFilter
+    query_budget = 10
 
     @action(detail=False, methods=["get"], url_path="get-survey-names")
     def get_survey_names(self, request):
@@ -91,7 +133,7 @@ class MouzamapdataViewSet(BaseViews):
         if subdistrict_name:
             filters &= Q(subdistrict_fk__name__icontains=subdistrict_name)
 
-        queryset = self.get_queryset().filter(filters)
+        queryset = self.filter_queryset(self.get_queryset()).filter(filters)
 
         survey_name_en_list = (
             queryset
@@ -100,217 +142,83 @@ class MouzamapdataViewSet(BaseViews):
             .order_by("survey_name_en")
         )
 
-        token = encode_jwt({"survey_name_en_list": list(survey_name_en_list)})
+        data, headers = self.encode_payload({"survey_name_en_list": list(survey_name_en_list)})
         return self.generate_response(
             True,
             status.HTTP_200_OK,
             "success",
-            data={"token": token}
+            data=data,
+            headers=headers
         )
 
-class Division2ViewSet(BaseViews):
+class Division2ViewSet(PublicCacheMixin, BaseViews):
     model_name = Division2
     methods = ["list", "retrieve"]
     queryset = Division2.objects.all()
     serializer_class = Division2Serializer
+    filterset_class = Division2Filter
+    query_budget = 10
 
-class District2ViewSet(BaseViews):
+class District2ViewSet(PublicCacheMixin, BaseViews):
     model_name = District2
     methods = ["list", "retrieve"]
     queryset = District2.objects.all()
     serializer_class = District2Serializer
+    filterset_class = District2Filter
+    query_budget = 10
 
-class SubDistrictViewSet(BaseViews):
+class SubDistrictViewSet(PublicCacheMixin, BaseViews):
     model_name = SubDistrict
     methods = ["list", "retrieve"]
     queryset = SubDistrict.objects.all()
     serializer_class = SubDistrictSerializer
+    filterset_class = SubDistrictFilter
+    query_budget = 10
 
 class UserPurchasedFilesView(APIView):
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request):
-        user = request.user
-        
-        # Add pagination parameters
+        # Pagination parameters
         page = int(request.GET.get('page', 1))
-        page_size = int(request.GET.get('page_size', 5))  # Limit to 5 files per request
-        offset = (page - 1) * page_size
-        
+        page_size = int(request.GET.get('page_size', 5))
+
         try:
-            purchases = Purchases.objects.filter(user=user, payment_status='completed')
-            
-            # Collect all file names
-            all_file_names = []
-            for purchase in purchases:
-                if purchase.file_name:
-                    all_file_names.extend(purchase.file_name)
-            
-            # Remove duplicates and apply pagination
-            unique_file_names = list(set(all_file_names))
-            total_files = len(unique_file_names)
-            paginated_file_names = unique_file_names[offset:offset + page_size]
-            
-            found_files = []
-            failed_files = []
-            
-            # Use batch search for better performance
-            try:
-                batch_result = batch_search_files(
-                    paginated_file_names, 
-                    max_workers=3  # Limit concurrent requests
-                )
-                
-                # Process successful results
-                for file_name, matches in batch_result['results'].items():
-                    if matches:
-                        for match in matches[:2]:  # Limit to first 2 matches per file
-                            found_files.append({
-                                "name": match.get("name"),
-                                "id": match.get("id"),
-                                "mimeType": match.get("mimeType"),
-                                "parents": match.get("parents"),
-                                "original_search": file_name
-                            })
-                    else:
-                        failed_files.append({
-                            "name": file_name,
-                            "error": "File not found in Google Drive"
-                        })
-                
-                # Process errors
-                for failed_file in batch_result['failed_files']:
-                    failed_files.append({
-                        "name": failed_file['file_name'],
-                        "error": failed_file['error']
-                    })
-                    
-            except Exception as e:
-                # Fallback to individual searches if batch fails
-                for file_name in paginated_file_names:
-                    try:
-                        matches = search_file_by_name(file_name)
-                        if matches:
-                            match = matches[0]  # Take only first match
-                            found_files.append({
-                                "name": match.get("name"),
-                                "id": match.get("id"),
-                                "mimeType": match.get("mimeType"),
-                                "parents": match.get("parents"),
-                                "original_search": file_name
-                            })
-                        else:
-                            failed_files.append({
-                                "name": file_name,
-                                "error": "File not found in Google Drive"
-                            })
-                    except Exception as individual_error:
-                        failed_files.append({
-                            "name": file_name,
-                            "error": str(individual_error)
-                        })
-                        continue
-            
-            # Calculate pagination info
-            has_next = offset + page_size < total_files
-            has_previous = page > 1
-            
-            response_data = {
-                "files": found_files,
-                "failed_files": failed_files if failed_files else None,
-                "pagination": {
-                    "current_page": page,
-                    "page_size": page_size,
-                    "total_files": total_files,
-                    "total_pages": (total_files + page_size - 1) // page_size,
-                    "has_next": has_next,
-                    "has_previous": has_previous,
-                    "files_in_current_page": len(found_files)
-                }
-            }
-            
-            return Response(response_data, status=status.HTTP_200_OK)
-            
+            # Rows of the purchased-file manifest, paginated in the database
+            return Response(purchased_files_page(request.user, page, page_size), status=status.HTTP_200_OK)
         except Exception as e:
             return Response({
                 "error": "Failed to fetch purchased files",
                 "details": str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+
 class UserPurchasedFilesBatchView(APIView):
     """
-    Optimized version for fetching all files with better performance
+    All of the user's purchased files in one response
     """
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
+    # Unresolved names are looked up in Drive batch requests (or the local index), so hundreds are fine
+    max_files = getattr(settings, 'DRIVE_BATCH_MAX_FILES', 500)
 
     def get(self, request):
-        user = request.user
-        
         try:
-            purchases = Purchases.objects.filter(user=user, payment_status='completed')
-            
-            # Collect all file names efficiently
-            all_file_names = set()  # Use set to avoid duplicates
-            for purchase in purchases:
-                if purchase.file_name:
-                    all_file_names.update(purchase.file_name)
-            
-            total_files = len(all_file_names)
-            
+            rows = manifest_rows(request.user)
+            total_files = rows.count()
+
             # If too many files, suggest using paginated endpoint
-            if total_files > 50:
+            if total_files > self.max_files:
                 return Response({
                     "message": "Too many files to fetch at once. Please use paginated endpoint.",
                     "total_files": total_files,
                     "suggestion": "Use /api/drive/user-purchased-files/ with page and page_size parameters",
                     "recommended_page_size": 20
                 }, status=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE)
-            
-            found_files = []
-            failed_files = []
-            
-            # Use batch search for all files
-            try:
-                batch_result = batch_search_files(
-                    list(all_file_names), 
-                    max_workers=4  # Slightly higher for batch
-                )
-                
-                # Process successful results
-                for file_name, matches in batch_result['results'].items():
-                    if matches:
-                        # Take only the first match to avoid duplicates
-                        match = matches[0]
-                        found_files.append({
-                            "name": match.get("name"),
-                            "id": match.get("id"),
-                            "mimeType": match.get("mimeType"),
-                            "parents": match.get("parents"),
-                            "original_search": file_name
-                        })
-                    else:
-                        failed_files.append({
-                            "name": file_name,
-                            "error": "File not found in Google Drive"
-                        })
-                
-                # Process errors
-                for failed_file in batch_result['failed_files']:
-                    failed_files.append({
-                        "name": failed_file['file_name'],
-                        "error": failed_file['error']
-                    })
-                    
-            except Exception as batch_error:
-                # Fallback to individual processing if batch completely fails
-                return Response({
-                    "error": "Batch processing failed, too many files to process",
-                    "details": str(batch_error),
-                    "suggestion": "Use the paginated endpoint: /api/drive/user-purchased-files/"
-                }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-            
+
+            found_files, failed_files = serialize_rows(resolve_page(rows))
+
             return Response({
                 "files": found_files,
                 "failed_files": failed_files if failed_files else None,
@@ -321,30 +229,137 @@ class UserPurchasedFilesBatchView(APIView):
                     "success_rate": f"{(len(found_files) / total_files * 100):.1f}%" if total_files > 0 else "0%"
                 }
             }, status=status.HTTP_200_OK)
-            
+
         except Exception as e:
             return Response({
                 "error": "Failed to fetch purchased files",
                 "details": str(e)
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+RENDER_PARAMS = ('page', 'pages', 'dpi', 'tile', 'info')
+MAX_SELECTED_PAGES = 500
+
+
+def clamp_int(value, default, low, high):
+    if value in (None, ''):
+        return default
+    return min(max(int(value), low), high)
+
+
+def parse_page_ranges(value, page_count):
+    """'1-3,5' -> [1, 2, 3, 5]; every page must exist in a document of page_count pages."""
+    pages = []
+    for part in value.split(','):
+        first, _, last = part.strip().partition('-')
+        start = int(first)
+        end = int(last) if last else start
+        if start < 1 or end < start:
+            raise ValueError(f"Invalid page range '{part}'.")
+        if end > page_count:
+            raise ValueError(f"Page {end} is out of range (1-{page_count}).")
+        # Checked before expanding, so a huge range costs nothing
+        if len(pages) + (end - start + 1) > MAX_SELECTED_PAGES:
+            raise ValueError(f"At most {MAX_SELECTED_PAGES} pages can be selected.")
+        pages.extend(range(start, end + 1))
+    return pages
+
+
 class DriveFileConvertView(View):
+    """
+    ?file_id=&format=pdf|jpg converts the whole file as before. With any of
+    the render params it works on pages instead:
+      format=jpg&page=N&dpi=D       one page as JPEG
+      format=pdf&pages=1-3,5        a PDF of just those pages
+      info=1&dpi=D&tile_size=T      deep-zoom descriptor (page sizes, levels)
+      tile=z/x/y&page=N&dpi=D       one 256px (tile_size) tile of level z
+    Those responses are rendered from a cached copy of the original, stored
+    per file version and sent with an ETag and a day of private caching.
+    """
     authentication_classes = [JWTAuthentication]
     permission_classes = [IsAuthenticated]
     def get(self, request, *args, **kwargs):
         file_id = request.GET.get("file_id")
         target_format = request.GET.get("format", "").lower()
+        render_request = any(param in request.GET for param in RENDER_PARAMS)
 
-        if not file_id or target_format not in ["pdf", "jpg"]:
+        if not file_id or (target_format not in ["pdf", "jpg"] and not render_request):
             return JsonResponse({'error': 'Invalid file_id or format'}, status=400)
 
         try:
-            stream, mime_type, filename = download_file_by_id(file_id, compress=False)
+            if render_request:
+                return self.render_variant(request, file_id, target_format)
+
+            mime_type = get_file_metadata(get_drive_service(), file_id)['mimeType']
             # Convert only if not already in target format
             if (target_format == "pdf" and mime_type != "application/pdf") or \
                (target_format == "jpg" and mime_type not in ["image/jpeg", "image/png"]):
+                stream, mime_type, filename = download_file_by_id(file_id, compress=False)
                 stream, mime_type, filename = convert_file_format(stream, mime_type, target_format)
+                return FileResponse(stream, content_type=mime_type, filename=filename)
 
-            return FileResponse(stream, content_type=mime_type, filename=filename)
+            # Already in the requested format: proxy it from Drive without buffering
+            return stream_drive_file(request, file_id)
+        except RenderBusy as e:
+            return JsonResponse({'error': str(e)}, status=503, headers={'Retry-After': '5'})
         except Exception as e:
-            return JsonResponse({'error': str(e)}, status=500)
\ No newline at end of file
+            return JsonResponse({'error': str(e)}, status=500)
+
+    def render_variant(self, request, file_id, target_format):
+        service = get_drive_service()
+        metadata = get_file_metadata(service, file_id)
+        mime_type = metadata['mimeType']
+        version = file_version(metadata)
+        if mime_type not in FITZ_FILETYPES or not version:
+            return JsonResponse({'error': 'Pages and tiles are only available for PDF and image files'}, status=400)
+
+        etag = '"%s"' % variant_key(metadata['id'], version, sorted(request.GET.items()))[:32]
+        if request.headers.get('If-None-Match') == etag:
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            return response
+
+        try:
+            dpi = clamp_int(request.GET.get('dpi'), 150, 36, 300)
+            page = clamp_int(request.GET.get('page'), 1, 1, 100000)
+            tile_size = clamp_int(request.GET.get('tile_size'), 256, 64, 1024)
+
+            def from_source(job, *args):
+                return render_source(service, metadata, job, *args)
+
+            if 'info' in request.GET:
+                response = JsonResponse(from_source(document_info_job, mime_type, dpi, tile_size))
+
+            elif 'tile' in request.GET:
+                level, column, row = (int(part) for part in request.GET['tile'].split('/'))
+                path = cached_render(
+                    metadata, ('tile', page, dpi, tile_size, level, column, row),
+                    lambda: from_source(tile_job, mime_type, page, dpi, tile_size, level, column, row),
+                )
+                response = FileResponse(open(path, 'rb'), content_type='image/jpeg')
+
+            elif target_format == 'pdf':
+                if mime_type != 'application/pdf':
+                    return JsonResponse({'error': 'Page selection needs a PDF file'}, status=400)
+                page_count = from_source(page_count_job, mime_type)
+                pages = parse_page_ranges(request.GET.get('pages') or str(page), page_count)
+                path = cached_render(
+                    metadata, ('pages', tuple(pages)), lambda: from_source(pdf_pages_job, pages), suffix='.pdf'
+                )
+                response = FileResponse(open(path, 'rb'), content_type='application/pdf', filename='pages.pdf')
+
+            elif target_format == 'jpg':
+                if 'pages' in request.GET:
+                    return JsonResponse({'error': 'Use page= to render a single page as jpg'}, status=400)
+                path = cached_render(
+                    metadata, ('page', page, dpi), lambda: from_source(page_image_job, mime_type, page, dpi)
+                )
+                response = FileResponse(open(path, 'rb'), content_type='image/jpeg', filename=f'page_{page}.jpg')
+
+            else:
+                return JsonResponse({'error': 'Invalid file_id or format'}, status=400)
+        except ValueError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, max_age=86400)
+        return response
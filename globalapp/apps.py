@@ -4,4 +4,5 @@ from django.apps import AppConfig
 class GlobalappConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'globalapp'
-    
+    def ready(self):
+        import globalapp.signals
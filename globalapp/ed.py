@@ -1,5 +1,53 @@
+import hashlib
+import hmac
+import json
+
 import jwt
 from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+
+# Response envelope codecs. "jwt" is the historical default and stays the
+# fallback for any client that does not ask for something else.
+ENVELOPE_JWT = "jwt"
+ENVELOPE_PLAIN = "plain"
+ENVELOPE_SIGNED = "signed"
+ENVELOPE_MSGPACK = "msgpack"
+ENVELOPES = (ENVELOPE_JWT, ENVELOPE_PLAIN, ENVELOPE_SIGNED, ENVELOPE_MSGPACK)
+
+SIGNATURE_HEADER = "X-Payload-Signature"
+
 
 def encode_jwt(payload):
-    return jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
\ No newline at end of file
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm='HS256')
+
+
+def canonical_json(payload):
+    return json.dumps(
+        payload, cls=JSONEncoder, ensure_ascii=False, sort_keys=True, separators=(",", ":")
+    ).encode("utf-8")
+
+
+def sign_payload(payload):
+    """
+    Detached HMAC-SHA256 signature over the canonical JSON form of the payload
+    (sorted keys, no whitespace, UTF-8).
+    """
+    digest = hmac.new(settings.SECRET_KEY.encode("utf-8"), canonical_json(payload), hashlib.sha256)
+    return f"sha256={digest.hexdigest()}"
+
+
+def verify_payload(payload, signature):
+    return hmac.compare_digest(sign_payload(payload), signature or "")
+
+
+def encode_envelope(payload, envelope=ENVELOPE_JWT):
+    """
+    Wrap a payload for the response body. Returns (data, headers).
+    The plain/signed/msgpack codecs return the payload exactly as a client
+    would get it back from decoding the JWT token.
+    """
+    if envelope == ENVELOPE_SIGNED:
+        return payload, {SIGNATURE_HEADER: sign_payload(payload)}
+    if envelope in (ENVELOPE_PLAIN, ENVELOPE_MSGPACK):
+        return payload, {}
+    return {"token": encode_jwt(payload)}, {}
@@ -1,3 +1,185 @@
+import threading
+import unicodedata
+from datetime import datetime
+
+from django.core.exceptions import FieldDoesNotExist, ValidationError as DjangoValidationError
+from django.db import models
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+
+# Query params that are never treated as field filters
+RESERVED_PARAMS = {
+    'limit', 'offset', 'start_date', 'end_date', 'keyword', 'depth', 'leave_ids', 'em_id',
+    'stream', 'max_rows', 'format', 'page', 'page_size', 'cursor', 'count',
+}
+MAX_RELATION_DEPTH = 3
+
+TEXT_LOOKUPS = {'exact', 'iexact', 'startswith', 'istartswith', 'icontains', 'in'}
+RANGE_LOOKUPS = {'exact', 'in', 'gt', 'gte', 'lt', 'lte', 'range', 'isnull'}
+EXACT_LOOKUPS = {'exact', 'in', 'isnull'}
+
+
+def normalize_search_text(value):
+    return unicodedata.normalize("NFC", value or "").strip().lower()
+
+
+def default_lookup(field, text_lookup='icontains'):
+    """Default lookup for a bare `?field=value` param; CharFields use text_lookup."""
+    if getattr(field, 'choices', None):
+        return 'exact'
+    if isinstance(field, models.TextField):
+        return 'icontains'
+    if isinstance(field, models.CharField):
+        return text_lookup
+    return 'exact'
+
+
+def allowed_lookups(field):
+    if isinstance(field, (models.CharField, models.TextField)):
+        return TEXT_LOOKUPS
+    if isinstance(field, (models.IntegerField, models.DecimalField, models.FloatField,
+                          models.DateField, models.TimeField, models.DurationField)):
+        return RANGE_LOOKUPS
+    return EXACT_LOOKUPS
+
+
+class FilterCompiler:
+    """
+    Introspects a model once and turns request query params into ORM lookups.
+
+    - bare params get a lookup picked by field type (exact for
+      choices/numbers/dates/FKs, icontains for text; CharFields can use an
+      index friendly istartswith instead, see BaseViews.filter_text_lookup)
+    - explicit suffixes (`price__gte`, `name__iexact`) are allowed per field type
+    - `keyword` hits the model's `search_text` column when it has one
+    - unknown params are rejected with a 400 instead of being tried blindly
+    """
+    _compilers = {}
+    _lock = threading.Lock()
+
+    def __init__(self, model):
+        self.model = model
+        concrete = {f.name: f for f in model._meta.get_fields() if getattr(f, 'concrete', False)}
+        self.date_field = 'date' if 'date' in concrete else ('created_at' if 'created_at' in concrete else None)
+        self.search_field = 'search_text' if 'search_text' in concrete else None
+        self.keyword_fields = [
+            f.name for f in model._meta.fields
+            if isinstance(f, (models.CharField, models.TextField)) and f.name != self.search_field
+        ]
+        self._resolved = {}
+
+    @classmethod
+    def for_model(cls, model):
+        compiler = cls._compilers.get(model)
+        if compiler is None:
+            with cls._lock:
+                compiler = cls._compilers.setdefault(model, cls(model))
+        return compiler
+
+    def resolve(self, param, overrides=None, text_lookup='icontains'):
+        """Return (orm_path, lookup, model_field) for a query param, or None if it is not filterable."""
+        key = (param, tuple(sorted((overrides or {}).items())), text_lookup)
+        if key in self._resolved:
+            return self._resolved[key]
+
+        parts = param.split('__')
+        model = self.model
+        field = None
+        path = []
+        lookup = None
+        for index, part in enumerate(parts):
+            if field is not None and not field.is_relation:
+                # Anything after a plain field must be the final lookup
+                lookup = part if index == len(parts) - 1 else None
+                if lookup is None:
+                    return None
+                break
+            if len(path) > MAX_RELATION_DEPTH:
+                return None
+            try:
+                field = model._meta.get_field(part)
+            except FieldDoesNotExist:
+                if field is not None and index == len(parts) - 1:
+                    lookup = part
+                    break
+                return None
+            path.append(part)
+            if field.is_relation and index < len(parts) - 1:
+                model = field.related_model
+
+        if field is None:
+            return None
+        orm_path = '__'.join(path)
+        override = (overrides or {}).get(orm_path)
+        if lookup is None:
+            lookup = override or default_lookup(field, text_lookup)
+        elif lookup not in allowed_lookups(field) and lookup != override:
+            return None
+
+        resolved = (orm_path, lookup, field)
+        self._resolved[key] = resolved
+        return resolved
+
+    def coerce(self, field, lookup, value):
+        if lookup == 'isnull':
+            return value.lower() in ('1', 'true', 'yes')
+        if lookup in ('in', 'range'):
+            values = [v.strip() for v in value.split(',') if v.strip()]
+            if lookup == 'range' and len(values) != 2:
+                raise DjangoValidationError("Range filters take two comma separated values.")
+            return [self.coerce(field, 'exact', v) for v in values]
+        if lookup in ('icontains', 'istartswith', 'startswith', 'iexact'):
+            return value
+        target = field.target_field if field.is_relation and hasattr(field, 'target_field') else field
+        return target.to_python(value)
+
+    def filter_date_range(self, queryset, start_date, end_date):
+        if not (self.date_field and start_date and end_date):
+            return queryset
+        try:
+            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+        except ValueError:
+            # Handle invalid date format
+            return queryset
+        return queryset.filter(**{f"{self.date_field}__range": [start_date, end_date]})
+
+    def filter_keyword(self, queryset, keyword, keyword_fields=None):
+        if not keyword:
+            return queryset
+        if self.search_field and not keyword_fields:
+            return queryset.filter(**{f"{self.search_field}__contains": normalize_search_text(keyword)})
+        fields = keyword_fields or self.keyword_fields
+        if not fields:
+            return queryset.none()
+        query = Q()
+        for name in fields:
+            query |= Q(**{f"{name}__icontains": keyword})
+        return queryset.filter(query)
+
+    def apply(self, queryset, params, skip=(), overrides=None, keyword_fields=None, text_lookup='icontains'):
+        queryset = self.filter_date_range(queryset, params.get('start_date'), params.get('end_date'))
+        queryset = self.filter_keyword(queryset, params.get('keyword'), keyword_fields)
+
+        lookups = {}
+        errors = {}
+        for param, value in params.items():
+            if param in RESERVED_PARAMS or param in skip:
+                continue
+            resolved = self.resolve(param, overrides, text_lookup)
+            if resolved is None:
+                errors[param] = ["Unknown filter."]
+                continue
+            orm_path, lookup, field = resolved
+            try:
+                lookups[f"{orm_path}__{lookup}"] = self.coerce(field, lookup, value)
+            except (DjangoValidationError, ValueError, TypeError):
+                errors[param] = [f"Invalid value for {lookup} lookup."]
+        if errors:
+            raise ValidationError(errors)
+        return queryset.filter(**lookups) if lookups else queryset
+
+
 # from django_filters import rest_framework as filters
 # from django.db.models import CharField, TextField
 
@@ -18,3 +200,4 @@
 #     class Meta:
 #         model = YourModel  # Replace YourModel with your actual model name
 #         fields = '__all__'  # Or specify the fields you want to filter on
+
@@ -0,0 +1,19 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('globalapp', '0014_basebeneficariesmodel'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='common',
+            index=models.Index(condition=models.Q(('is_deleted', False)), fields=['id'], name='common_live_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='common',
+            index=models.Index(condition=models.Q(('is_deleted', True)), fields=['id'], name='common_deleted_idx'),
+        ),
+    ]
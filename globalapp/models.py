@@ -8,6 +8,13 @@ class Common(models.Model):
     created_at= models.DateTimeField(default=timezone.now,blank=True,null=True)
     is_deleted = models.BooleanField(default=False,null=True,blank=True)
 
+    class Meta:
+        indexes = [
+            # Partial indexes so live-row lookups and the recycle bin only touch their own rows
+            models.Index(fields=['id'], condition=models.Q(is_deleted=False), name='common_live_idx'),
+            models.Index(fields=['id'], condition=models.Q(is_deleted=True), name='common_deleted_idx'),
+        ]
+
 class BaseBeneficariesModel(Common):
     name = models.CharField(max_length=100)
     email = models.EmailField(unique=True)
@@ -0,0 +1,225 @@
+import base64
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+COUNT_EXACT = 'exact'
+COUNT_CACHED = 'cached'
+COUNT_APPROX = 'approx'
+COUNT_NONE = 'none'
+
+
+def _cursor_value(value):
+    # Full precision isoformat; DRF's encoder would drop microseconds
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_cursor(values, reverse=False):
+    raw = json.dumps({"v": values, "r": int(reverse)}, default=_cursor_value, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        data = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return list(data["v"]), bool(data.get("r"))
+    except (ValueError, KeyError, TypeError):
+        raise NotFound("Invalid cursor")
+
+
+def _equals(name, value):
+    return Q(**{f"{name}__isnull": True}) if value is None else Q(**{name: value})
+
+
+def keyset_filter(ordering, values, forward=True, nullable=()):
+    """
+    Lexicographic "row after (v1, v2, ...)" condition for an ordering such as
+    ('-created_at', '-id'). forward=False gives the rows before it instead.
+    Fields named in `nullable` sort their NULLs last when walking forwards
+    (see keyset_order), so a NULL boundary value has nothing after it on that
+    field and everything non-NULL before it.
+    """
+    query = Q()
+    for index, field in enumerate(ordering):
+        name = field.lstrip('-')
+        descending = field.startswith('-')
+        op = 'lt' if descending == forward else 'gt'
+        value = values[index]
+        if value is None:
+            if forward:
+                continue
+            condition = Q(**{f"{name}__isnull": False})
+        else:
+            condition = Q(**{f"{name}__{op}": value})
+            if forward and name in nullable:
+                condition |= Q(**{f"{name}__isnull": True})
+        for previous, previous_value in zip(ordering[:index], values[:index]):
+            condition &= _equals(previous.lstrip('-'), previous_value)
+        query |= condition
+    return query
+
+
+def keyset_order(ordering, reverse=False, nullable=()):
+    """order_by() arguments for an ordering; NULLs go last forwards, first in reverse."""
+    order = []
+    for field in ordering:
+        name = field.lstrip('-')
+        descending = field.startswith('-') != reverse
+        if name in nullable:
+            expression = F(name).desc if descending else F(name).asc
+            order.append(expression(nulls_first=True) if reverse else expression(nulls_last=True))
+        else:
+            order.append(f"-{name}" if descending else name)
+    return order
+
+
+def estimate_count(queryset):
+    """Planner row estimate on PostgreSQL, None elsewhere."""
+    if connection.vendor != 'postgresql':
+        return None
+    try:
+        plan = json.loads(queryset.explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows'])
+    except Exception:
+        return None
+
+
+def cached_count(queryset, timeout=60):
+    try:
+        sql = str(queryset.query)
+    except Exception:
+        return queryset.count()
+    key = "pagination_count_" + hashlib.md5(sql.encode("utf-8")).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, timeout)
+    return count
+
+
+class KeysetPaginationMixin:
+    """
+    Opt-in keyset (cursor) pagination for LimitOffsetPagination subclasses.
+
+    Enabled by a `cursor` query param (empty for the first page) or by
+    `keyset_pagination = True` on the view. Pages are fetched with
+    `WHERE (ordering) < (last row)` instead of OFFSET, so deep pages cost the
+    same as the first one. `?count=exact|cached|approx|none` picks how the total
+    is computed (offset pages default to exact, keyset pages to none). In both
+    modes `next` comes from fetching one row past the page, never from the count.
+    """
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'
+    count_cache_timeout = 60
+    keyset_ordering = ('-id',)
+    keyset_default_count = COUNT_NONE
+
+    def get_count_mode(self, request, default):
+        mode = request.query_params.get(self.count_query_param, default)
+        return mode if mode in (COUNT_EXACT, COUNT_CACHED, COUNT_APPROX, COUNT_NONE) else default
+
+    def count_queryset(self, queryset, mode):
+        if mode == COUNT_NONE:
+            return None
+        if mode == COUNT_APPROX:
+            estimate = estimate_count(queryset)
+            if estimate is not None:
+                return estimate
+            mode = COUNT_CACHED
+        if mode == COUNT_CACHED:
+            return cached_count(queryset, self.count_cache_timeout)
+        return queryset.count()
+
+    def use_keyset(self, request, view):
+        return self.cursor_query_param in request.query_params or getattr(view, 'keyset_pagination', False)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.keyset = self.use_keyset(request, view)
+        if not self.keyset:
+            return self.paginate_offset(queryset, request, view)
+        return self.paginate_keyset(queryset, request, view)
+
+    def paginate_offset(self, queryset, request, view=None):
+        self.limit = self.get_limit(request)
+        if self.limit is None:
+            return None
+        self.offset = self.get_offset(request)
+        rows = list(queryset[self.offset:self.offset + self.limit + 1])
+        self.has_next = len(rows) > self.limit
+        # None with ?count=none: the COUNT(*) is skipped altogether
+        self.count = self.count_queryset(queryset, self.get_count_mode(request, COUNT_EXACT))
+        if self.count is not None and self.count > self.limit and self.template is not None:
+            self.display_page_controls = True
+        return rows[:self.limit]
+
+    def paginate_keyset(self, queryset, request, view=None):
+        self.limit = self.get_limit(request) or self.default_limit or 20
+        self.ordering = tuple(getattr(view, 'keyset_ordering', None) or self.keyset_ordering)
+        names = [field.lstrip('-') for field in self.ordering]
+        fields = [queryset.model._meta.get_field(name) for name in names]
+
+        cursor = request.query_params.get(self.cursor_query_param)
+        reverse = False
+        values = None
+        if cursor:
+            values, reverse = decode_cursor(cursor)
+            if len(values) != len(names):
+                raise NotFound("Invalid cursor")
+            values = [field.to_python(value) for field, value in zip(fields, values)]
+
+        self.count = self.count_queryset(queryset, self.get_count_mode(request, self.keyset_default_count))
+
+        nullable = {field.name for field in fields if field.null}
+        page_queryset = queryset.order_by(*keyset_order(self.ordering, reverse, nullable))
+        if values is not None:
+            page_queryset = page_queryset.filter(
+                keyset_filter(self.ordering, values, forward=not reverse, nullable=nullable)
+            )
+
+        rows = list(page_queryset[:self.limit + 1])
+        has_more = len(rows) > self.limit
+        rows = rows[:self.limit]
+        if reverse:
+            rows.reverse()
+
+        def key(obj):
+            return [getattr(obj, field.attname) for field in fields]
+
+        # Walking backwards there is always a next page (the cursor row itself),
+        # walking forwards from a cursor there is always a previous one
+        self.next_cursor = None
+        self.previous_cursor = None
+        if rows:
+            if reverse or has_more:
+                self.next_cursor = encode_cursor(key(rows[-1]))
+            if (values is not None and not reverse) or (reverse and has_more):
+                self.previous_cursor = encode_cursor(key(rows[0]), reverse=True)
+        return rows
+
+    def get_next_link(self):
+        if not getattr(self, 'keyset', False):
+            if not self.has_next:
+                return None
+            url = replace_query_param(self.request.build_absolute_uri(), self.limit_query_param, self.limit)
+            return replace_query_param(url, self.offset_query_param, self.offset + self.limit)
+        if self.next_cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.offset_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.next_cursor)
+
+    def get_previous_link(self):
+        if not getattr(self, 'keyset', False):
+            return super().get_previous_link()
+        if self.previous_cursor is None:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), self.offset_query_param)
+        return replace_query_param(url, self.cursor_query_param, self.previous_cursor)
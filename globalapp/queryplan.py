@@ -0,0 +1,117 @@
+import logging
+import threading
+
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from django.db import connection
+from rest_framework import serializers
+
+logger = logging.getLogger(__name__)
+
+_plans = {}
+_plans_lock = threading.Lock()
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def _relation(model, source):
+    if not source or source == '*' or '.' in source:
+        return None
+    try:
+        field = model._meta.get_field(source)
+    except FieldDoesNotExist:
+        return None
+    return field if field.is_relation else None
+
+
+def _walk(serializer, model, prefix, select, prefetch, in_prefetch):
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        relation = _relation(model, field.source)
+        if relation is None:
+            continue
+        path = f"{prefix}{field.source}"
+        many = relation.many_to_many or relation.one_to_many
+
+        if isinstance(field, serializers.ListSerializer):
+            prefetch.add(path)
+            if isinstance(field.child, serializers.ModelSerializer):
+                _walk(field.child, relation.related_model, f"{path}__", select, prefetch, True)
+        elif isinstance(field, serializers.ModelSerializer):
+            (prefetch if (many or in_prefetch) else select).add(path)
+            _walk(field, relation.related_model, f"{path}__", select, prefetch, in_prefetch or many)
+        elif isinstance(field, serializers.ManyRelatedField):
+            prefetch.add(path)
+        elif isinstance(field, serializers.RelatedField) and not isinstance(field, serializers.PrimaryKeyRelatedField):
+            # String/Slug/Hyperlinked related fields read the related row
+            (prefetch if (many or in_prefetch) else select).add(path)
+
+
+def build_query_plan(serializer, model):
+    """
+    Derive (select_related, prefetch_related) lookups from a serializer's nested
+    fields. Nested ModelSerializers (declared, or generated by Meta.depth) on
+    forward FK/one-to-one relations become select_related joins; many-valued
+    relations and anything below them are prefetched.
+    """
+    select, prefetch = set(), set()
+    _walk(serializer, model, "", select, prefetch, False)
+    # A select_related path already implies its prefixes
+    select = {p for p in select if not any(o != p and o.startswith(p + "__") for o in select)}
+    return sorted(select), sorted(prefetch)
+
+
+def get_query_plan(serializer_class, model, depth=None, make_serializer=None):
+    """Cached build_query_plan per (serializer class, model, depth)."""
+    key = (serializer_class, model, depth)
+    plan = _plans.get(key)
+    if plan is None:
+        serializer = make_serializer() if make_serializer else serializer_class()
+        plan = build_query_plan(serializer, model)
+        with _plans_lock:
+            _plans[key] = plan
+    return plan
+
+
+def apply_query_plan(queryset, plan):
+    select, prefetch = plan
+    if select:
+        queryset = queryset.select_related(*select)
+    if prefetch:
+        queryset = queryset.prefetch_related(*prefetch)
+    return queryset
+
+
+class QueryBudget:
+    """
+    Counts the queries run on the default connection while active. Going over
+    budget is logged, or raised as QueryBudgetExceeded when
+    settings.QUERY_BUDGET_STRICT is set (e.g. in tests).
+    """
+
+    def __init__(self, limit, label=""):
+        self.limit = limit
+        self.label = label
+        self.count = 0
+        self._wrapper = None
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._wrapper.__exit__(exc_type, exc, tb)
+        if exc_type is None and self.limit is not None and self.count > self.limit:
+            message = f"{self.label} ran {self.count} queries (budget {self.limit})"
+            if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+                raise QueryBudgetExceeded(message)
+            logger.warning(message)
+        return False
@@ -0,0 +1,48 @@
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+from globalapp.ed import ENVELOPE_JWT, ENVELOPE_MSGPACK, ENVELOPE_PLAIN, ENVELOPE_SIGNED
+
+try:
+    import msgpack
+except ImportError:  # msgpack is optional, the binary envelope is simply not offered
+    msgpack = None
+
+
+class PlainJSONRenderer(JSONRenderer):
+    """Accept: application/vnd.bdmouza.plain+json -> payload as plain JSON, no token."""
+    media_type = 'application/vnd.bdmouza.plain+json'
+    format = 'plain'
+    envelope = ENVELOPE_PLAIN
+
+
+class SignedJSONRenderer(JSONRenderer):
+    """Accept: application/vnd.bdmouza.signed+json -> plain JSON plus X-Payload-Signature header."""
+    media_type = 'application/vnd.bdmouza.signed+json'
+    format = 'signed'
+    envelope = ENVELOPE_SIGNED
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Accept: application/x-msgpack -> payload packed with MessagePack."""
+    media_type = 'application/x-msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+    envelope = ENVELOPE_MSGPACK
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        encoder = JSONEncoder()
+        return msgpack.packb(data, default=encoder.default, use_bin_type=True)
+
+
+ENVELOPE_RENDERERS = [PlainJSONRenderer, SignedJSONRenderer]
+if msgpack is not None:
+    ENVELOPE_RENDERERS.append(MessagePackRenderer)
+
+
+def get_envelope(request):
+    renderer = getattr(request, 'accepted_renderer', None)
+    return getattr(renderer, 'envelope', ENVELOPE_JWT)
@@ -0,0 +1,73 @@
+import hashlib
+
+from django.core.cache import caches
+from rest_framework.response import Response
+
+RESPONSE_CACHE = 'responses'
+STATS_PREFIX = 'response_cache_stats'
+STATS_INDEX = f'{STATS_PREFIX}:index'
+
+
+def response_cache():
+    return caches[RESPONSE_CACHE]
+
+
+def make_key(view_label, action, path, params, scope, media_type, versions):
+    """
+    Cache key for one rendered BaseViews response. Model versions are part of
+    the key, so a post_save/post_delete/m2m_changed bump on any model the
+    response reads retires every entry built from it at once.
+    """
+    raw = repr((view_label, action, path, sorted(params), scope, media_type, versions))
+    return f"response:{view_label}:{hashlib.sha256(raw.encode('utf-8')).hexdigest()}"
+
+
+def get(key):
+    return response_cache().get(key)
+
+
+def store(key, response, timeout):
+    headers = {name: value for name, value in response.items() if name.lower() != 'content-type'}
+    response_cache().set(key, (response.status_code, response.data, headers), timeout)
+
+
+def build(entry):
+    status_code, data, headers = entry
+    return Response(data, status=status_code, headers=headers)
+
+
+def record(view_label, hit):
+    backend = response_cache()
+    key = f"{STATS_PREFIX}:{view_label}:{'hit' if hit else 'miss'}"
+    if backend.add(key, 1, None):
+        labels = backend.get(STATS_INDEX) or []
+        if view_label not in labels:
+            backend.set(STATS_INDEX, labels + [view_label], None)
+        return
+    try:
+        backend.incr(key)
+    except ValueError:
+        backend.set(key, 1, None)
+
+
+def stats():
+    backend = response_cache()
+    result = {}
+    for label in backend.get(STATS_INDEX) or []:
+        hits = backend.get(f"{STATS_PREFIX}:{label}:hit") or 0
+        misses = backend.get(f"{STATS_PREFIX}:{label}:miss") or 0
+        total = hits + misses
+        result[label] = {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 3) if total else 0.0,
+        }
+    return result
+
+
+def reset_stats():
+    backend = response_cache()
+    labels = backend.get(STATS_INDEX) or []
+    backend.delete_many(
+        [f"{STATS_PREFIX}:{label}:{kind}" for label in labels for kind in ("hit", "miss")] + [STATS_INDEX]
+    )
@@ -1,16 +1,120 @@
+import copy
+import threading
+
+from django.core.exceptions import FieldDoesNotExist
 from rest_framework import serializers
 
 from des.models import DynamicEmailConfiguration
 from globalapp.models import SoftwareAsset
 class GlobalSerializers(serializers.ModelSerializer):
-    def __init__(self, *args, **kwargs):
-        # Initialize the serializer
-        super().__init__(*args, **kwargs)
-        
-        # Check if 'depth' parameter is provided in context
-        if 'context' in kwargs and 'depth' in kwargs['context']:
-            # Apply the depth parameter to the serializer
-            self.Meta.depth = kwargs['context']['depth']
+    """
+    ModelSerializer that honours a `depth` passed through the serializer context.
+
+    Each requested depth gets its own cached subclass instead of writing to the
+    shared Meta, and the generated field map is built once per class and copied
+    for every instance afterwards.
+    """
+    _depth_classes = {}
+    _field_cache = {}
+    _values_plans = {}
+    _cache_lock = threading.Lock()
+
+    def __new__(cls, *args, **kwargs):
+        if not kwargs.get('many', False):
+            context = kwargs.get('context') or {}
+            if 'depth' in context:
+                cls = cls.for_depth(context['depth'])
+        return super().__new__(cls, *args, **kwargs)
+
+    @classmethod
+    def for_depth(cls, depth):
+        base = cls.__dict__.get('_depth_base', cls)
+        depth = depth or 0
+        if getattr(base.Meta, 'depth', 0) == depth:
+            return base
+        key = (base, depth)
+        subclass = cls._depth_classes.get(key)
+        if subclass is None:
+            meta = type('Meta', (base.Meta,), {'depth': depth})
+            subclass = type(base.__name__, (base,), {
+                'Meta': meta,
+                '__module__': base.__module__,
+                '__qualname__': base.__qualname__,
+                '_depth_base': base,
+            })
+            with cls._cache_lock:
+                subclass = cls._depth_classes.setdefault(key, subclass)
+        return subclass
+
+    def get_fields(self):
+        cls = type(self)
+        fields = self._field_cache.get(cls)
+        if fields is None:
+            fields = super().get_fields()
+            with self._cache_lock:
+                self._field_cache[cls] = fields
+        return copy.deepcopy(fields)
+
+    def values_plan(self):
+        """
+        [(field_name, column, to_representation)] when every readable field is a
+        plain model column, so rows can be emitted straight from .values_list()
+        without building model instances. None when any field needs the instance.
+        """
+        cls = type(self)
+        if cls in self._values_plans:
+            return self._values_plans[cls]
+        plan = self._build_values_plan()
+        with self._cache_lock:
+            self._values_plans[cls] = plan
+        return plan
+
+    def _build_values_plan(self):
+        if type(self).to_representation is not serializers.Serializer.to_representation:
+            return None
+        model = self.Meta.model
+        plan = []
+        for field in self._readable_fields:
+            source = field.source
+            if source == '*' or '.' in source or isinstance(field, UNPLANNABLE_FIELDS):
+                return None
+            try:
+                model_field = model._meta.get_field(source)
+            except FieldDoesNotExist:
+                return None
+            if not model_field.concrete or model_field.many_to_many:
+                return None
+            if isinstance(field, serializers.PrimaryKeyRelatedField):
+                if field.pk_field is not None or not model_field.many_to_one:
+                    return None
+                plan.append((field.field_name, model_field.attname, _identity))
+            elif model_field.is_relation:
+                return None
+            else:
+                plan.append((field.field_name, model_field.attname, field.to_representation))
+        return plan
+
+    @staticmethod
+    def represent_values(plan, rows):
+        return [
+            {name: (None if value is None else represent(value))
+             for (name, _, represent), value in zip(plan, row)}
+            for row in rows
+        ]
+
+
+def _identity(value):
+    return value
+
+
+# Fields whose representation needs more than the raw column value
+UNPLANNABLE_FIELDS = (
+    serializers.BaseSerializer,
+    serializers.ManyRelatedField,
+    serializers.SerializerMethodField,
+    serializers.FileField,
+    serializers.HiddenField,
+)
 
 #System Settings API
 class SoftwareAssetSerializer(GlobalSerializers):
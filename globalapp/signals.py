@@ -0,0 +1,23 @@
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+
+from globalapp.versions import bump_model_version
+
+
+@receiver(post_save, dispatch_uid="globalapp_version_post_save")
+def bump_on_save(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_model_version(sender)
+
+
+@receiver(post_delete, dispatch_uid="globalapp_version_post_delete")
+def bump_on_delete(sender, instance, **kwargs):
+    bump_model_version(sender)
+
+
+@receiver(m2m_changed, dispatch_uid="globalapp_version_m2m_changed")
+def bump_on_m2m_changed(sender, instance, action, model, **kwargs):
+    if action in ("post_add", "post_remove", "post_clear"):
+        bump_model_version(type(instance))
+        if model is not None:
+            bump_model_version(model)
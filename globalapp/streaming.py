@@ -0,0 +1,65 @@
+import json
+
+from django.http import StreamingHttpResponse
+from rest_framework.utils.encoders import JSONEncoder
+
+NDJSON = "ndjson"
+JSON = "json"
+CONTENT_TYPES = {
+    NDJSON: "application/x-ndjson; charset=utf-8",
+    JSON: "application/json; charset=utf-8",
+}
+
+
+def _dumps(value):
+    return json.dumps(value, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":"))
+
+
+def iter_serialized_chunks(queryset, serialize, chunk_size=2000, max_rows=None):
+    """
+    Walk a queryset with a server-side cursor and yield lists of serialized rows.
+    Only one chunk of model instances is held in memory at a time.
+    """
+    if max_rows is not None:
+        queryset = queryset[:max_rows]
+    batch = []
+    for obj in queryset.iterator(chunk_size=chunk_size):
+        batch.append(obj)
+        if len(batch) >= chunk_size:
+            yield serialize(batch)
+            batch = []
+    if batch:
+        yield serialize(batch)
+
+
+def ndjson_body(chunks):
+    for rows in chunks:
+        yield "".join(_dumps(row) + "\n" for row in rows).encode("utf-8")
+
+
+def json_body(chunks, head, max_rows=None):
+    # Keep the same envelope shape as the non-streaming list response
+    prefix = _dumps(head)[:-1]
+    yield (prefix + ',"data":{"results":[').encode("utf-8")
+    count = 0
+    for rows in chunks:
+        if not rows:
+            continue
+        body = ",".join(_dumps(row) for row in rows)
+        yield (("," if count else "") + body).encode("utf-8")
+        count += len(rows)
+    meta = {"count": count, "truncated": max_rows is not None and count >= max_rows}
+    yield ('],"meta":' + _dumps(meta) + "}}").encode("utf-8")
+
+
+def streaming_response(chunks, fmt=NDJSON, head=None, max_rows=None):
+    if fmt == JSON:
+        body = json_body(chunks, head or {}, max_rows=max_rows)
+    else:
+        body = ndjson_body(chunks)
+    response = StreamingHttpResponse(body, content_type=CONTENT_TYPES.get(fmt, CONTENT_TYPES[NDJSON]))
+    if max_rows is not None:
+        response["X-Stream-Max-Rows"] = str(max_rows)
+    # Stop reverse proxies from buffering the whole body
+    response["X-Accel-Buffering"] = "no"
+    return response
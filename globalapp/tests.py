@@ -1,3 +1,623 @@
-from django.test import TestCase
+import json
+from unittest import mock, skipIf
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+import jwt
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import path
+from rest_framework import permissions, serializers
+from rest_framework.routers import SimpleRouter
+from rest_framework.test import APIClient
+
+from cms.models import FAQ
+from cms.serializers import FAQSerializer
+from driveapp.models import Mouzamapdata
+from globalapp import responsecache
+from globalapp.ed import SIGNATURE_HEADER, verify_payload
+from globalapp.queryplan import QueryBudget, QueryBudgetExceeded, build_query_plan
+from globalapp.renderers import msgpack
+from globalapp.serializers import GlobalSerializers
+from driveapp.models import District2, Division2, SubDistrict
+from driveapp.views import SubDistrictViewSet
+from globalapp.views import BaseViews, PublicCacheMixin, ResponseCacheStatsView
+from users.models import Roles, Users
+from users.serializers import UserSerializer
+
+# Every alias in memory so tests never touch the shared file caches
+TEST_CACHES = {
+    alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'test-{alias}'}
+    for alias in ('default', 'model_versions', 'responses', 'drive_lookups')
+}
+
+
+BULK_METHODS = ["bulk_create", "bulk_update", "bulk_soft_delete"]
+
+
+class FAQTestViewSet(BaseViews):
+    model_name = FAQ
+    methods = ["list", "retrieve", "create", "update", "partial_update", "destroy", "soft_delete", "change_status", "restore_soft_deleted"] + BULK_METHODS
+    queryset = FAQ.objects.all()
+    serializer_class = FAQSerializer
+    permission_classes = [permissions.AllowAny]
+
+
+class JWTOnlyFAQViewSet(FAQTestViewSet):
+    envelope_codecs = ('jwt',)
+
+
+class CachedFAQViewSet(PublicCacheMixin, FAQTestViewSet):
+    cache_dependencies = (Division2,)
+
+
+class UserCachedFAQViewSet(FAQTestViewSet):
+    response_cache = True
+
+
+class KeysetFAQViewSet(FAQTestViewSet):
+    keyset_ordering = ('-created_at', '-id')
+
+
+class PrefixFAQViewSet(FAQTestViewSet):
+    filter_text_lookup = 'istartswith'
+
+
+class MouzaWriteSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Mouzamapdata
+        fields = '__all__'
+
+
+class MouzaTestViewSet(BaseViews):
+    model_name = Mouzamapdata
+    methods = ["list", "retrieve"] + BULK_METHODS
+    queryset = Mouzamapdata.objects.all()
+    serializer_class = MouzaWriteSerializer
+    permission_classes = [permissions.AllowAny]
+
+
+class DistrictTestSerializer(GlobalSerializers):
+    class Meta:
+        model = District2
+        fields = ['id', 'name_en', 'district_id', 'division_name']
+
+
+class UserTestViewSet(BaseViews):
+    model_name = Users
+    methods = ["bulk_create"]
+    queryset = Users.objects.all()
+    serializer_class = UserSerializer
+    permission_classes = [permissions.AllowAny]
+
+
+class UserSearchViewSet(UserTestViewSet):
+    methods = ["list"]
+    # DRF SearchFilter's setting, as on users.views.UserViewSet; ?keyword= must not pick it up
+    search_fields = ['roles__name']
+
+
+router = SimpleRouter()
+router.register(r'faqs', FAQTestViewSet, basename="test-faqs")
+router.register(r'jwt-faqs', JWTOnlyFAQViewSet, basename="test-jwt-faqs")
+router.register(r'keyset-faqs', KeysetFAQViewSet, basename="test-keyset-faqs")
+router.register(r'prefix-faqs', PrefixFAQViewSet, basename="test-prefix-faqs")
+router.register(r'cached-faqs', CachedFAQViewSet, basename="test-cached-faqs")
+router.register(r'user-cached-faqs', UserCachedFAQViewSet, basename="test-user-cached-faqs")
+router.register(r'subdistricts', SubDistrictViewSet, basename="test-subdistricts")
+router.register(r'mouzas', MouzaTestViewSet, basename="test-mouzas")
+router.register(r'users', UserTestViewSet, basename="test-users")
+router.register(r'user-search', UserSearchViewSet, basename="test-user-search")
+urlpatterns = router.urls + [path('response-cache-stats/', ResponseCacheStatsView.as_view())]
+
+
+def decode_token(response):
+    return jwt.decode(response.data['data']['results']['token'], settings.SECRET_KEY, algorithms=['HS256'])
+
+
+@override_settings(ROOT_URLCONF='globalapp.tests', CACHES=TEST_CACHES)
+class BaseViewsTestCase(TestCase):
+    def setUp(self):
+        for alias in TEST_CACHES:
+            caches[alias].clear()
+        self.client = APIClient()
+
+    def make_faq(self, question="How do I pay?", **kwargs):
+        return FAQ.objects.create(question=question, answer=kwargs.pop('answer', "With bKash."), **kwargs)
+
+
+class CrudTests(BaseViewsTestCase):
+    def test_list_and_retrieve_return_a_token(self):
+        faq = self.make_faq()
+        response = self.client.get('/faqs/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['id'] for row in decode_token(response)['data']], [faq.id])
+
+        response = self.client.get(f'/faqs/{faq.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(decode_token(response)['data']['question'], faq.question)
+
+    def test_create_and_update(self):
+        response = self.client.post('/faqs/', {'question': "Refunds?", 'answer': "Within 7 days."}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['success'])
+        faq_id = decode_token(response)['data']['id']
+
+        response = self.client.patch(f'/faqs/{faq_id}/', {'answer': "Within 3 days."}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(FAQ.objects.get(pk=faq_id).answer, "Within 3 days.")
+
+
+PLAIN = 'application/vnd.bdmouza.plain+json'
+SIGNED = 'application/vnd.bdmouza.signed+json'
+MSGPACK = 'application/x-msgpack'
+
+
+class EnvelopeCodecTests(BaseViewsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.faq = self.make_faq()
+        self.urls = ['/faqs/', f'/faqs/{self.faq.id}/']
+
+    def test_jwt_is_the_default(self):
+        for url in self.urls:
+            response = self.client.get(url)
+            self.assertEqual(response['Content-Type'], 'application/json')
+            self.assertIn('data', decode_token(response))
+
+    def test_plain(self):
+        for url in self.urls:
+            response = self.client.get(url, HTTP_ACCEPT=PLAIN)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response['Content-Type'].startswith(PLAIN))
+            body = json.loads(response.content)
+            self.assertNotIn('token', body['data']['results'])
+            self.assertIn('data', body['data']['results'])
+
+    def test_signed(self):
+        for url in self.urls:
+            response = self.client.get(url, HTTP_ACCEPT=SIGNED)
+            self.assertEqual(response.status_code, 200)
+            payload = json.loads(response.content)['data']['results']
+            self.assertTrue(verify_payload(payload, response[SIGNATURE_HEADER]))
+            self.assertFalse(verify_payload(dict(payload, data=None), response[SIGNATURE_HEADER]))
+
+    @skipIf(msgpack is None, "msgpack is not installed")
+    def test_msgpack(self):
+        for url in self.urls:
+            response = self.client.get(url, HTTP_ACCEPT=MSGPACK)
+            self.assertEqual(response.status_code, 200)
+            body = msgpack.unpackb(response.content, raw=False)
+            self.assertIn('data', body['data']['results'])
+
+    def test_codecs_can_be_restricted_per_viewset(self):
+        response = self.client.get('/jwt-faqs/', HTTP_ACCEPT=PLAIN)
+        self.assertEqual(response.status_code, 406)
+        response = self.client.get('/jwt-faqs/')
+        self.assertIn('data', decode_token(response))
+
+
+def mouza(**fields):
+    return dict({
+        'mouza_id': 1, 'mouza_name': "Dhanmondi", 'uuid': "2b3a4c5d-0000-4000-8000-000000000001", 'jl_number': "101",
+        'district_name': "Dhaka", 'upazila_name': "Dhanmondi", 'survey_id': 1, 'survey_name': "RS", 'survey_name_en': "RS",
+    }, **fields)
+
+
+class BulkActionTests(BaseViewsTestCase):
+    def test_bulk_create_reports_errors_per_item(self):
+        response = self.client.post('/faqs/bulk_create/', [{'question': "A?", 'answer': "a"}, {'answer': "no question"}], format='json')
+        self.assertEqual(response.data['status'], 400)
+        errors = response.data['error']
+        self.assertEqual(errors[0], {})
+        self.assertIn('question', errors[1])
+        self.assertFalse(FAQ.objects.exists())
+
+        response = self.client.post('/faqs/bulk_create/', {'items': [{'question': "A?", 'answer': "a"}, {'question': "B?", 'answer': "b"}]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([row['question'] for row in decode_token(response)['data']], ["A?", "B?"])
+        self.assertEqual(FAQ.objects.count(), 2)
+
+    def test_bulk_create_goes_through_the_serializer(self):
+        Roles.objects.get_or_create(id=42659, defaults={'name': "customer"})
+        response = self.client.post('/users/bulk_create/', [{'email': "a@example.com", 'password': "secret-a"}], format='json')
+        self.assertEqual(response.status_code, 200)
+        user = Users.objects.get(email="a@example.com")
+        # UserSerializer.create hashes the password
+        self.assertNotEqual(user.password, "secret-a")
+        self.assertTrue(user.check_password("secret-a"))
+
+    def test_bulk_update_recomputes_derived_fields(self):
+        first = Mouzamapdata.objects.create(**mouza())
+        second = Mouzamapdata.objects.create(**mouza(mouza_name="Gulshan", uuid="2b3a4c5d-0000-4000-8000-000000000002"))
+        response = self.client.patch('/mouzas/bulk_update/', [
+            {'id': first.id, 'mouza_name': "Mirpur"},
+            {'id': second.id, 'jl_number': "202"},
+        ], format='json')
+        self.assertEqual(response.status_code, 200)
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertEqual(first.mouza_name, "Mirpur")
+        self.assertTrue(first.search_text.startswith("mirpur 101"))
+        self.assertIn("202", second.search_text)
+
+    def test_bulk_update_rejects_unknown_ids(self):
+        faq = self.make_faq()
+        response = self.client.patch('/faqs/bulk_update/', [{'id': faq.id, 'answer': "x"}, {'id': 999999, 'answer': "y"}], format='json')
+        self.assertEqual(response.data['status'], 400)
+        self.assertEqual(response.data['error'][1], {"id": ["Object not found."]})
+        faq.refresh_from_db()
+        self.assertEqual(faq.answer, "With bKash.")
+
+    def test_bulk_soft_delete(self):
+        faqs = [self.make_faq(f"Q{n}?") for n in range(3)]
+        response = self.client.post('/faqs/bulk_soft_delete/', {'ids': [faqs[0].id, faqs[1].id, 999999]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['data']['results'], {"deleted": 2})
+        self.assertEqual(response.data['error'], {"missing": [999999]})
+        self.assertEqual(list(FAQ.objects.filter(is_deleted=True).order_by('id').values_list('id', flat=True)), [faqs[0].id, faqs[1].id])
+
+    def test_actions_are_off_unless_listed(self):
+        response = self.client.post('/users/bulk_update/', [], format='json')
+        self.assertEqual(response.data['status'], 405)
+        self.assertFalse(response.data['success'])
+
+
+class FilterTests(BaseViewsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.pay = self.make_faq("How do I pay?")
+        self.refund = self.make_faq("Can I get a refund?")
+
+    def ids(self, url, params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200, response.data)
+        return [row['id'] for row in decode_token(response)['data']]
+
+    def test_char_fields_match_anywhere_by_default(self):
+        self.assertEqual(self.ids('/faqs/', {'question': "REFUND"}), [self.refund.id])
+        self.assertEqual(self.ids('/faqs/', {'question__istartswith': "how"}), [self.pay.id])
+
+    def test_prefix_matching_is_opt_in(self):
+        self.assertEqual(self.ids('/prefix-faqs/', {'question': "refund"}), [])
+        self.assertEqual(self.ids('/prefix-faqs/', {'question': "can i"}), [self.refund.id])
+        self.assertEqual(self.ids('/prefix-faqs/', {'question__icontains': "refund"}), [self.refund.id])
+
+    def test_keyword_and_numbers(self):
+        self.assertEqual(self.ids('/faqs/', {'keyword': "pay"}), [self.pay.id])
+        self.assertEqual(self.ids('/faqs/', {'id': self.pay.id}), [self.pay.id])
+
+    def test_keyword_ignores_drf_search_fields(self):
+        Roles.objects.get_or_create(id=42659, defaults={'name': "customer"})
+        john = Users.objects.create_user(email="john@example.com", password="secret")
+        Users.objects.create_user(email="jane@example.com", password="secret")
+        self.assertEqual(self.ids('/user-search/', {'keyword': "john"}), [john.id])
+
+    def test_unknown_params_are_rejected(self):
+        response = self.client.get('/faqs/', {'no_such_field': "x"})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('no_such_field', response.data)
+
+
+class PaginationTests(BaseViewsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.faqs = [self.make_faq(f"Q{n}?") for n in range(5)]
+        self.newest_first = [faq.id for faq in reversed(self.faqs)]
+
+    def page(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        body = response.data['data']
+        token = body['results']['token']
+        rows = jwt.decode(token, settings.SECRET_KEY, algorithms=['HS256'])['data']
+        return [row['id'] for row in rows], body['meta']
+
+    def test_offset_pages(self):
+        ids, meta = self.page('/faqs/', {'limit': 2, 'offset': 2})
+        self.assertEqual(ids, self.newest_first[2:4])
+        self.assertEqual(meta['count'], 5)
+        self.assertIn('offset=4', meta['next'])
+
+        ids, meta = self.page('/faqs/', {'limit': 2, 'offset': 4})
+        self.assertEqual(ids, self.newest_first[4:])
+        self.assertIsNone(meta['next'])
+
+    def test_count_none_skips_the_count(self):
+        with self.assertNumQueries(1):
+            ids, meta = self.page('/faqs/', {'limit': 2, 'count': 'none'})
+        self.assertEqual(ids, self.newest_first[:2])
+        self.assertIsNone(meta['count'])
+        self.assertIsNotNone(meta['next'])
+
+        # The last page is known without a count
+        ids, meta = self.page('/faqs/', {'limit': 5, 'count': 'none'})
+        self.assertEqual(len(ids), 5)
+        self.assertIsNone(meta['next'])
+
+    def test_next_does_not_follow_a_wrong_count(self):
+        with mock.patch('globalapp.pagination.estimate_count', return_value=100):
+            ids, meta = self.page('/faqs/', {'limit': 5, 'count': 'approx'})
+        self.assertEqual(meta['count'], 100)
+        self.assertIsNone(meta['next'])
+
+    def test_keyset_pages(self):
+        ids, meta = self.page('/faqs/', {'limit': 2, 'cursor': ''})
+        self.assertEqual(ids, self.newest_first[:2])
+        self.assertIsNone(meta['count'])
+        self.assertIsNone(meta['previous'])
+
+        cursor = parse_qs(urlparse(meta['next']).query)['cursor'][0]
+        ids, meta = self.page('/faqs/', {'limit': 2, 'cursor': cursor})
+        self.assertEqual(ids, self.newest_first[2:4])
+
+        cursor = parse_qs(urlparse(meta['previous']).query)['cursor'][0]
+        ids, meta = self.page('/faqs/', {'limit': 2, 'cursor': cursor})
+        self.assertEqual(ids, self.newest_first[:2])
+
+    def test_keyset_pages_over_a_nullable_field(self):
+        FAQ.objects.filter(pk__in=[self.faqs[1].pk, self.faqs[3].pk]).update(created_at=None)
+        # Non-null created_at newest first, then the NULLs
+        expected = [self.faqs[n].id for n in (4, 2, 0, 3, 1)]
+
+        forward = []
+        params = {'limit': 2, 'cursor': ''}
+        while True:
+            ids, meta = self.page('/keyset-faqs/', params)
+            forward.append(ids)
+            if not meta['next']:
+                break
+            params['cursor'] = parse_qs(urlparse(meta['next']).query)['cursor'][0]
+        self.assertEqual(forward, [expected[:2], expected[2:4], expected[4:]])
+
+        # And back again from the last page, whose cursor row has a NULL
+        backward = []
+        while meta['previous']:
+            params['cursor'] = parse_qs(urlparse(meta['previous']).query)['cursor'][0]
+            ids, meta = self.page('/keyset-faqs/', params)
+            backward.append(ids)
+        self.assertEqual(backward, [expected[2:4], expected[:2]])
+
+
+class PublicCacheTests(BaseViewsTestCase):
+    def save(self, obj):
+        # Versions are bumped once the write commits
+        with self.captureOnCommitCallbacks(execute=True):
+            obj.save()
+
+    def test_unchanged_data_answers_304(self):
+        faq = self.make_faq()
+        response = self.client.get('/cached-faqs/')
+        etag = response['ETag']
+        self.assertEqual(response['Cache-Control'], 'public, no-cache')
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/cached-faqs/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Other params are another representation
+        response = self.client.get('/cached-faqs/', {'question': "pay"}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+        faq.answer = "With Nagad."
+        self.save(faq)
+        response = self.client.get('/cached-faqs/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_cached_responses_are_invalidated_by_writes(self):
+        faq = self.make_faq()
+        first = self.client.get('/cached-faqs/')
+        # Writes that bypass signals are not seen: the response comes from the cache
+        FAQ.objects.filter(pk=faq.pk).update(question="Changed?")
+        self.assertEqual(decode_token(self.client.get('/cached-faqs/')), decode_token(first))
+
+        faq.refresh_from_db()
+        self.save(faq)
+        self.assertEqual(decode_token(self.client.get('/cached-faqs/'))['data'][0]['question'], "Changed?")
+
+    def test_models_filtered_through_are_dependencies(self):
+        division = Division2.objects.create(bbs_code="30", division_id=3, name="ঢাকা", name_en="Dhaka")
+        district = District2.objects.create(bbs_code="26", district_id=26, name="ঢাকা", name_en="Dhaka", division_name=division)
+        SubDistrict.objects.create(is_circle=True, name="ধানমন্ডি", name_en="Dhanmondi", bbs_code="16", district_name=district)
+        params = {'district_name__name': "ঢাকা"}
+        response = self.client.get('/subdistricts/', params)
+        self.assertEqual(len(decode_token(response)['data']), 1)
+
+        district.name = "গাজীপুর"
+        self.save(district)
+        response = self.client.get('/subdistricts/', params, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(decode_token(response)['data'], [])
+
+    def test_declared_dependencies_invalidate(self):
+        self.make_faq()
+        division = Division2.objects.create(bbs_code="30", division_id=3, name="ঢাকা", name_en="Dhaka")
+        etag = self.client.get('/cached-faqs/')['ETag']
+        self.save(division)
+        self.assertEqual(self.client.get('/cached-faqs/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ResponseCacheTests(BaseViewsTestCase):
+    def setUp(self):
+        super().setUp()
+        Roles.objects.get_or_create(id=42659, defaults={'name': "customer"})
+        self.make_faq()
+
+    def user(self, email, **extra):
+        return Users.objects.create_user(email=email, password="secret", **extra)
+
+    def test_hits_and_misses_are_counted(self):
+        first = self.client.get('/cached-faqs/')
+        second = self.client.get('/cached-faqs/')
+        self.assertEqual(decode_token(second), decode_token(first))
+        self.assertEqual(responsecache.stats(), {'CachedFAQViewSet': {'hits': 1, 'misses': 1, 'hit_rate': 0.5}})
+
+    def test_user_scope_is_not_shared_between_users(self):
+        for email in ("a@example.com", "b@example.com", "a@example.com"):
+            self.client.force_authenticate(Users.objects.filter(email=email).first() or self.user(email))
+            self.client.get('/user-cached-faqs/')
+        self.assertEqual(responsecache.stats()['UserCachedFAQViewSet'], {'hits': 1, 'misses': 2, 'hit_rate': 0.333})
+
+    def test_stats_view_is_for_staff(self):
+        self.client.get('/cached-faqs/')
+        self.client.force_authenticate(self.user("customer@example.com"))
+        self.assertEqual(self.client.get('/response-cache-stats/').status_code, 403)
+
+        self.client.force_authenticate(self.user("staff@example.com", is_staff=True))
+        response = self.client.get('/response-cache-stats/')
+        self.assertEqual(response.data['data']['results']['CachedFAQViewSet']['misses'], 1)
+        self.client.delete('/response-cache-stats/')
+        self.assertEqual(responsecache.stats(), {})
+
+
+class StreamingListTests(BaseViewsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.ids = [self.make_faq(f"Q{n}?").id for n in range(5)]
+        self.ids.reverse()
+
+    def body(self, response):
+        self.assertTrue(response.streaming)
+        return b"".join(response.streaming_content).decode("utf-8")
+
+    def test_ndjson(self):
+        with mock.patch.object(FAQTestViewSet, 'stream_chunk_size', 2):
+            response = self.client.get('/faqs/', {'stream': 'ndjson'})
+        self.assertEqual(response['Content-Type'], "application/x-ndjson; charset=utf-8")
+        rows = [json.loads(line) for line in self.body(response).splitlines()]
+        self.assertEqual([row['id'] for row in rows], self.ids)
+        self.assertEqual(rows[0]['question'], "Q4?")
+
+    def test_json_keeps_the_envelope_and_reports_truncation(self):
+        response = self.client.get('/faqs/', {'stream': 'json', 'max_rows': 3})
+        self.assertEqual(response['X-Stream-Max-Rows'], "3")
+        body = json.loads(self.body(response))
+        self.assertTrue(body['success'])
+        self.assertEqual([row['id'] for row in body['data']['results']], self.ids[:3])
+        self.assertEqual(body['data']['meta'], {"count": 3, "truncated": True})
+
+    def test_streaming_is_opt_in(self):
+        response = self.client.get('/faqs/')
+        self.assertFalse(response.streaming)
+        with mock.patch.object(FAQTestViewSet, 'stream_list', True):
+            self.assertTrue(self.client.get('/faqs/').streaming)
+            self.assertFalse(self.client.get('/faqs/', {'stream': '0'}).streaming)
+            # A page is never streamed
+            self.assertFalse(self.client.get('/faqs/', {'limit': 2}).streaming)
+
+
+class QueryPlanTests(BaseViewsTestCase):
+    def make_subdistricts(self, count, start=0):
+        for n in range(start, start + count):
+            division = Division2.objects.create(bbs_code=f"D{n}", division_id=n, name=f"বিভাগ {n}", name_en=f"Division {n}")
+            district = District2.objects.create(bbs_code=f"Z{n}", district_id=n, name=f"জেলা {n}", name_en=f"District {n}", division_name=division)
+            SubDistrict.objects.create(is_circle=False, name=f"উপজেলা {n}", name_en=f"Upazila {n}", bbs_code=f"U{n}", district_name=district)
+
+    def queries(self, params):
+        caches['responses'].clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/subdistricts/', params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def test_nested_relations_are_joined(self):
+        serializer = SubDistrictViewSet.serializer_class
+        self.assertEqual(build_query_plan(serializer(), SubDistrict), (['district_name__division_name'], []))
+
+        self.make_subdistricts(1)
+        one = self.queries({'depth': 2})
+        self.make_subdistricts(4, start=1)
+        self.assertEqual(self.queries({'depth': 2}), one)
+
+    def test_going_over_budget_is_logged_or_raised(self):
+        with self.assertLogs('globalapp.queryplan', 'WARNING') as logs:
+            with QueryBudget(1, label="test"):
+                list(FAQ.objects.all())
+                list(FAQ.objects.all())
+        self.assertIn("test ran 2 queries (budget 1)", logs.output[0])
+
+        with self.settings(QUERY_BUDGET_STRICT=True), self.assertRaises(QueryBudgetExceeded):
+            with QueryBudget(1, label="test"):
+                list(FAQ.objects.all())
+                list(FAQ.objects.all())
+
+    def test_viewset_budget(self):
+        self.make_subdistricts(3)
+        with self.settings(QUERY_BUDGET_STRICT=True), mock.patch.object(SubDistrictViewSet, 'query_budget', 0):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get('/subdistricts/')
+
+
+class GlobalSerializerTests(BaseViewsTestCase):
+    def setUp(self):
+        super().setUp()
+        division = Division2.objects.create(bbs_code="30", division_id=3, name="ঢাকা", name_en="Dhaka")
+        self.district = District2.objects.create(bbs_code="26", district_id=26, name="ঢাকা", name_en="Dhaka", division_name=division)
+
+    def test_depth_gets_its_own_class_and_leaves_meta_alone(self):
+        base_depth = getattr(DistrictTestSerializer.Meta, 'depth', 0)
+        nested = DistrictTestSerializer(self.district, context={'depth': 1})
+        self.assertIs(type(nested), DistrictTestSerializer.for_depth(1))
+        self.assertEqual(nested.data['division_name']['name_en'], "Dhaka")
+
+        flat = DistrictTestSerializer(self.district, context={'depth': 0})
+        self.assertEqual(flat.data['division_name'], self.district.division_name_id)
+        self.assertEqual(getattr(DistrictTestSerializer.Meta, 'depth', 0), base_depth)
+
+    def test_values_plan_matches_the_serializer(self):
+        serializer = FAQSerializer()
+        self.assertIsNone(getattr(serializer, 'values_plan', None))  # plain ModelSerializer
+
+        serializer = DistrictTestSerializer(context={'depth': 0})
+        plan = serializer.values_plan()
+        self.assertIsNotNone(plan)
+        rows = District2.objects.values_list(*[column for _, column, _ in plan])
+        self.assertEqual(
+            [dict(row) for row in GlobalSerializers.represent_values(plan, rows)],
+            [dict(row) for row in DistrictTestSerializer(District2.objects.all(), many=True, context={'depth': 0}).data],
+        )
+        # Nested output needs instances
+        self.assertIsNone(DistrictTestSerializer(context={'depth': 1}).values_plan())
+
+
+class RecycleBinTests(BaseViewsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.faqs = [self.make_faq(f"Q{n}?", is_deleted=n < 3) for n in range(5)]
+
+    def deleted_ids(self):
+        return set(FAQ.objects.filter(is_deleted=True).values_list('id', flat=True))
+
+    def test_restore_by_ids(self):
+        response = self.client.post('/faqs/restore_soft_deleted/', {'ids': [self.faqs[0].id, self.faqs[4].id]}, format='json')
+        self.assertEqual(response.data['data']['results'], {"restored": 1})
+        # A live row is not in the recycle bin
+        self.assertEqual(response.data['error'], {"missing": [self.faqs[4].id]})
+        self.assertEqual(self.deleted_ids(), {self.faqs[1].id, self.faqs[2].id})
+
+    def test_restore_by_filter(self):
+        response = self.client.post('/faqs/restore_soft_deleted/', {'filter': {'question__iexact': "q1?"}}, format='json')
+        self.assertEqual(response.data['data']['results'], {"restored": 1})
+        self.assertEqual(self.deleted_ids(), {self.faqs[0].id, self.faqs[2].id})
+
+    def test_restore_everything_without_a_selection(self):
+        response = self.client.post('/faqs/restore_soft_deleted/', {}, format='json')
+        self.assertEqual(response.data['data']['results'], {"restored": 3})
+        self.assertEqual(self.deleted_ids(), set())
+
+    def test_soft_delete_in_batches(self):
+        with mock.patch.object(FAQTestViewSet, 'recycle_batch_size', 1), \
+                self.captureOnCommitCallbacks(execute=True) as callbacks:
+            response = self.client.post('/faqs/bulk_soft_delete/', {'filter': {'question__in': ["Q3?", "Q4?"]}}, format='json')
+        self.assertEqual(response.data['data']['results'], {"deleted": 2})
+        self.assertEqual(len(self.deleted_ids()), 5)
+        # One version bump for the whole request
+        self.assertEqual(len(callbacks), 1)
+
+    def test_soft_delete_needs_a_selection(self):
+        response = self.client.post('/faqs/bulk_soft_delete/', {}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(len(self.deleted_ids()), 3)
@@ -6,7 +6,7 @@ router = SimpleRouter()
 router.register(r'system-assets',views.SystemAssetsViewSet,basename="system-assets")
 router.register(r'email-configure',views.EmailConfigureViewSet,basename="email-configure")
 urlpatterns = [
-    
+    path('response-cache-stats/', views.ResponseCacheStatsView.as_view(), name='response-cache-stats'),
 
 ]
 urlpatterns+= router.urls
\ No newline at end of file
@@ -0,0 +1,61 @@
+import uuid
+
+from django.core.cache import caches
+from django.core.exceptions import FieldDoesNotExist
+from django.db import transaction
+
+# Apps whose writes never affect API payloads; skipped to keep the version store quiet
+IGNORED_APPS = {'sessions', 'admin', 'contenttypes', 'token_blacklist'}
+VERSION_CACHE = 'model_versions'
+VERSION_TIMEOUT = None  # versions never expire on their own
+
+
+def version_cache():
+    return caches[VERSION_CACHE]
+
+
+def version_key(model):
+    return f"model_version:{model._meta.label_lower}"
+
+
+def _new_version():
+    # Random tokens rather than counters: a lost or cleared store can never
+    # hand out a value some client already holds an ETag for
+    return uuid.uuid4().hex
+
+
+def bump_model_version(model):
+    """Mark a model's data as changed. Applied after the surrounding transaction commits."""
+    model = model._meta.concrete_model
+    if model._meta.app_label in IGNORED_APPS:
+        return
+    key = version_key(model)
+    transaction.on_commit(lambda: version_cache().set(key, _new_version(), VERSION_TIMEOUT))
+
+
+def get_model_versions(models):
+    """{label: version} for the given models, seeding any that have none yet."""
+    store = version_cache()
+    keys = {version_key(m._meta.concrete_model): m._meta.label_lower for m in models}
+    found = store.get_many(list(keys))
+    for key in keys:
+        if key not in found:
+            store.add(key, _new_version(), VERSION_TIMEOUT)
+            found[key] = store.get(key)
+    return {keys[key]: found[key] for key in sorted(keys)}
+
+
+def related_models(model, paths):
+    """Models reached by ORM paths such as 'district_fk__division_name'."""
+    found = []
+    for path in paths:
+        current = model
+        for part in path.split('__'):
+            try:
+                current = current._meta.get_field(part).related_model
+            except FieldDoesNotExist:
+                break
+            if current is None:
+                break
+            found.append(current)
+    return found
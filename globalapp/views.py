@@ -2,26 +2,37 @@ from django.shortcuts import render
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import viewsets,parsers
+from rest_framework.views import APIView
 from des.models import DynamicEmailConfiguration
-from globalapp.ed import encode_jwt
+from globalapp.ed import ENVELOPES, encode_envelope
+from globalapp import streaming
+from globalapp.renderers import ENVELOPE_RENDERERS, get_envelope
+from globalapp.filters import FilterCompiler
+from globalapp.queryplan import QueryBudget, apply_query_plan, get_query_plan
+from globalapp.versions import bump_model_version, get_model_versions, related_models
+import hashlib
+from globalapp import responsecache
+from rest_framework.settings import api_settings
 from rest_framework import status
 from rest_framework.exceptions import ValidationError
 from rest_framework.pagination import PageNumberPagination,LimitOffsetPagination
+from globalapp.pagination import KeysetPaginationMixin
 from django_filters.rest_framework import DjangoFilterBackend
 from django.db.models import FileField, ImageField
 from django_filters import rest_framework as filters
 from django.db.models import CharField, TextField
 from django.utils import timezone
-from datetime import datetime
-from django.db.models import Q
-from django.db import models
+from django.db import transaction
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
 from users.permissions import IsStaff
 from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework import permissions
 from globalapp.models import SoftwareAsset
-from globalapp.serializers import EmailConfigureSerializer, SoftwareAssetSerializer
+from globalapp.serializers import EmailConfigureSerializer, GlobalSerializers, SoftwareAssetSerializer
 from rest_framework import serializers
-class CustomPagination(LimitOffsetPagination):
+class CustomPagination(KeysetPaginationMixin, LimitOffsetPagination):
     def get_paginated_response(self, data):
         return Response({
             'success': True,
@@ -51,6 +62,39 @@ class BaseViews(viewsets.ModelViewSet):
     # filterset_fields = '__all__'
     # Define message templates
     pagination_class = CustomPagination  # Replace with your custom pagination class if defined
+    # Streaming list mode (opt-in per viewset, or per request with ?stream=1|ndjson|json)
+    stream_list = False
+    stream_format = streaming.NDJSON
+    stream_chunk_size = 2000
+    stream_max_rows = 50000
+    # Response envelope codecs clients may negotiate through the Accept header
+    renderer_classes = list(api_settings.DEFAULT_RENDERER_CLASSES) + ENVELOPE_RENDERERS
+    envelope_codecs = ENVELOPES
+    # Per-field lookup overrides for the filter compiler, e.g. {"mouza_name": "istartswith"}
+    filter_lookups = {}
+    # Lookup for bare `?char_field=value` params: 'icontains' matches anywhere (as
+    # always), 'istartswith' is a prefix match a plain index can serve
+    filter_text_lookup = 'icontains'
+    # Fields searched by ?keyword= when the model has no search_text column
+    keyword_fields = None
+    # Actions whose querysets get select_related/prefetch_related derived from the serializer
+    query_plan_actions = ("list", "retrieve")
+    # Max queries per request: an int, or a dict keyed by action. None disables the check.
+    query_budget = None
+    # Strong ETags from (model versions, query params); If-None-Match answers 304
+    # before the database or serializer are touched
+    conditional_get = False
+    # Shared response cache for list/retrieve, keyed on (viewset, action, params,
+    # auth scope, media type, model versions). Use scope 'public' when the
+    # payload does not depend on who is asking.
+    response_cache = False
+    response_cache_timeout = 300
+    response_cache_scope = 'user'
+    # Models besides the serializer's whose writes change these payloads; their
+    # versions are part of the ETag and the response cache key
+    cache_dependencies = ()
+    # Rows per UPDATE for soft-delete/restore
+    recycle_batch_size = 1000
     message_templates = {
         "list_success": "Data retrieved successfully",
         "list_not_allowed": "List method is not allowed",
@@ -70,6 +114,13 @@ class BaseViews(viewsets.ModelViewSet):
         "change_status_not_allowed": "Change Status method is not allowed",
         "restore_soft_deleted_success": "Soft deleted data restored successfully",
         "restore_soft_deleted_not_allowed": "Restore Soft Deleted method is not allowed",
+        "bulk_create_success": "objects created successfully",
+        "bulk_create_not_allowed": "Bulk Create method is not allowed",
+        "bulk_update_success": "objects updated successfully",
+        "bulk_update_not_allowed": "Bulk Update method is not allowed",
+        "bulk_soft_delete_success": "objects deleted. But you can recover your data",
+        "bulk_soft_delete_not_allowed": "Bulk Soft Delete method is not allowed",
+        "bulk_validation_error": "Validation error",
         "leave_count_message": "Count Data get successfully",
         "leave_approve": "Approved Successfully",
         "leave_reject":"Rejected Successfully"
@@ -100,68 +151,149 @@ class BaseViews(viewsets.ModelViewSet):
     #                         queryset = queryset.filter(Q(**kwargs))
 
     #     return queryset.order_by('-id')
+    def get_declared_filter_params(self):
+        # Params owned by the viewset's django-filter filterset are left to DjangoFilterBackend
+        filterset_class = getattr(self, 'filterset_class', None)
+        if filterset_class is not None:
+            return set(filterset_class.base_filters)
+        filterset_fields = getattr(self, 'filterset_fields', None)
+        if isinstance(filterset_fields, dict):
+            return {
+                name if lookup == 'exact' else f"{name}__{lookup}"
+                for name, lookups in filterset_fields.items() for lookup in lookups
+            }
+        return set(filterset_fields or ())
+
     def get_queryset(self):
         try:
             queryset = self.model_name.objects.filter(is_deleted=False)
         except:
             queryset = self.model_name.objects.all()
 
-        # Get parameters from the request
-        params = self.request.query_params
-        
-
-        start_date = params.get('start_date')
-        end_date = params.get('end_date')
-
-        # If both start_date and end_date are provided, filter the queryset by the date range
-        if start_date and end_date:
-            try:
-                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-                # Assuming your model has a 'created_date' field
-                try:
-                    queryset = queryset.filter(date__range=[start_date, end_date])
-                except:
-                    queryset = queryset.filter(created_at__range=[start_date, end_date])
-            except ValueError:
-                # Handle invalid date format
-                pass
-        keyword = params.get('keyword')
-
-        if keyword:
-            # Filter all character and text fields for similar data
-            char_fields = [f.name for f in self.model_name._meta.fields if isinstance(f, models.CharField)]
-            text_fields = [f.name for f in self.model_name._meta.fields if isinstance(f, models.TextField)]
-
-            char_queries = [Q(**{f"{field}__icontains": keyword}) for field in char_fields]
-            text_queries = [Q(**{f"{field}__icontains": keyword}) for field in text_fields]
-
-            # Combine all queries with OR operator
-            combined_queries = char_queries + text_queries
-            final_query = combined_queries.pop()
-            for query in combined_queries:
-                final_query |= query
-
-            queryset = queryset.filter(final_query)
-
-        params = {param: value for param, value in params.items() if param not in ['limit', 'offset','start_date','end_date','keyword','depth','leave_ids','em_id']}
-        # Iterate through parameters and filter queryset dynamically
-        for param, value in params.items():
-            # Check if the parameter corresponds to a field in a related model
-            if "__" in param:
-                try:
-                    queryset = queryset.filter(**{param + "__icontains": value})
-                except:
-                    queryset = queryset.filter(**{param: value})
-            else:
-                try:
-                    queryset = queryset.filter(**{param + "__icontains": value})
-                except:
-                    queryset = queryset.filter(**{param: value})
-
+        compiler = FilterCompiler.for_model(self.model_name)
+        queryset = compiler.apply(
+            queryset,
+            self.request.query_params,
+            skip=self.get_declared_filter_params(),
+            overrides=self.filter_lookups,
+            keyword_fields=self.keyword_fields,
+            text_lookup=self.filter_text_lookup,
+        )
         return queryset.order_by('-id')
 
-    def generate_response(self, success, status_code, message_key, error=None, data=None, page=None):
+    def get_renderers(self):
+        renderers = super().get_renderers()
+        return [r for r in renderers if getattr(r, 'envelope', 'jwt') in self.envelope_codecs]
+
+    def encode_payload(self, payload):
+        # Returns (data, headers) for the codec negotiated for this request
+        return encode_envelope(payload, get_envelope(self.request))
+
+    def get_query_plan(self):
+        depth = self.get_serializer_context().get('depth')
+        return get_query_plan(self.get_serializer_class(), self.model_name, depth, make_serializer=self.get_serializer)
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action in self.query_plan_actions:
+            queryset = apply_query_plan(queryset, self.get_query_plan())
+        return queryset
+
+    def get_query_budget(self, request):
+        budget = self.query_budget
+        if isinstance(budget, dict):
+            action = self.action_map.get(request.method.lower()) if hasattr(self, 'action_map') else None
+            return budget.get(action)
+        return budget
+
+    def dispatch(self, request, *args, **kwargs):
+        budget = self.get_query_budget(request)
+        if budget is None:
+            return super().dispatch(request, *args, **kwargs)
+        with QueryBudget(budget, label=f"{type(self).__name__} {request.method} {request.path}") as counter:
+            response = super().dispatch(request, *args, **kwargs)
+        if settings.DEBUG:
+            response['X-Query-Count'] = str(counter.count)
+        return response
+
+    def get_dependent_models(self):
+        # The viewset's model, every model its serializer reads through relations,
+        # the ones the request filters through, and any declared cache_dependencies
+        select, prefetch = self.get_query_plan()
+        paths = list(select) + list(prefetch) + list(self.request.query_params)
+        return {self.model_name, *related_models(self.model_name, paths), *self.cache_dependencies}
+
+    def get_dependent_versions(self):
+        if getattr(self, '_dependent_versions', None) is None:
+            self._dependent_versions = get_model_versions(self.get_dependent_models())
+        return self._dependent_versions
+
+    def get_auth_scope(self, request):
+        user = getattr(request, 'user', None)
+        return user.pk if user is not None and user.is_authenticated else 'anon'
+
+    def get_etag(self, request):
+        if not self.conditional_get or request.method not in ('GET', 'HEAD'):
+            return None
+        versions = self.get_dependent_versions()
+        scope = self.get_auth_scope(request)
+        parts = [
+            type(self).__module__, type(self).__name__, self.action, request.path,
+            sorted(request.query_params.lists()), versions, scope,
+            getattr(request, 'accepted_media_type', ''),
+        ]
+        digest = hashlib.sha256(repr(parts).encode('utf-8')).hexdigest()[:40]
+        return f'"{digest}"'
+
+    def check_not_modified(self, request):
+        # Returns a 304 response when the client's cached copy is still current
+        self._etag = self.get_etag(request)
+        if self._etag is None:
+            return None
+        if_none_match = request.headers.get('If-None-Match', '')
+        candidates = [tag.strip().removeprefix('W/') for tag in if_none_match.split(',')]
+        if self._etag in candidates or '*' in candidates:
+            return Response(status=status.HTTP_304_NOT_MODIFIED)
+        return None
+
+    def get_response_cache_key(self, request):
+        if not self.response_cache or request.method != 'GET':
+            return None
+        scope = 'public' if self.response_cache_scope == 'public' else self.get_auth_scope(request)
+        return responsecache.make_key(
+            f"{type(self).__module__}.{type(self).__name__}", self.action, request.path,
+            request.query_params.lists(), scope, getattr(request, 'accepted_media_type', ''),
+            self.get_dependent_versions(),
+        )
+
+    def cached_response(self, request, build):
+        key = self.get_response_cache_key(request)
+        if key is None:
+            return build(request)
+        label = type(self).__name__
+        entry = responsecache.get(key)
+        if entry is not None:
+            responsecache.record(label, hit=True)
+            return responsecache.build(entry)
+        responsecache.record(label, hit=False)
+        response = build(request)
+        # Streams and errors are never cached
+        if isinstance(response, Response) and response.status_code == status.HTTP_200_OK:
+            responsecache.store(key, response, self.response_cache_timeout)
+        return response
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        etag = getattr(self, '_etag', None)
+        if etag is not None and response.status_code in (200, 304):
+            response['ETag'] = etag
+            user = getattr(request, 'user', None)
+            private = user is not None and user.is_authenticated
+            response['Cache-Control'] = 'private, no-cache' if private else 'public, no-cache'
+            patch_vary_headers(response, ('Accept', 'Authorization'))
+        return response
+
+    def generate_response(self, success, status_code, message_key, error=None, data=None, page=None, headers=None):
         model_name = self.model_name.__name__
         message = self.message_templates.get(message_key, "")
         if page is not None:
@@ -181,50 +313,126 @@ class BaseViews(viewsets.ModelViewSet):
             "message": f"{model_name} {message}",
             "error": error,
             "data": {"results":data}
-        })
+        }, headers=headers)
+
+    def get_stream_format(self, request):
+        # Returns the streaming format for this request, or None to use the regular response
+        stream = request.query_params.get('stream')
+        if stream is None:
+            return self.stream_format if self.stream_list else None
+        stream = stream.lower()
+        if stream in ('0', 'false', 'no'):
+            return None
+        if stream in (streaming.NDJSON, streaming.JSON):
+            return stream
+        return self.stream_format
+
+    def get_stream_max_rows(self, request):
+        try:
+            requested = int(request.query_params.get('max_rows'))
+        except (TypeError, ValueError):
+            return self.stream_max_rows
+        return max(0, min(requested, self.stream_max_rows))
+
+    def get_values_plan(self):
+        # Column plan for serializing straight from .values_list(), None if the serializer needs instances
+        serializer = self.get_serializer()
+        values_plan = getattr(serializer, 'values_plan', None)
+        return values_plan() if values_plan else None
+
+    def serialize_list(self, queryset):
+        plan = self.get_values_plan()
+        if plan:
+            rows = queryset.values_list(*[column for _, column, _ in plan])
+            return GlobalSerializers.represent_values(plan, rows)
+        return self.get_serializer(queryset, many=True).data
+
+    def stream_list_response(self, queryset, fmt):
+        max_rows = self.get_stream_max_rows(self.request)
+        plan = self.get_values_plan()
+
+        if plan:
+            queryset = queryset.values_list(*[column for _, column, _ in plan])
+
+            def serialize(batch):
+                return GlobalSerializers.represent_values(plan, batch)
+        else:
+            def serialize(batch):
+                return self.get_serializer(batch, many=True).data
+
+        chunks = streaming.iter_serialized_chunks(
+            queryset, serialize, chunk_size=self.stream_chunk_size, max_rows=max_rows
+        )
+        head = {
+            "success": True,
+            "status": status.HTTP_200_OK,
+            "message": f"{self.model_name.__name__} {self.message_templates['list_success']}",
+            "error": None,
+        }
+        return streaming.streaming_response(chunks, fmt=fmt, head=head, max_rows=max_rows)
 
     def list(self, request, *args, **kwargs):
         if "list" in self.methods:
-            try:
-                limit = request.GET.get('limit')
-            except:
-                limit = None
-            if limit is None:
-                # No limit parameter provided, return all data
-                
-                queryset = self.filter_queryset(self.get_queryset())
-                # print(self.get_queryset())
-                serializer = self.get_serializer(queryset, many=True)
-                token = encode_jwt({"data": serializer.data})  # Encode serialized data into JWT token
-                return self.generate_response(True, status.HTTP_200_OK, "list_success", data={"token": token})
-            else:
-                # Pagination requested, apply pagination
-                queryset = self.filter_queryset(self.get_queryset())
-                page = self.paginate_queryset(queryset)
-                if page is not None:
-                    serializer = self.get_serializer(page, many=True)
-                    token = encode_jwt({"data": serializer.data})  # Encode serialized data into JWT token
-                    return self.get_paginated_response({"token": token})
+            not_modified = self.check_not_modified(request)
+            if not_modified is not None:
+                return not_modified
+            return self.cached_response(request, self.build_list_response)
         else:
             return self.generate_response(False, status.HTTP_405_METHOD_NOT_ALLOWED, "list_not_allowed")
 
+    def build_list_response(self, request):
+        try:
+            limit = request.GET.get('limit')
+        except:
+            limit = None
+        # A cursor also asks for a (keyset) page, even without an explicit limit
+        paginated = limit is not None or 'cursor' in request.GET
+        stream_format = self.get_stream_format(request) if not paginated else None
+        if stream_format is not None:
+            queryset = self.filter_queryset(self.get_queryset())
+            return self.stream_list_response(queryset, stream_format)
+        if not paginated:
+            # No limit parameter provided, return all data
+
+            queryset = self.filter_queryset(self.get_queryset())
+            # print(self.get_queryset())
+            data, headers = self.encode_payload({"data": self.serialize_list(queryset)})
+            return self.generate_response(True, status.HTTP_200_OK, "list_success", data=data, headers=headers)
+        else:
+            # Pagination requested, apply pagination
+            queryset = self.filter_queryset(self.get_queryset())
+            page = self.paginate_queryset(queryset)
+            if page is not None:
+                serializer = self.get_serializer(page, many=True)
+                data, headers = self.encode_payload({"data": serializer.data})
+                response = self.get_paginated_response(data)
+                for name, value in headers.items():
+                    response[name] = value
+                return response
+
     def retrieve(self, request, *args, **kwargs):
         if "retrieve" in self.methods:
-            instance = self.get_object()
-            serializer = self.get_serializer(instance)
-            token = encode_jwt({"data": serializer.data})  # Encode serialized data into JWT token
-            return self.generate_response(True, status.HTTP_200_OK, "retrieve_success", data={"token": token})
+            not_modified = self.check_not_modified(request)
+            if not_modified is not None:
+                return not_modified
+            return self.cached_response(request, self.build_retrieve_response)
         else:
             return self.generate_response(False, status.HTTP_405_METHOD_NOT_ALLOWED, "retrieve_not_allowed")
 
+    def build_retrieve_response(self, request):
+        instance = self.get_object()
+        serializer = self.get_serializer(instance)
+        data, headers = self.encode_payload({"data": serializer.data})
+        return self.generate_response(True, status.HTTP_200_OK, "retrieve_success", data=data, headers=headers)
+
     def create(self, request, *args, **kwargs):
         if "create" in self.methods:
             try:
                 serializer = self.get_serializer(data=request.data)
                 serializer.is_valid(raise_exception=True)
                 self.perform_create(serializer)
-                token = encode_jwt({"data": serializer.data})  # Encode serialized data into JWT token
-                return self.generate_response(True, status.HTTP_201_CREATED, "create_success", data={"token": token})
+                data, headers = self.encode_payload({"data": serializer.data})
+                return self.generate_response(True, status.HTTP_201_CREATED, "create_success", data=data, headers=headers)
             except:
                 # print(e)
                 return self.generate_response(False, status.HTTP_400_BAD_REQUEST, "create_validation_error", error=serializer.errors)
@@ -238,8 +446,8 @@ class BaseViews(viewsets.ModelViewSet):
             serializer = self.get_serializer(instance, data=request.data, partial=partial)
             serializer.is_valid(raise_exception=True)
             self.perform_update(serializer)
-            token = encode_jwt({"data": serializer.data})  # Encode serialized data into JWT token
-            return self.generate_response(True, status.HTTP_200_OK, "update_success", data={"token": token})
+            data, headers = self.encode_payload({"data": serializer.data})
+            return self.generate_response(True, status.HTTP_200_OK, "update_success", data=data, headers=headers)
         else:
             return self.generate_response(False, status.HTTP_405_METHOD_NOT_ALLOWED, "update_not_allowed")
 
@@ -262,8 +470,8 @@ class BaseViews(viewsets.ModelViewSet):
     def soft_delete(self, request, pk=None):
         if "soft_delete" in self.methods:
             item = self.get_object()
-            item.is_deleted = True
-            item.save()
+            # Single-column UPDATE instead of re-saving the whole row
+            self.set_deleted_flag([item.pk], True)
             return self.generate_response(True, status.HTTP_200_OK, "soft_delete_success")
         else:
             return self.generate_response(False, status.HTTP_405_METHOD_NOT_ALLOWED, "soft_delete_not_allowed")
@@ -278,12 +486,143 @@ class BaseViews(viewsets.ModelViewSet):
         else:
             return self.generate_response(False, status.HTTP_405_METHOD_NOT_ALLOWED, "change_status_not_allowed")
 
+    def get_bulk_items(self, request):
+        items = request.data.get('items') if isinstance(request.data, dict) else request.data
+        if not isinstance(items, list):
+            raise ValidationError({"items": ["Expected a list of objects."]})
+        return items
+
+    def parse_pk(self, value):
+        try:
+            return self.model_name._meta.pk.to_python(value)
+        except (DjangoValidationError, TypeError, ValueError):
+            return None
+
+    def perform_bulk_create(self, serializer):
+        # serializer.save() runs the serializer's create() and the model's save()
+        # for every item (password hashing, derived columns, signals), in one transaction
+        with transaction.atomic():
+            return serializer.save()
+
+    def perform_bulk_update(self, bound_serializers):
+        with transaction.atomic():
+            return [serializer.save() for serializer in bound_serializers]
+
+    @action(detail=False, methods=['post'])
+    def bulk_create(self, request):
+        if "bulk_create" in self.methods:
+            serializer = self.get_serializer(data=self.get_bulk_items(request), many=True)
+            if not serializer.is_valid():
+                # One error dict per submitted item, empty for the valid ones
+                return self.generate_response(False, status.HTTP_400_BAD_REQUEST, "bulk_validation_error", error=serializer.errors)
+            self.perform_bulk_create(serializer)
+            data, headers = self.encode_payload({"data": serializer.data})
+            return self.generate_response(True, status.HTTP_201_CREATED, "bulk_create_success", data=data, headers=headers)
+        else:
+            return self.generate_response(False, status.HTTP_405_METHOD_NOT_ALLOWED, "bulk_create_not_allowed")
+
+    @action(detail=False, methods=['post', 'patch'])
+    def bulk_update(self, request):
+        if "bulk_update" in self.methods:
+            items = self.get_bulk_items(request)
+            pks = [self.parse_pk(item.get('id')) if isinstance(item, dict) else None for item in items]
+            instances = self.get_queryset().in_bulk([pk for pk in pks if pk is not None])
+            errors = []
+            valid = []
+            for item, pk in zip(items, pks):
+                instance = instances.get(pk)
+                if instance is None:
+                    errors.append({"id": ["Object not found."]})
+                    continue
+                serializer = self.get_serializer(instance, data=item, partial=True)
+                if serializer.is_valid():
+                    errors.append({})
+                    valid.append(serializer)
+                else:
+                    errors.append(serializer.errors)
+            if any(errors):
+                return self.generate_response(False, status.HTTP_400_BAD_REQUEST, "bulk_validation_error", error=errors)
+            self.perform_bulk_update(valid)
+            data, headers = self.encode_payload({"data": [serializer.data for serializer in valid]})
+            return self.generate_response(True, status.HTTP_200_OK, "bulk_update_success", data=data, headers=headers)
+        else:
+            return self.generate_response(False, status.HTTP_405_METHOD_NOT_ALLOWED, "bulk_update_not_allowed")
+
+    def set_deleted_flag(self, pks, value):
+        """
+        UPDATE ... SET is_deleted WHERE id IN (...) in batches of recycle_batch_size,
+        each batch in its own short transaction. Returns the number of rows changed.
+        """
+        # On models built on Common the flag lives in the parent table, update it there directly
+        owner = self.model_name._meta.get_field('is_deleted').model
+        pks = list(pks)
+        changed = 0
+        for start in range(0, len(pks), self.recycle_batch_size):
+            batch = pks[start:start + self.recycle_batch_size]
+            with transaction.atomic():
+                changed += owner._default_manager.filter(pk__in=batch).exclude(is_deleted=value).update(is_deleted=value)
+        if changed:
+            bump_model_version(self.model_name)
+        return changed
+
+    def get_recycle_selection(self, request, deleted, require_selection=True):
+        """
+        Pick rows for a soft-delete/restore from the request body:
+        {"ids": [...]} and/or {"filter": {"field": value, ...}} (same lookups as list filters).
+        Returns (queryset, missing_ids).
+        """
+        data = request.data if isinstance(request.data, dict) else {"ids": request.data}
+        ids = data.get('ids')
+        filters = data.get('filter')
+        if ids is None and filters is None and require_selection:
+            raise ValidationError({"ids": ["Provide ids or filter."]})
+
+        queryset = self.model_name.objects.filter(is_deleted=deleted)
+        missing = []
+        if ids is not None:
+            if not isinstance(ids, list):
+                raise ValidationError({"ids": ["Expected a list of ids."]})
+            pks = [self.parse_pk(pk) for pk in ids]
+            queryset = queryset.filter(pk__in=[pk for pk in pks if pk is not None])
+            found = set(queryset.values_list('pk', flat=True))
+            missing = [raw for raw, pk in zip(ids, pks) if pk not in found]
+        if filters is not None:
+            if not isinstance(filters, dict):
+                raise ValidationError({"filter": ["Expected an object of field filters."]})
+            params = {
+                key: ",".join(str(v) for v in value) if isinstance(value, list) else str(value)
+                for key, value in filters.items()
+            }
+            queryset = FilterCompiler.for_model(self.model_name).apply(
+                queryset, params, overrides=self.filter_lookups, keyword_fields=self.keyword_fields,
+                text_lookup=self.filter_text_lookup,
+            )
+        return queryset, missing
+
+    @action(detail=False, methods=['post'])
+    def bulk_soft_delete(self, request):
+        if "bulk_soft_delete" in self.methods:
+            queryset, missing = self.get_recycle_selection(request, deleted=False)
+            deleted = self.set_deleted_flag(queryset.values_list('pk', flat=True), True)
+            return self.generate_response(
+                True, status.HTTP_200_OK, "bulk_soft_delete_success",
+                error={"missing": missing} if missing else None,
+                data={"deleted": deleted},
+            )
+        else:
+            return self.generate_response(False, status.HTTP_405_METHOD_NOT_ALLOWED, "bulk_soft_delete_not_allowed")
+
     @action(detail=False, methods=['post'])
     def restore_soft_deleted(self, request):
         if "restore_soft_deleted" in self.methods:
-            queryset = self.model_name.objects.filter(is_deleted=True)
-            queryset.update(is_deleted=False)
-            return self.generate_response(True, status.HTTP_200_OK, "restore_soft_deleted_success")
+            # Without ids/filter everything in the recycle bin is restored, as before
+            queryset, missing = self.get_recycle_selection(request, deleted=True, require_selection=False)
+            restored = self.set_deleted_flag(queryset.values_list('pk', flat=True), False)
+            return self.generate_response(
+                True, status.HTTP_200_OK, "restore_soft_deleted_success",
+                error={"missing": missing} if missing else None,
+                data={"restored": restored},
+            )
         else:
             return self.generate_response(False, status.HTTP_405_METHOD_NOT_ALLOWED, "restore_soft_deleted_not_allowed")
     def get_serializer_context(self):
@@ -326,6 +665,17 @@ class BaseViews(viewsets.ModelViewSet):
 
 
 
+class PublicCacheMixin:
+    """
+    For read-mostly endpoints whose list/retrieve payloads are the same for
+    every visitor: strong ETags (304 on If-None-Match) plus the shared public
+    response cache, both invalidated by writes to get_dependent_models().
+    """
+    conditional_get = True
+    response_cache = True
+    response_cache_scope = 'public'
+
+
     ################################# System Settings #########################################
 class SystemAssetsViewSet(BaseViews):
     authentication_classes = [JWTAuthentication]
@@ -365,4 +715,27 @@ class EmailConfigureViewSet(viewsets.ModelViewSet):
             "error": error,
             "data": {"results": data}
         })
-    
\ No newline at end of file
+
+
+class ResponseCacheStatsView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [permissions.IsAuthenticated,IsStaff]
+
+    def get(self, request):
+        return Response({
+            "success": True,
+            "status": status.HTTP_200_OK,
+            "message": "Response cache stats",
+            "error": None,
+            "data": {"results": responsecache.stats()}
+        })
+
+    def delete(self, request):
+        responsecache.reset_stats()
+        return Response({
+            "success": True,
+            "status": status.HTTP_200_OK,
+            "message": "Response cache stats reset",
+            "error": None,
+            "data": {"results": None}
+        })
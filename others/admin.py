@@ -2,7 +2,7 @@ from django.contrib import admin, messages
 from django.utils import timezone
 from datetime import timedelta
 from .models import Purchases
-from others.models import BkashConfiguration, ExtraFeature, Package, PackageItem, Purchases, Tutorial, UddoktapayConfiguration,Additional
+from others.models import BkashConfiguration, ExtraFeature, Package, PackageItem, PurchasedFile, Purchases, Tutorial, UddoktapayConfiguration,Additional
 from solo.admin import SingletonModelAdmin
 from django.db.models import Sum
 import requests
@@ -125,6 +125,14 @@ class ExtraFeaturePriceFilter(admin.SimpleListFilter):
         return queryset
 
 
+@admin.register(PurchasedFile)
+class PurchasedFileAdmin(admin.ModelAdmin):
+    list_display = ['name', 'user', 'purchase', 'resolve_status', 'drive_id', 'resolved_at']
+    list_filter = ['resolve_status']
+    search_fields = ['name', 'drive_id', 'user__email']
+    raw_id_fields = ['user', 'purchase']
+
+
 @admin.register(Purchases)
 class PurchaseAdmin(admin.ModelAdmin):
     list_display = (
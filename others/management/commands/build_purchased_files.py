@@ -0,0 +1,47 @@
+"""
+Management command to build the purchased-file manifest for existing purchases
+"""
+from django.core.management.base import BaseCommand
+
+from others.manifest import sync_user_manifest
+from others.models import Purchases
+
+
+class Command(BaseCommand):
+    help = 'Create and resolve PurchasedFile rows for users with completed purchases'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user',
+            type=int,
+            help='Only build the manifest of this user id',
+        )
+        parser.add_argument(
+            '--no-resolve',
+            action='store_true',
+            help='Only create the rows; names are resolved when they are first served',
+        )
+
+    def handle(self, *args, **options):
+        if options['user']:
+            user_ids = [options['user']]
+        else:
+            user_ids = (
+                Purchases.objects.filter(payment_status='completed')
+                .order_by('user_id').values_list('user_id', flat=True).distinct()
+            )
+
+        users = 0
+        for user_id in user_ids:
+            try:
+                added, removed = sync_user_manifest(user_id, resolve=not options['no_resolve'])
+            except Exception as e:
+                self.stdout.write(self.style.ERROR(f'User {user_id}: {e}'))
+                continue
+            users += 1
+            if added or removed:
+                self.stdout.write(f'User {user_id}: {added} added, {removed} removed')
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Built purchased-file manifest for {users} user(s)')
+        )
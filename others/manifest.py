@@ -0,0 +1,203 @@
+"""
+Per-user manifest of purchased Drive files (others.models.PurchasedFile).
+
+When a purchase is completed its file names are looked up on Drive once, in
+the background, and the matches are stored, so the user-files endpoints page
+through these rows instead of searching Drive on every request. Names that
+have not been resolved yet (still pending, or an error older than
+ERROR_RETRY) are resolved when a page containing them is served.
+"""
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from driveapp.drive_utils import batch_search_files
+from others.models import PurchasedFile, Purchases
+
+logger = logging.getLogger(__name__)
+
+ERROR_RETRY = timedelta(minutes=10)
+RESOLVE_CHUNK = 500
+RESOLVED_FIELDS = ['drive_id', 'drive_name', 'mime_type', 'parents', 'full_path', 'resolve_status', 'error', 'resolved_at']
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='purchased-files')
+
+
+def purchased_names(user_id):
+    """{name: id of the first completed purchase listing it}, in purchase order."""
+    names = {}
+    purchases = Purchases.objects.filter(user_id=user_id, payment_status='completed').order_by('pk')
+    for purchase_id, file_names in purchases.values_list('pk', 'file_name'):
+        for name in file_names or []:
+            names.setdefault(name, purchase_id)
+    return names
+
+
+def unresolved(rows):
+    retry_before = timezone.now() - ERROR_RETRY
+    return rows.filter(
+        Q(resolve_status=PurchasedFile.STATUS_PENDING) |
+        Q(resolve_status=PurchasedFile.STATUS_ERROR, resolved_at__lt=retry_before)
+    )
+
+
+def needs_resolving(row):
+    if row.resolve_status == PurchasedFile.STATUS_PENDING:
+        return True
+    return row.resolve_status == PurchasedFile.STATUS_ERROR and row.resolved_at < timezone.now() - ERROR_RETRY
+
+
+def store_results(rows, batch_result):
+    """Record a batch_search_files result (sync or async) on the rows: first match, missing or error."""
+    results = batch_result['results']
+    errors = {failed['file_name']: failed['error'] for failed in batch_result['failed_files']}
+    now = timezone.now()
+    for row in rows:
+        matches = results.get(row.name)
+        if matches:
+            match = matches[0]
+            row.drive_id = match.get('id')
+            row.drive_name = match.get('name')
+            row.mime_type = match.get('mimeType')
+            row.parents = match.get('parents') or []
+            row.full_path = match.get('fullPath') or ''
+            row.resolve_status = PurchasedFile.STATUS_FOUND
+            row.error = None
+        elif matches is not None:
+            row.resolve_status = PurchasedFile.STATUS_MISSING
+            row.error = None
+        else:
+            row.resolve_status = PurchasedFile.STATUS_ERROR
+            row.error = errors.get(row.name, f"Search failed for file: {row.name}")
+        row.resolved_at = now
+    PurchasedFile.objects.bulk_update(rows, RESOLVED_FIELDS, batch_size=200)
+    return rows
+
+
+def failed_result(rows, error):
+    """A batch_search_files result in which every row's lookup failed with `error`."""
+    return {'results': {}, 'failed_files': [{'file_name': row.name, 'error': str(error)} for row in rows]}
+
+
+def resolve_rows(rows):
+    """Look the rows' names up on Drive (one batched search) and store the first match of each."""
+    rows = list(rows)
+    if not rows:
+        return rows
+    try:
+        batch_result = batch_search_files([row.name for row in rows], max_workers=4)
+    except Exception as e:
+        batch_result = failed_result(rows, e)
+    return store_results(rows, batch_result)
+
+
+def sync_user_manifest(user_id, resolve=True):
+    """
+    Bring a user's PurchasedFile rows in line with their completed purchases:
+    rows are added for new names and dropped for names no longer purchased.
+    With resolve, names still unresolved are then looked up on Drive.
+    Returns (added, removed).
+    """
+    names = purchased_names(user_id)
+    existing = dict(PurchasedFile.objects.filter(user_id=user_id).values_list('name', 'pk'))
+
+    removed = [pk for name, pk in existing.items() if name not in names]
+    if removed:
+        PurchasedFile.objects.filter(pk__in=removed).delete()
+    added = [
+        PurchasedFile(user_id=user_id, purchase_id=purchase_id, name=name)
+        for name, purchase_id in names.items() if name not in existing
+    ]
+    # A concurrent sync of the same user may have inserted some of them already
+    PurchasedFile.objects.bulk_create(added, batch_size=200, ignore_conflicts=True)
+
+    if resolve:
+        pending = list(unresolved(PurchasedFile.objects.filter(user_id=user_id)).order_by('pk'))
+        for start in range(0, len(pending), RESOLVE_CHUNK):
+            resolve_rows(pending[start:start + RESOLVE_CHUNK])
+    return len(added), len(removed)
+
+
+def schedule_user_manifest(user_id):
+    """Run sync_user_manifest for a user on a background thread."""
+    def run():
+        try:
+            sync_user_manifest(user_id)
+        except Exception:
+            logger.exception("Purchased-file manifest sync failed for user %s", user_id)
+        finally:
+            connection.close()
+
+    return _executor.submit(run)
+
+
+def manifest_rows(user):
+    """The user's PurchasedFile rows, created on the spot for purchases completed before the manifest existed."""
+    rows = PurchasedFile.objects.filter(user=user).order_by('pk')
+    if not rows.exists() and Purchases.objects.filter(user=user, payment_status='completed').exists():
+        sync_user_manifest(user.pk, resolve=False)
+    return rows
+
+
+def serialize_rows(rows):
+    """(found_files, failed_files) in the shape the user-files endpoints return."""
+    found_files = []
+    failed_files = []
+    for row in rows:
+        if row.resolve_status == PurchasedFile.STATUS_FOUND:
+            found_files.append({
+                "name": row.drive_name,
+                "id": row.drive_id,
+                "mimeType": row.mime_type,
+                "parents": row.parents,
+                "fullPath": row.full_path,
+                "original_search": row.name
+            })
+        elif row.resolve_status == PurchasedFile.STATUS_MISSING:
+            failed_files.append({"name": row.name, "error": "File not found in Google Drive"})
+        else:
+            failed_files.append({"name": row.name, "error": row.error or "File lookup is still pending"})
+    return found_files, failed_files
+
+
+def resolve_page(rows):
+    """The rows with the ones that still need a Drive lookup resolved in place."""
+    rows = list(rows)
+    resolve_rows([row for row in rows if needs_resolving(row)])
+    return rows
+
+
+def manifest_page(user, page, page_size):
+    """(page, page_size, rows of the page, total) with the page sliced in the database."""
+    page = max(page, 1)
+    page_size = max(page_size, 1)
+    offset = (page - 1) * page_size
+    rows = manifest_rows(user)
+    return page, page_size, list(rows[offset:offset + page_size]), rows.count()
+
+
+def page_response(rows, page, page_size, total_files):
+    found_files, failed_files = serialize_rows(rows)
+    return {
+        "files": found_files,
+        "failed_files": failed_files if failed_files else None,
+        "pagination": {
+            "current_page": page,
+            "page_size": page_size,
+            "total_files": total_files,
+            "total_pages": (total_files + page_size - 1) // page_size,
+            "has_next": page * page_size < total_files,
+            "has_previous": page > 1,
+            "files_in_current_page": len(found_files)
+        }
+    }
+
+
+def purchased_files_page(user, page, page_size):
+    """One page of a user's purchased files, paginated in the database."""
+    page, page_size, rows, total_files = manifest_page(user, page, page_size)
+    return page_response(resolve_page(rows), page, page_size, total_files)
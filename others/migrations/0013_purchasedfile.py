@@ -0,0 +1,37 @@
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('others', '0012_alter_purchases_payment_method'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PurchasedFile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=512)),
+                ('drive_id', models.CharField(blank=True, max_length=128, null=True)),
+                ('drive_name', models.CharField(blank=True, max_length=512, null=True)),
+                ('mime_type', models.CharField(blank=True, max_length=128, null=True)),
+                ('parents', models.JSONField(blank=True, default=list)),
+                ('full_path', models.TextField(blank=True, default='')),
+                ('resolve_status', models.CharField(choices=[('pending', 'Pending'), ('found', 'Found'), ('missing', 'Missing'), ('error', 'Error')], default='pending', max_length=10)),
+                ('error', models.TextField(blank=True, null=True)),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('purchase', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='purchased_files', to='others.purchases')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='purchased_files', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Purchased File',
+                'indexes': [models.Index(fields=['user', 'id'], name='purchasedfile_user_id_idx')],
+                'constraints': [models.UniqueConstraint(fields=('user', 'name'), name='purchasedfile_user_name_uniq')],
+            },
+        ),
+    ]
@@ -160,6 +160,49 @@ class Purchases(Common):
                         except Exception as e:
                             print(f"[ERROR] Failed to share folder '{folder_name}' with {self.user.email}: {e}")
         
+
+class PurchasedFile(models.Model):
+    """
+    One purchased file name of a user, resolved to its Drive file once after
+    payment (see others.manifest). The user-files endpoints read these rows
+    instead of searching Drive on every request.
+    """
+    STATUS_PENDING = 'pending'
+    STATUS_FOUND = 'found'
+    STATUS_MISSING = 'missing'
+    STATUS_ERROR = 'error'
+    STATUS_CHOICES = [
+        (STATUS_PENDING, 'Pending'),
+        (STATUS_FOUND, 'Found'),
+        (STATUS_MISSING, 'Missing'),
+        (STATUS_ERROR, 'Error'),
+    ]
+    user = models.ForeignKey(Users, on_delete=models.CASCADE, related_name='purchased_files')
+    purchase = models.ForeignKey(Purchases, on_delete=models.CASCADE, related_name='purchased_files')
+    name = models.CharField(max_length=512)
+    drive_id = models.CharField(max_length=128, null=True, blank=True)
+    drive_name = models.CharField(max_length=512, null=True, blank=True)
+    mime_type = models.CharField(max_length=128, null=True, blank=True)
+    parents = models.JSONField(default=list, blank=True)
+    full_path = models.TextField(blank=True, default="")
+    resolve_status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_PENDING)
+    error = models.TextField(null=True, blank=True)
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = "Purchased File"
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'name'], name='purchasedfile_user_name_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['user', 'id'], name='purchasedfile_user_id_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.resolve_status})"
+
+
 class UddoktapayConfiguration(SingletonModel):
     sandbox = models.BooleanField(default=True)
     api_key = models.CharField(max_length=255)
@@ -0,0 +1,24 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from others.manifest import schedule_user_manifest
+from others.models import PurchasedFile, Purchases
+
+
+@receiver(post_save, sender=Purchases, dispatch_uid="others_manifest_post_save")
+def sync_manifest_on_save(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    # Completed purchases add names; a purchase that stops being completed drops its names
+    if instance.payment_status == 'completed' or PurchasedFile.objects.filter(purchase=instance).exists():
+        user_id = instance.user_id
+        transaction.on_commit(lambda: schedule_user_manifest(user_id))
+
+
+@receiver(post_delete, sender=Purchases, dispatch_uid="others_manifest_post_delete")
+def sync_manifest_on_delete(sender, instance, **kwargs):
+    # Rows of the purchase went with it; names also bought in another purchase come back
+    if instance.payment_status == 'completed':
+        user_id = instance.user_id
+        transaction.on_commit(lambda: schedule_user_manifest(user_id))
@@ -1,3 +1,195 @@
+from datetime import timedelta
+from unittest import mock
+
+from asgiref.sync import sync_to_async
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from others import manifest
+from others.models import PurchasedFile, Purchases, Tutorial
+from users.models import Roles, Users
+
+
+def drive_file(name, file_id):
+    return {'id': file_id, 'name': name, 'mimeType': 'application/pdf', 'parents': ['folder'], 'fullPath': f"root/{name}"}
+
+
+def search_result(found=(), missing=(), failed=()):
+    results = {name: [drive_file(name, f"id-{name}")] for name in found}
+    results.update({name: [] for name in missing})
+    return {'results': results, 'failed_files': [{'file_name': name, 'error': "Drive is down"} for name in failed]}
+
+
+class ManifestTestCase(TestCase):
+    def setUp(self):
+        # Users.save() puts every new user in the default role
+        Roles.objects.get_or_create(id=42659, defaults={'name': "customer"})
+        self.user = Users.objects.create_user(email="buyer@example.com", password="secret")
+
+    def purchase(self, names, payment_status='completed', user=None):
+        return Purchases.objects.create(user=user or self.user, file_name=list(names), payment_status=payment_status)
+
+    def names(self, user=None):
+        return list(PurchasedFile.objects.filter(user=user or self.user).order_by('pk').values_list('name', flat=True))
+
+
+class SyncUserManifestTests(ManifestTestCase):
+    def test_rows_follow_completed_purchases(self):
+        first = self.purchase(["a.pdf", "b.pdf"])
+        self.purchase(["b.pdf", "c.jpg"])
+        self.purchase(["pending.pdf"], payment_status='pending')
+
+        added, removed = manifest.sync_user_manifest(self.user.pk, resolve=False)
+        self.assertEqual((added, removed), (3, 0))
+        self.assertEqual(self.names(), ["a.pdf", "b.pdf", "c.jpg"])
+        # A name bought twice belongs to the first purchase listing it
+        self.assertEqual(PurchasedFile.objects.get(name="b.pdf").purchase_id, first.pk)
+        self.assertTrue(all(row.resolve_status == PurchasedFile.STATUS_PENDING for row in PurchasedFile.objects.all()))
+
+        Purchases.objects.filter(pk=first.pk).update(payment_status='failed')
+        added, removed = manifest.sync_user_manifest(self.user.pk, resolve=False)
+        self.assertEqual((added, removed), (0, 1))
+        self.assertEqual(self.names(), ["b.pdf", "c.jpg"])
+
+    def test_resolve_stores_the_first_match(self):
+        self.purchase(["a.pdf", "gone.pdf", "flaky.pdf"])
+        result = search_result(found=["a.pdf"], missing=["gone.pdf"], failed=["flaky.pdf"])
+        with mock.patch.object(manifest, 'batch_search_files', return_value=result) as search:
+            manifest.sync_user_manifest(self.user.pk)
+        search.assert_called_once()
+
+        rows = {row.name: row for row in PurchasedFile.objects.all()}
+        self.assertEqual(rows["a.pdf"].resolve_status, PurchasedFile.STATUS_FOUND)
+        self.assertEqual((rows["a.pdf"].drive_id, rows["a.pdf"].full_path), ("id-a.pdf", "root/a.pdf"))
+        self.assertEqual(rows["gone.pdf"].resolve_status, PurchasedFile.STATUS_MISSING)
+        self.assertEqual((rows["flaky.pdf"].resolve_status, rows["flaky.pdf"].error), (PurchasedFile.STATUS_ERROR, "Drive is down"))
+
+        # Resolved rows are not searched again; errors only after ERROR_RETRY
+        with mock.patch.object(manifest, 'batch_search_files') as search:
+            manifest.sync_user_manifest(self.user.pk)
+        search.assert_not_called()
+        PurchasedFile.objects.filter(name="flaky.pdf").update(resolved_at=timezone.now() - timedelta(hours=1))
+        with mock.patch.object(manifest, 'batch_search_files', return_value=search_result(found=["flaky.pdf"])) as search:
+            manifest.sync_user_manifest(self.user.pk)
+        self.assertEqual(search.call_args[0][0], ["flaky.pdf"])
+
+    def test_failed_search_marks_rows_as_errors(self):
+        self.purchase(["a.pdf"])
+        with mock.patch.object(manifest, 'batch_search_files', side_effect=RuntimeError("quota")):
+            manifest.sync_user_manifest(self.user.pk)
+        row = PurchasedFile.objects.get()
+        self.assertEqual((row.resolve_status, row.error), (PurchasedFile.STATUS_ERROR, "quota"))
+
+
+class SignalTests(ManifestTestCase):
+    def test_completion_schedules_a_sync_after_commit(self):
+        with mock.patch('others.signals.schedule_user_manifest') as schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                purchase = self.purchase(["a.pdf"], payment_status='pending')
+            schedule.assert_not_called()
+
+            with self.captureOnCommitCallbacks(execute=True):
+                purchase.payment_status = 'completed'
+                purchase.save()
+            schedule.assert_called_once_with(self.user.pk)
+
+    def test_deleting_a_completed_purchase_schedules_a_sync(self):
+        purchase = self.purchase(["a.pdf"])
+        with mock.patch('others.signals.schedule_user_manifest') as schedule:
+            with self.captureOnCommitCallbacks(execute=True):
+                purchase.delete()
+        schedule.assert_called_once_with(self.user.pk)
+
+
+class PurchasedFilesPageTests(ManifestTestCase):
+    def test_rows_are_created_and_the_page_resolved_on_first_view(self):
+        self.purchase([f"{n}.pdf" for n in range(7)])
+        with mock.patch.object(manifest, 'batch_search_files', side_effect=lambda names, **kw: search_result(found=names)) as search:
+            result = manifest.purchased_files_page(self.user, 2, 3)
+        # Only the requested page was looked up
+        self.assertEqual(search.call_args[0][0], ["3.pdf", "4.pdf", "5.pdf"])
+        self.assertEqual([f['original_search'] for f in result['files']], ["3.pdf", "4.pdf", "5.pdf"])
+        self.assertIsNone(result['failed_files'])
+        self.assertEqual(result['pagination'], {
+            "current_page": 2, "page_size": 3, "total_files": 7, "total_pages": 3,
+            "has_next": True, "has_previous": True, "files_in_current_page": 3,
+        })
+
+    def test_unresolved_names_are_reported_as_failed(self):
+        self.purchase(["a.pdf", "gone.pdf"])
+        with mock.patch.object(manifest, 'batch_search_files', return_value=search_result(found=["a.pdf"], missing=["gone.pdf"])):
+            result = manifest.purchased_files_page(self.user, 1, 5)
+        self.assertEqual(result['failed_files'], [{"name": "gone.pdf", "error": "File not found in Google Drive"}])
+
+
+class UserPurchasedFilesViewTests(ManifestTestCase):
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+
+    def test_paginated_view_reads_the_manifest(self):
+        self.purchase(["a.pdf", "b.pdf", "c.pdf"])
+        with mock.patch.object(manifest, 'batch_search_files', side_effect=lambda names, **kw: search_result(found=names)):
+            response = self.client.get('/user-files/', {'page': 1, 'page_size': 2})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([f['id'] for f in response.data['files']], ["id-a.pdf", "id-b.pdf"])
+        self.assertEqual(response.data['pagination']['total_files'], 3)
+
+        # Once resolved, a page is a DB read only
+        with mock.patch.object(manifest, 'batch_search_files') as search:
+            response = self.client.get('/user-files/', {'page': 1, 'page_size': 2})
+        search.assert_not_called()
+        self.assertEqual(len(response.data['files']), 2)
+
+    def test_batch_view(self):
+        self.purchase(["a.pdf", "gone.pdf"])
+        with mock.patch.object(manifest, 'batch_search_files', return_value=search_result(found=["a.pdf"], missing=["gone.pdf"])):
+            response = self.client.get('/user-files-batch/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['summary'], {"total_searched": 2, "found": 1, "failed": 1, "success_rate": "50.0%"})
+
+    def test_batch_view_refuses_too_many_files(self):
+        self.purchase(["a.pdf", "b.pdf"])
+        with mock.patch('driveapp.views.UserPurchasedFilesBatchView.max_files', 1):
+            response = self.client.get('/user-files-batch/')
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(response.data['total_files'], 2)
+
+    async def test_async_view_resolves_pending_rows_with_async_drive(self):
+        await self.apurchase(["a.pdf", "b.pdf"])
+        token = AccessToken.for_user(self.user)
+        with mock.patch('driveapp.async_drive.batch_search_files', new=mock.AsyncMock(return_value=search_result(found=["a.pdf", "b.pdf"]))) as search:
+            response = await self.async_client.get(
+                '/api/drive/async/user-files/', {'page': 1, 'page_size': 5}, AUTHORIZATION=f"Bearer {token}"
+            )
+        self.assertEqual(response.status_code, 200)
+        search.assert_awaited_once()
+        self.assertEqual([f['id'] for f in response.json()['files']], ["id-a.pdf", "id-b.pdf"])
+
+    async def apurchase(self, names):
+        return await sync_to_async(self.purchase)(names)
+
+
+class TutorialBulkTests(ManifestTestCase):
+    def test_bulk_create_needs_staff(self):
+        items = [{'title': f"Lesson {n}", 'descriptions': "<p>Watch</p>", 'video_url': f"https://youtu.be/{n}"} for n in range(3)]
+        client = APIClient()
+        response = client.post('/tutorial/bulk_create/', items, format='json')
+        self.assertEqual(response.status_code, 401)
+
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.user)}")
+        response = client.post('/tutorial/bulk_create/', items, format='json')
+        self.assertEqual(response.status_code, 403)
+        self.assertFalse(Tutorial.objects.exists())
+
+        staff = Users.objects.create_user(email="staff@example.com", password="secret", is_staff=True)
+        client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(staff)}")
+        response = client.post('/tutorial/bulk_create/', items, format='json')
+        self.assertEqual(response.data['status'], 201)
+        self.assertEqual(list(Tutorial.objects.order_by('id').values_list('title', flat=True)), ["Lesson 0", "Lesson 1", "Lesson 2"])
 
-# Create your tests here.
+        # Reads stay public
+        self.assertEqual(APIClient().get('/tutorial/').status_code, 200)
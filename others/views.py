@@ -2,9 +2,9 @@ from django.shortcuts import render
 import httpx
 # Create your views here.
 # views.py
-from rest_framework import viewsets
+from rest_framework import permissions, viewsets
 from rest_framework.decorators import action
-from globalapp.views import BaseViews
+from globalapp.views import BaseViews, PublicCacheMixin
 from others.models import ExtraFeature, Package, PackageItem, Purchases, Tutorial, UddoktapayConfiguration
 from others.serializers import PackageItemSerializer, PackageSerializer, PurchaseSerializer, TutorialSerializer
 from rest_framework.response import Response
@@ -12,27 +12,46 @@ from rest_framework.decorators import action
 from rest_framework import status
 from django.views.generic import TemplateView
 from users.models import Users, Roles
+from users.permissions import IsStaff
 from .serializers import ExtraFeatureSerializer, PurchaseSerializer
 from .helpers import BkashPaymentHelper,UddoktapayPaymentHelper  # if you put helper in helpers.py
 from django.contrib.auth import authenticate, get_user_model
 import requests
 
-class PackageItemViewSet(BaseViews):
+class PackageItemViewSet(PublicCacheMixin, BaseViews):
     model_name = PackageItem
-    methods = ["list", "retrieve"]
+    methods = ["list", "retrieve", "bulk_create", "bulk_update", "bulk_soft_delete"]
     queryset = PackageItem.objects.all()
     serializer_class = PackageItemSerializer
+
+    def get_permissions(self):
+        if self.action in ['list', 'retrieve']:
+            self.permission_classes = [permissions.AllowAny]
+        else:
+            self.permission_classes = [permissions.IsAuthenticated, IsStaff]
+        return super().get_permissions()
+
 class PackageViewSet(BaseViews):
     model_name = Package
     methods = ["list", "retrieve"]
     queryset = Package.objects.all()
     serializer_class = PackageSerializer
+    response_cache = True
+    response_cache_scope = 'public'
 
-class TutorialViewSet(BaseViews):
+class TutorialViewSet(PublicCacheMixin, BaseViews):
     model_name = Tutorial
-    methods = ["list", "retrieve"]
+    methods = ["list", "retrieve", "bulk_create", "bulk_update", "bulk_soft_delete"]
     queryset = Tutorial.objects.all()
     serializer_class = TutorialSerializer
+
+    def get_permissions(self):
+        if self.action in ['list', 'retrieve']:
+            self.permission_classes = [permissions.AllowAny]
+        else:
+            self.permission_classes = [permissions.IsAuthenticated, IsStaff]
+        return super().get_permissions()
+
 class ExtraFeatureViewSet(BaseViews):
     model_name = ExtraFeature
     methods = ["list", "retrieve"]
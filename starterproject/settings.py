@@ -70,6 +70,20 @@ INSTALLED_APPS = [
 import os
 
 GOOGLE_CREDENTIALS_FILE = os.path.join(BASE_DIR, 'credentials.json')
+# Per-process folder id -> (name, parent) cache used to build Drive file paths
+DRIVE_FOLDER_CACHE_SIZE = 20000
+DRIVE_FOLDER_CACHE_TTL = 3600
+# Seconds a Drive name lookup stays fresh per outcome; hits and misses are then
+# served stale for DRIVE_LOOKUP_STALE more seconds while they are refreshed
+DRIVE_LOOKUP_TTLS = {'hit': 3600, 'miss': 300, 'error': 30}
+DRIVE_LOOKUP_STALE = 86400
+# Most purchased files UserPurchasedFilesBatchView resolves in one request
+DRIVE_BATCH_MAX_FILES = 500
+# Preview/convert rendering runs in a process pool (0 workers renders inline)
+DRIVE_RENDER_WORKERS = max(1, (os.cpu_count() or 2) // 2)
+DRIVE_RENDER_MAX_PENDING = DRIVE_RENDER_WORKERS * 4
+DRIVE_RENDER_TIMEOUT = 30
+DRIVE_RENDER_MEMORY_LIMIT = 1024 ** 3
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -113,6 +127,40 @@ DATABASES = {
 }
 
 
+# Caches
+# model_versions and responses are shared by every worker on the host (file
+# based) so ETags and cached BaseViews responses stay consistent across processes.
+CACHE_DIR = BASE_DIR / '.cache'
+# Rendered Drive previews, evicted least recently served first above the limit
+DRIVE_PREVIEW_CACHE_DIR = CACHE_DIR / 'previews'
+DRIVE_PREVIEW_CACHE_MAX_BYTES = 2 * 1024 ** 3
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'model_versions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR / 'model_versions',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR / 'responses',
+        'TIMEOUT': 300,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    },
+    # Drive file-name lookups (driveapp.lookup_cache), behind a per-process LRU
+    'drive_lookups': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR / 'drive_lookups',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 50000},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 